@@ -0,0 +1,209 @@
+import argparse
+import base64
+import json
+import math
+import os
+import os.path as osp
+import random
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+import yaml
+
+from core.configs.constants import Constants
+
+SHAPE_TYPES = ("rectangle", "polygon", "rotation", "point")
+# How shape types are spelled in label files: "lower" as most converters expect (X-AnyLabeling style),
+# "app" as the canvas saves them (ShapeType names)
+SHAPE_TYPE_STYLES = ("lower", "app")
+DEFAULT_CLASSES = ("car", "person", "bicycle", "dog", "text")
+KEYPOINT_NAMES = ("head", "left_hand", "right_hand")
+
+
+class SyntheticDataset:
+    """
+    Paths of a generated dataset, laid out as SemiLabelTool saves it: images and label files side by side.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        # Images and their label files, named `frame-<index>` so that MOT can read frame indexes
+        self.image_dir = osp.join(root, "images")
+        self.classes_file = osp.join(root, "classes.txt")
+        self.pose_cfg_file = osp.join(root, "pose.yaml")
+        self.mapping_table_file = osp.join(root, "mapping_table.json")
+        self.images: int = 0
+        self.shapes: int = 0
+
+    @property
+    def mapping_table(self) -> dict:
+        with open(self.mapping_table_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def image_files(self) -> List[str]:
+        return sorted(
+            osp.join(self.image_dir, name) for name in os.listdir(self.image_dir) if not name.endswith(".json")
+        )
+
+    def label_files(self) -> List[str]:
+        return sorted(osp.join(self.image_dir, name) for name in os.listdir(self.image_dir) if name.endswith(".json"))
+
+
+def _polygon(rng: random.Random, center: Tuple[float, float], radius: float, vertices: int) -> list:
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(vertices))
+    return [[center[0] + radius * math.cos(a), center[1] + radius * math.sin(a)] for a in angles]
+
+
+def _rotation(center: Tuple[float, float], width: float, height: float, theta: float) -> list:
+    cos_t, sin_t = math.cos(theta), math.sin(theta)
+    corners = [(-width / 2, -height / 2), (width / 2, -height / 2), (width / 2, height / 2), (-width / 2, height / 2)]
+    return [[center[0] + x * cos_t - y * sin_t, center[1] + x * sin_t + y * cos_t] for x, y in corners]
+
+
+def generate_shapes(rng: random.Random, count: int, shape_types: Sequence[str], classes: Sequence[str], image_size: Tuple[int, int]) -> list:
+    """
+    Generate `count` random shapes of the custom label format, cycling through `shape_types`.
+
+    Points are attached to a rectangle through its group id, so that they form YOLO pose instances.
+    """
+    width, height = image_size
+    shapes, rectangle_groups = [], []
+    for i in range(count):
+        shape_type = shape_types[i % len(shape_types)]
+        label = classes[rng.randrange(len(classes))]
+        center = (rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height)
+        size = rng.uniform(0.02, 0.15) * min(width, height)
+        shape = {
+            "label": label,
+            "score": None,
+            "points": [],
+            "group_id": i,
+            "description": f"{label} {i}",
+            "is_difficult": False,
+            "shape_type": shape_type,
+            "flags": {},
+            "attributes": {},
+            "kie_linking": [],
+        }
+        if shape_type == "rectangle":
+            x_min, y_min = center[0] - size, center[1] - size / 2
+            x_max, y_max = center[0] + size, center[1] + size / 2
+            shape["points"] = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            rectangle_groups.append(i)
+        elif shape_type == "polygon":
+            shape["points"] = _polygon(rng, center, size, rng.randint(5, 12))
+        elif shape_type == "rotation":
+            theta = rng.uniform(0, math.pi)
+            shape["points"] = _rotation(center, 2 * size, size, theta)
+            shape["direction"] = theta
+        elif shape_type == "point":
+            if not rectangle_groups:
+                continue
+            shape["label"] = KEYPOINT_NAMES[rng.randrange(len(KEYPOINT_NAMES))]
+            shape["group_id"] = rectangle_groups[rng.randrange(len(rectangle_groups))]
+            shape["points"] = [list(center)]
+        else:
+            raise ValueError(f"Unsupported shape type: {shape_type}")
+        shapes.append(shape)
+    return shapes
+
+
+def generate_dataset(root: str, images: int = 100, shapes_per_image: int = 20, shape_types: Sequence[str] = SHAPE_TYPES, image_size: Tuple[int, int] = (1280, 720),
+                     embed_image_data: bool = False, classes: Sequence[str] = DEFAULT_CLASSES, seed: int = 0, shape_type_style: str = "lower") -> SyntheticDataset:
+    """
+    Generate a synthetic dataset in the custom label format.
+
+    Args:
+        root: directory to generate the dataset into
+        images: number of images
+        shapes_per_image: number of shapes of each image
+        shape_types: shape types to generate, cycled through in each image
+        image_size: (width, height) of the images
+        embed_image_data: store the base64 image in `imageData` of each label file
+        classes: labels to draw from
+        seed: random seed, the same arguments always produce the same dataset
+        shape_type_style: spelling of shape types, see SHAPE_TYPE_STYLES
+
+    Returns:
+        SyntheticDataset: paths of the generated dataset
+    """
+    if shape_type_style not in SHAPE_TYPE_STYLES:
+        raise ValueError(f"Unsupported shape type style: {shape_type_style}")
+    dataset = SyntheticDataset(root)
+    os.makedirs(dataset.image_dir, exist_ok=True)
+    rng = random.Random(seed)
+    width, height = image_size
+
+    # Keypoints are labels as well, e.g. for COCO which exports every shape
+    with open(dataset.classes_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(list(classes) + list(KEYPOINT_NAMES)) + "\n")
+    with open(dataset.pose_cfg_file, "w", encoding="utf-8") as f:
+        yaml.safe_dump({"has_visible": True, "classes": {c: list(KEYPOINT_NAMES) for c in classes}}, f)
+    with open(dataset.mapping_table_file, "w", encoding="utf-8") as f:
+        json.dump({"type": "grayscale", "colors": {c: (i + 1) * 255 // len(classes) for i, c in enumerate(classes)}}, f)
+
+    # All images share the same content, encoding is not what is measured
+    noise = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    image_bytes = cv2.imencode(".jpg", noise)[1].tobytes()
+    image_data = base64.b64encode(image_bytes).decode("utf-8") if embed_image_data else None
+
+    for index in range(1, images + 1):
+        image_name = f"frame-{index:06d}.jpg"
+        with open(osp.join(dataset.image_dir, image_name), "wb") as f:
+            f.write(image_bytes)
+        shapes = generate_shapes(rng, shapes_per_image, shape_types, classes, image_size)
+        if shape_type_style == "app":
+            for shape in shapes:
+                shape["shape_type"] = shape["shape_type"].upper()
+        data = {
+            "version": Constants.APP_VERSION,
+            "flags": {},
+            "shapes": shapes,
+            "imagePath": image_name,
+            "imageData": image_data,
+            "imageHeight": height,
+            "imageWidth": width,
+        }
+        with open(osp.join(dataset.image_dir, f"frame-{index:06d}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        dataset.images += 1
+        dataset.shapes += len(shapes)
+    return dataset
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser.add_argument("--images", type=int, default=100, help="number of images")
+    parser.add_argument("--shapes", type=int, default=20, help="number of shapes per image")
+    parser.add_argument("--shape-types", default=",".join(SHAPE_TYPES), help="comma separated shape types to generate")
+    parser.add_argument("--image-size", default="1280x720", help="image size as WIDTHxHEIGHT")
+    parser.add_argument("--embed-image-data", action="store_true", help="store base64 images in label files")
+    parser.add_argument("--shape-type-style", choices=SHAPE_TYPE_STYLES, default="lower", help="spelling of shape types in label files")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def generate_from_args(root: str, args) -> SyntheticDataset:
+    width, height = map(int, args.image_size.lower().split("x"))
+    return generate_dataset(
+        root,
+        images=args.images,
+        shapes_per_image=args.shapes,
+        shape_types=[t.strip() for t in args.shape_types.split(",") if t.strip()],
+        image_size=(width, height),
+        embed_image_data=args.embed_image_data,
+        seed=args.seed,
+        shape_type_style=args.shape_type_style,
+    )
+
+
+def main():
+    parser = add_dataset_arguments(argparse.ArgumentParser(description="Generate a synthetic SemiLabelTool dataset"))
+    parser.add_argument("output_dir")
+    args = parser.parse_args()
+    dataset = generate_from_args(args.output_dir, args)
+    print(f"Generated {dataset.images} images with {dataset.shapes} shapes in {dataset.root}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,14 +7,21 @@ from core.dto.label_file import LabelFile
 from utils.logger import logger
 
 if TYPE_CHECKING:
-    from PyQt5.QtGui import QImage
     from core.dto.shape import Shape
+    from core.services.auto_save import AutoSaveWriter
+    from core.services.folder_watcher import FolderWatcher
+    from core.services.image_prefetcher import ImagePrefetcher
+    from utils.edit_journal import EditJournal
     from core.views.dialogs.label_dialog import LabelDialog
     from core.views.modules.canvas import Canvas
+    from core.views.modules.file_list_widget import FileList, FileListWidget
     from core.views.modules.label_list_widget import LabelListWidget
     from core.views.modules.label_filter_combo_box import LabelFilterComboBox
     from core.views.modules.unique_label_list_widget import UniqueLabelListWidget
     from core.views.modules.zoom_widget import ZoomWidget
+    from utils.catalog import AnnotationCatalog
+    from utils.image import DecodedImage
+    from utils.label_index import LabelIndex
 
 
 class Core(object):
@@ -33,10 +40,18 @@ class Core(object):
         last_open_dir_path: str = None
         # 输出目录
         output_dir: str = None
+        # 上一张打开的图片在文件列表中的序号, 用于判断浏览方向
+        last_image_index: Optional[int] = None
+        # 当前文件夹的标注目录缓存
+        annotation_catalog: Optional['AnnotationCatalog'] = None
+        # 文件列表的标注内容索引, 用于文件搜索
+        label_index: Optional['LabelIndex'] = None
         # 当前正在标注的文件对象 LabelFile
         label_file: Optional['LabelFile'] = None
-        # 当前正在处理的QImage对象
-        image: 'QImage' = None
+        # 当前图片的编辑日志
+        edit_journal: Optional['EditJournal'] = None
+        # 当前正在处理的图片，解码一次后由Qt、PIL和NumPy共享像素
+        image: 'DecodedImage' = None
         image_path: str = None
         image_data: str = None
         image_flags: dict = {}
@@ -51,15 +66,11 @@ class Core(object):
         selected_polygon_stack: List[int] = []
         shape_scale: float = 1.5
 
-        # 当前文件夹下的图片列表
+        # 当前文件夹下的图片列表, 按路径索引
         @classmethod
         @property
-        def image_list(self):
-            lst = []
-            for i in range(CORE.Object.info_file_list_widget.count()):
-                item = CORE.Object.info_file_list_widget.item(i)
-                lst.append(item.text())
-            return lst
+        def image_list(self) -> 'FileList':
+            return CORE.Object.info_file_list_widget.images
 
     class Object:
         # 主窗口对象
@@ -84,7 +95,7 @@ class Core(object):
         flag_widget: QtWidgets.QListWidget = None
         # 文件列表
         info_file_search_widget: QtWidgets.QLineEdit = None
-        info_file_list_widget: QtWidgets.QListWidget = None
+        info_file_list_widget: 'FileListWidget' = None
 
         label_list_widget: 'LabelListWidget' = None
         label_filter_combo_box: 'LabelFilterComboBox' = None
@@ -95,6 +106,13 @@ class Core(object):
         # ToolBar 缩放组件
         zoom_widget: 'ZoomWidget' = None
 
+        # 后台自动保存
+        auto_save_writer: 'AutoSaveWriter' = None
+        # 监视当前文件夹的变化
+        folder_watcher: 'FolderWatcher' = None
+        # 后台预读后续图片
+        image_prefetcher: 'ImagePrefetcher' = None
+
     class Action:
         def __init__(self):
             self.actions = {}
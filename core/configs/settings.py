@@ -1,14 +1,31 @@
+import copy
 import os
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Optional, Set
 
 import yaml
 
 from utils.logger import logger
 
+if TYPE_CHECKING:
+    from core.services.auto_save import AutoSaveWriter
+
 
 class Settings(object):
+    """
+    User settings, written back to `path` only when a key changed.
+
+    Once `writer` is set, changes are written in the background after its delay, `save` writes them at once.
+    """
+
     def __init__(self, path=None):
         self.data: dict = {}
         self.path: str = os.path.join(os.path.expanduser("~") if path is None else path, '.semi.cfg')
+        # Keys changed since the settings were last written
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self.writer: Optional['AutoSaveWriter'] = None
         self.load()
 
     def __setitem__(self, key: str, value) -> None:
@@ -18,19 +35,75 @@ class Settings(object):
         return self.get(key)
 
     def set(self, key: str, value) -> None:
-        self.data[key] = value
+        if key in self.data and self.data[key] == value:
+            return
+        with self._lock:
+            self.data[key] = value
+            self._dirty.add(key)
+        if self.writer is not None and self.path:
+            self.writer.schedule(self.path)
+
+    def is_dirty(self) -> bool:
+        return bool(self._dirty)
 
     def get(self, key, default=None) -> object:
         if key in self.data:
             return self.data[key]
         return default
 
+    def snapshot(self, *_) -> Optional[dict]:
+        """
+        Copy of the settings to write, marked as written.
+
+        Returns:
+            Optional[dict]: None if no key changed
+        """
+        with self._lock:
+            if not self._dirty or not self.path:
+                return None
+            self._dirty.clear()
+            return {"path": self.path, "data": copy.deepcopy(self.data)}
+
+    def write(self, snapshot: dict) -> None:
+        """
+        Write a snapshot to a temporary file replacing the settings file, which is never left half written.
+        """
+        path, data = snapshot["path"], snapshot["data"]
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix=".semi.cfg.", dir=os.path.dirname(path) or ".")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    yaml.safe_dump(data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except Exception:
+            # Written again with the next change or save
+            with self._lock:
+                self._dirty.update(data)
+            raise
+
     def save(self) -> bool:
-        if self.path:
-            with open(self.path, 'w') as f:
-                yaml.safe_dump(self.data, f)
-                return True
-        return False
+        """
+        Write the changed settings now.
+
+        Returns:
+            bool: whether the settings were written
+        """
+        if self.writer is not None:
+            self.writer.cancel()
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return False
+        try:
+            self.write(snapshot)
+        except Exception as e:
+            logger.error(f'Saving settings failed: {e}')
+            return False
+        return True
 
     def load(self) -> bool:
         """
@@ -58,3 +131,4 @@ class Settings(object):
             logger.info('Remove settings file ${0}'.format(self.path))
         self.data = {}
         self.path = None
+        self._dirty.clear()
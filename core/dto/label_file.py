@@ -1,42 +1,241 @@
 import base64
+import binascii
 import json
+import mmap
 import os
+import shutil
+import threading
 
-import utils
 from core.configs.constants import Constants
 from core.dto.enums import ShapeType
 from core.dto.exceptions import LabelFileError
+from utils.blob_store import BlobStore
+from utils.edit_journal import EditJournal
+from utils.image import img_data_to_pil
+from utils.image_meta import image_meta_cache, read_image_header
+from utils.label_binary import BINARY_SUFFIX, binary_to_json, find_label_file, is_binary_label, read_label_binary, write_label_binary
 from utils.label_converter import LabelConverter
 from utils.logger import logger
 
 
 class LabelFile:
     suffix = ".json"
+    # Sidecar format storing points as packed float32 arrays, see utils.label_binary
+    binary_suffix = BINARY_SUFFIX
+    label_formats = {"json": suffix, "binary": binary_suffix}
+
+    # Base64 characters decoded to read the header of embedded images, enough for JPEG EXIF segments
+    EMBEDDED_HEADER_SIZE = 128 * 1024
 
     def __init__(self, filename=None, image_dir=None):
         self.flags = {}
         self.shapes = []
         self.image_path = None
-        self.image_data = None
+        # Image bytes are only read on first access, see `image_data` and `image_view`
+        self._image_data = None
+        self._image_b64 = None
+        self._image_file = None
+        self._image_mmap = None
+        # (label file, image path, blob reference) of an image read from a file, resolved on first access
+        self._image_source = None
+        # (height, width) written to the label file, checked against the image by `image_size`
+        self._image_size_hint = (None, None)
+        self._image_size = None
         self.image_dir = image_dir
+        # Whether edits of the edit journal were replayed onto the label file
+        self.recovered = False
         if filename is not None:
             self.load(filename)
         self.filename = filename
         self.other_data = {}
 
+    @property
+    def image_data(self):
+        """
+        Raw bytes of the image, decoded from `imageData` or read from the image file on first access, None if the
+        image file can not be read.
+
+        Raises:
+            LabelFileError: `imageData` is not valid base64
+        """
+        if self._image_data is None and self._image_b64 is not None:
+            try:
+                self._image_data = base64.b64decode(self._image_b64)
+            except binascii.Error as e:
+                raise LabelFileError(f"Invalid image data of {self.filename}: {e}") from e
+            self._image_b64 = None
+        elif self._image_data is None and self._get_image_file() is not None:
+            view = self.image_view
+            if view is not None:
+                self._image_data = bytes(view)
+                self.release_image()
+        return self._image_data
+
+    @image_data.setter
+    def image_data(self, value):
+        self.release_image()
+        self._image_data = value
+        self._image_b64 = None
+        self._image_file = None
+        self._image_source = None
+        self._image_size = None
+
+    @property
+    def image_view(self):
+        """
+        Zero-copy memoryview of the image bytes, memory-mapped from the image file when it is not embedded.
+
+        Only the pages actually read are loaded, e.g. the header. Call `release_image` to unmap the file.
+        """
+        if self._image_data is not None or self._image_b64 is not None:
+            return memoryview(self.image_data)
+        if self._get_image_file() is None:
+            return None
+        if self._image_mmap is None:
+            try:
+                with open(self._image_file, "rb") as f:
+                    if os.fstat(f.fileno()).st_size == 0:
+                        return memoryview(b"")
+                    self._image_mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except OSError:
+                logger.error(f"Failed opening image file: {self._image_file}")
+                return None
+        return memoryview(self._image_mmap)
+
+    @property
+    def image_size(self):
+        """
+        (height, width) of the image, read from its header on first access. The size written to the label file is
+        used when the image can not be read, a mismatch with the image is logged.
+        """
+        if self._image_size is None:
+            if self._image_data is not None:
+                actual_height, actual_width = self.get_image_height_and_width(self._image_data)
+            elif self._image_b64 is not None:
+                header = self._embedded_image_header(self._image_b64)
+                if header is not None:
+                    actual_height, actual_width = header[1], header[0]
+                else:
+                    actual_height, actual_width = self.get_image_height_and_width(self.image_data)
+            else:
+                actual_height, actual_width = self.get_image_height_and_width(None, self._get_image_file())
+            image_height, image_width = self._resolve_image_height_and_width(actual_height, actual_width, *self._image_size_hint)
+            self._image_size = (
+                image_height if image_height is not None else actual_height,
+                image_width if image_width is not None else actual_width,
+            )
+        return self._image_size
+
+    def _get_image_file(self):
+        # Image file of a label without embedded image data, looked up when the image is first needed
+        if self._image_source is not None:
+            filename, image_path, image_ref = self._image_source
+            self._image_source = None
+            image_file = None
+            if image_ref is not None:
+                # Image data saved in the blob store, read like an image file
+                image_file = BlobStore.for_label_file(filename).get_path(image_ref)
+                if not os.path.isfile(image_file):
+                    logger.warning(f"Image data {image_ref} is missing from the blob store, reading the image file")
+                    image_file = None
+            if image_file is None:
+                image_file = os.path.join(self.image_dir or os.path.dirname(filename), image_path)
+            self._image_file = image_file
+        return self._image_file
+
+    def release_image(self):
+        """
+        Unmap the image file, views returned by `image_view` must not be used afterwards.
+        """
+        if self._image_mmap is not None:
+            try:
+                self._image_mmap.close()
+            except BufferError:
+                # Still exported through a memoryview, closed when garbage collected
+                pass
+            self._image_mmap = None
+
+    def _embedded_image_header(self, image_b64):
+        # Decode the beginning of the base64 data only, the header is at the start of the image. Line breaks of
+        # wrapped data are dropped so that the prefix is cut on a 4 characters boundary
+        prefix = "".join(image_b64[:self.EMBEDDED_HEADER_SIZE].split())
+        try:
+            header = read_image_header(base64.b64decode(prefix[:len(prefix) // 4 * 4]))
+        except binascii.Error:
+            header = None
+        if header is None and len(image_b64) > self.EMBEDDED_HEADER_SIZE:
+            header = read_image_header(base64.b64decode(image_b64))
+        return header
+
     @staticmethod
     def is_label_file(filename):
-        return os.path.splitext(filename)[1].lower() == LabelFile.suffix
+        return os.path.splitext(filename)[1].lower() in (LabelFile.suffix, LabelFile.binary_suffix)
+
+    @staticmethod
+    def get_label_path(filename, label_format="json"):
+        """
+        Path of the label file `filename` in the given format ("json" or "binary").
+        """
+        if label_format not in LabelFile.label_formats:
+            raise LabelFileError(f"Unsupported label format: {label_format}")
+        return os.path.splitext(filename)[0] + LabelFile.label_formats[label_format]
+
+    @staticmethod
+    def find_label_file(filename):
+        """
+        Find the existing label file of `filename`, a label path of any format, see `utils.label_binary.find_label_file`.
+
+        Returns:
+            str: path of the label file, None if there is none
+        """
+        return find_label_file(filename)
+
+    @staticmethod
+    def get_image_height_and_width(image_data, image_file=None):
+        """
+        Get (height, width) of an image from its header, without decoding pixels.
+
+        Args:
+            image_data: raw (not base64) image bytes
+            image_file: file the bytes were read from, its size is cached by path, modification time and size
+
+        Returns:
+            Tuple[int, int]: (height, width), (None, None) if the image can not be read
+        """
+        if image_file is not None and os.path.isfile(image_file):
+            try:
+                width, height = image_meta_cache.get_size(image_file)
+                return height, width
+            except OSError as e:
+                logger.warning(f"Failed reading image header of {image_file}: {e}")
+        if image_data is None:
+            return None, None
+        header = read_image_header(image_data)
+        if header is not None:
+            width, height, _ = header
+            return height, width
+        try:
+            # PIL only parses the header when opening
+            with img_data_to_pil(image_data) as img:
+                width, height = img.size
+            return height, width
+        except OSError as e:
+            logger.warning(f"Failed reading image header: {e}")
+            return None, None
 
     @staticmethod
     def _check_image_height_and_width(image_data, image_height, image_width):
-        img_arr = utils.image.img_b64_to_arr(image_data)
-        if image_height is not None and img_arr.shape[0] != image_height:
+        actual_height, actual_width = LabelFile.get_image_height_and_width(image_data)
+        return LabelFile._resolve_image_height_and_width(actual_height, actual_width, image_height, image_width)
+
+    @staticmethod
+    def _resolve_image_height_and_width(actual_height, actual_width, image_height, image_width):
+        if image_height is not None and actual_height is not None and actual_height != image_height:
             logger.warning("image_height does not match with image_data or image_path, so getting image_height from actual image.")
-            image_height = img_arr.shape[0]
-        if image_width is not None and img_arr.shape[1] != image_width:
+            image_height = actual_height
+        if image_width is not None and actual_width is not None and actual_width != image_width:
             logger.warning("image_width does not match with image_data or image_path, so getting image_width from actual image.")
-            image_width = img_arr.shape[1]
+            image_width = actual_width
         return image_height, image_width
 
     @staticmethod
@@ -49,50 +248,29 @@ class LabelFile:
         return default
 
     def load(self, filename):
-        keys = ["version", "imageData", "imagePath", "shapes", "flags", "imageHeight", "imageWidth"]
-        shape_keys = ["label", "score", "points", "group_id", "is_difficult", "shape_type", "flags", "description", "attributes", "kie_linking"]
+        keys = ["version", "imageData", "imageDataRef", "imagePath", "shapes", "flags", "imageHeight", "imageWidth"]
         try:
-            with open(filename, "r", encoding='utf-8') as f:
-                data = json.load(f)
+            image_bytes = None
+            if is_binary_label(filename):
+                data, image_bytes = read_label_binary(filename)
+            else:
+                with open(filename, "r", encoding='utf-8') as f:
+                    data = json.load(f)
+            # Edits not written to the label file yet, e.g. after a crash
+            recovered = EditJournal.replay(EditJournal.get_path(filename), filename, data) is not None
             version = data.get("version")
             if version is None:
                 logger.warning(f"Loading JSON file ({filename}) of unknown version")
 
             data["imagePath"] = os.path.basename(data["imagePath"])
-            if data["imageData"] is not None:
-                self.image_data = base64.b64decode(data["imageData"])
-            else:
-                if self.image_dir:
-                    image_path = os.path.join(self.image_dir, data["imagePath"])
-                else:
-                    image_path = os.path.join(os.path.dirname(filename), data["imagePath"])
-                self.image_data = self.load_image_file(image_path)
+            image_b64 = data["imageData"]
+            # The image is only resolved and its size checked when first needed, see `image_data` and `image_size`
+            image_source = None
+            if image_bytes is None and image_b64 is None:
+                image_source = (filename, data["imagePath"], data.get("imageDataRef"))
             flags = data.get("flags") or {}
             image_path = data["imagePath"]
-            self._check_image_height_and_width(
-                image_data=base64.b64encode(self.image_data).decode("utf-8"),
-                image_height=data.get("imageHeight"),
-                image_width=data.get("imageWidth"),
-            )
-            shapes = [
-                {
-                    "label": shape["label"],
-                    "score": shape.get("score", None),
-                    "points": shape["points"],
-                    "shape_type": shape.get("shape_type", ShapeType.POLYGON.name),
-                    "flags": shape.get("flags", {}),
-                    "group_id": shape.get("group_id"),
-                    "description": shape.get("description"),
-                    "is_difficult": shape.get("is_difficult", False),
-                    "attributes": shape.get("attributes", {}),
-                    "kie_linking": shape.get("kie_linking", []),
-                    "other_data": {k: v for k, v in shape.items() if k not in shape_keys},
-                }
-                for shape in data["shapes"]
-            ]
-            for i, s in enumerate(data["shapes"]):
-                if ShapeType.ROTATION == s.get("shape_type", ShapeType.POLYGON.name):
-                    shapes[i]["direction"] = s.get("direction", 0)
+            shapes = self.parse_shapes(data["shapes"])
         except Exception as e:
             logger.error(e)
             raise LabelFileError(e) from e
@@ -106,16 +284,70 @@ class LabelFile:
         other_data["text"] = other_data.get("text", "")
 
         # Only replace data after everything is loaded.
+        self.image_data = image_bytes
+        self._image_b64 = image_b64
+        self._image_source = image_source
+        self._image_size_hint = (data.get("imageHeight"), data.get("imageWidth"))
         self.flags = flags
         self.shapes = shapes
         self.image_path = image_path
         self.filename = filename
         self.other_data = other_data
+        self.recovered = recovered
 
-    def save(self, filename=None, shapes=None, image_path=None, image_height=None, image_width=None, image_data=None, other_data=None, flags=None):
+    @staticmethod
+    def parse_shapes(shapes):
+        """
+        Convert shapes as written to label files into the shapes loaded onto the canvas.
+        """
+        shape_keys = ["label", "score", "points", "group_id", "is_difficult", "shape_type", "flags", "description", "attributes", "kie_linking"]
+        parsed = [
+            {
+                "label": shape["label"],
+                "score": shape.get("score", None),
+                "points": shape["points"],
+                "shape_type": shape.get("shape_type", ShapeType.POLYGON.name),
+                "flags": shape.get("flags", {}),
+                "group_id": shape.get("group_id"),
+                "description": shape.get("description"),
+                "is_difficult": shape.get("is_difficult", False),
+                "attributes": shape.get("attributes", {}),
+                "kie_linking": shape.get("kie_linking", []),
+                "other_data": {k: v for k, v in shape.items() if k not in shape_keys},
+            }
+            for shape in shapes
+        ]
+        for i, s in enumerate(shapes):
+            if ShapeType.ROTATION == s.get("shape_type", ShapeType.POLYGON.name):
+                parsed[i]["direction"] = s.get("direction", 0)
+        return parsed
+
+    def save(self, filename=None, shapes=None, image_path=None, image_height=None, image_width=None, image_data=None, other_data=None, flags=None, label_format=None, image_data_store="embed"):
+        """
+        Save labels to `filename`, in the binary format when it has the binary suffix.
+
+        Args:
+            label_format: "json" or "binary" to replace the suffix of `filename` with the one of this format
+            image_data_store: where `image_data` is saved, "embed" in the label file or "blob" in the blob store of
+                the label file's directory, referenced by `imageDataRef`
+        """
+        if label_format is not None:
+            filename = self.get_label_path(filename, label_format)
+        if image_data_store not in ("embed", "blob"):
+            raise LabelFileError(f"Unsupported image data store: {image_data_store}")
+        binary = is_binary_label(filename)
+        image_bytes, image_ref = image_data, None
         if image_data is not None:
-            image_data = base64.b64encode(image_data).decode("utf-8")
+            # Checked against the bytes being saved, the image file next to the label may differ from them
             image_height, image_width = self._check_image_height_and_width(image_data, image_height, image_width)
+            if image_data_store == "blob":
+                try:
+                    image_ref = BlobStore.for_label_file(filename).put(image_data)
+                except OSError as e:
+                    raise LabelFileError(e) from e
+                image_bytes = None
+            # The binary format stores raw image bytes
+            image_data = None if binary or image_ref is not None else base64.b64encode(image_data).decode("utf-8")
 
         if other_data is None:
             other_data = {}
@@ -141,15 +373,68 @@ class LabelFile:
             "imageHeight": image_height,
             "imageWidth": image_width,
         }
+        if image_ref is not None:
+            data["imageDataRef"] = image_ref
 
         for key, value in other_data.items():
             if key in data:
                 logger.error(f"Not expected key in other_data: {key}")
                 continue
             data[key] = value
+        # Written next to the label file then renamed, so that the label file is never left half written
+        tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
         try:
-            with open(filename, "w") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if binary:
+                write_label_binary(tmp_filename, data, image_bytes)
+            else:
+                with open(tmp_filename, "w") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_filename, filename)
             self.filename = filename
+        except Exception as e:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise LabelFileError(e) from e
+        # The label file in the other format is now stale, converters and the catalogue would read it otherwise
+        other_filename = os.path.splitext(filename)[0] + (self.suffix if binary else self.binary_suffix)
+        if os.path.exists(other_filename):
+            try:
+                os.remove(other_filename)
+            except OSError as e:
+                logger.warning(f"Failed removing stale label file {other_filename}: {e}")
+
+    def export_json(self, filename=None, embed_image_data=False):
+        """
+        Export the saved label file to JSON, e.g. for tools which only read JSON labels.
+
+        Args:
+            filename: output file, defaults to the label file with the JSON suffix
+            embed_image_data: embed image data of the blob store as base64, so that the label file is self-contained
+
+        Returns:
+            str: path of the JSON label file
+        """
+        if self.filename is None:
+            raise LabelFileError("Label file is not saved yet")
+        filename = filename or self.get_label_path(self.filename, "json")
+        try:
+            if is_binary_label(self.filename):
+                binary_to_json(self.filename, filename)
+            elif os.path.abspath(filename) != os.path.abspath(self.filename):
+                shutil.copyfile(self.filename, filename)
+            if embed_image_data:
+                self._embed_image_data_ref(filename)
+            return filename
         except Exception as e:
             raise LabelFileError(e) from e
+
+    def _embed_image_data_ref(self, filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        image_ref = data.pop("imageDataRef", None)
+        if image_ref is None:
+            return
+        image_data = BlobStore.for_label_file(self.filename).get(image_ref)
+        data["imageData"] = base64.b64encode(image_data).decode("utf-8")
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
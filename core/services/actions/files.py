@@ -1,3 +1,4 @@
+import copy
 import functools
 import os
 
@@ -12,12 +13,15 @@ from core.dto.exceptions import LabelFileError
 from core.dto.label_file import LabelFile
 from core.services import system
 from core.services.actions.canvas import paint_canvas, set_scroll_value
+from core.services.image_prefetcher import LoadedImage
 from core.services.system import set_clean, reset_state, load_flags, set_dirty, set_zoom, adjust_scale, on_item_description_change, toggle_zoom_related_action, toggle_load_related_action
 from core.views.dialogs.brightness_contrast_dialog import BrightnessContrastDialog
 from core.views.dialogs.file_dialog_preview import FileDialogPreview
 from core.views.dialogs.save_file_dialog import SaveFileDialog
-from utils.function import walkthrough_files_in_dir, has_chinese
-from utils.image import img_data_to_pil
+from utils.catalog import AnnotationCatalog, summarize_shapes
+from utils.edit_journal import EditJournal
+from utils.function import get_image_extensions, has_chinese
+from utils.label_index import LabelIndex
 from utils.logger import logger
 from utils.video import extract_frames_from_video
 
@@ -30,7 +34,7 @@ def open_file():
         f"*.{fmt.data().decode()}"
         for fmt in QtGui.QImageReader.supportedImageFormats()
     ]
-    filters = "Image & Label files (%s)" % " ".join(formats + [f"*{LabelFile.suffix}"])
+    filters = "Image & Label files (%s)" % " ".join(formats + [f"*{LabelFile.suffix}", f"*{LabelFile.binary_suffix}"])
     file_dialog = FileDialogPreview()
     file_dialog.setFileMode(FileDialogPreview.ExistingFile)
     file_dialog.setNameFilter(filters)
@@ -50,22 +54,25 @@ def save_label_file(filename: str):
         set_clean()
 
 
-def save_labels(filename):
-    label_file = LabelFile()
+def snapshot_labels(filename):
+    """
+    Collect the labels of the current image as `LabelFile.save` arguments, detached from the widgets.
 
+    Must be called on the GUI thread, the snapshot can then be written by `write_labels` on any thread.
+    """
     def format_shape(s):
-        data = s.other_data.copy()
+        data = copy.deepcopy(s.other_data)
         info = {
             "label": s.label,
             "score": s.score,
-            "points": [(p.x(), p.y()) for p in s.points],
+            "points": [[p.x(), p.y()] for p in s.points],
             "group_id": s.group_id,
             "description": s.description,
             "is_difficult": s.is_difficult,
             "shape_type": s.shape_type.name if isinstance(s.shape_type, ShapeType) else s.shape_type,
-            "flags": s.flags,
-            "attributes": s.attributes,
-            "kie_linking": s.kie_linking,
+            "flags": copy.deepcopy(s.flags),
+            "attributes": copy.deepcopy(s.attributes),
+            "kie_linking": copy.deepcopy(s.kie_linking),
         }
         if ShapeType.ROTATION == s.shape_type:
             info["direction"] = s.direction
@@ -75,8 +82,8 @@ def save_labels(filename):
 
     # Get current shapes
     # Excluding auto labeling special shapes
-    shapes = [
-        format_shape(item.shape())
+    current_shapes = [
+        item.shape()
         for item in CORE.Object.label_list_widget
         if item.shape().label not in [AutoLabelEditMode.OBJECT.value, AutoLabelEditMode.ADD.value, AutoLabelEditMode.REMOVE.value]
     ]
@@ -86,28 +93,207 @@ def save_labels(filename):
         key = item.text()
         flag = item.checkState() == Qt.Checked
         flags[key] = flag
-    try:
-        image_path = os.path.relpath(CORE.Variable.image_path, os.path.dirname(filename))
-        image_data = CORE.Variable.image_data if CORE.Variable.settings.get("store_data", False) else None
-        if os.path.dirname(filename) and not os.path.exists(os.path.dirname(filename)):
-            os.makedirs(os.path.dirname(filename))
+    return {
+        "filename": filename,
+        # Identify shapes across snapshots for the edit journal
+        "keys": [id(shape) for shape in current_shapes],
+        "shapes": [format_shape(shape) for shape in current_shapes],
+        "image_path": CORE.Variable.image_path,
+        "image_data": CORE.Variable.image_data if CORE.Variable.settings.get("store_data", False) else None,
+        "image_height": CORE.Variable.image.height(),
+        "image_width": CORE.Variable.image.width(),
+        "other_data": copy.deepcopy(CORE.Variable.other_data),
+        "flags": flags,
+        "label_format": CORE.Variable.settings.get("label_format", "json"),
+        "image_data_store": CORE.Variable.settings.get("image_data_store", "blob"),
+    }
+
+
+def write_labels(snapshot):
+    """
+    Write a snapshot of `snapshot_labels`, does not touch any widget.
+
+    Returns:
+        LabelFile: the saved label file
+    """
+    filename = snapshot["filename"]
+    label_file = LabelFile()
+    if os.path.dirname(filename) and not os.path.exists(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    with own_changes(filename):
         label_file.save(
             filename=filename,
-            shapes=shapes,
-            image_path=image_path,
-            image_data=image_data,
-            image_height=CORE.Variable.image.height(),
-            image_width=CORE.Variable.image.width(),
-            other_data=CORE.Variable.other_data,
-            flags=flags,
+            shapes=snapshot["shapes"],
+            image_path=os.path.relpath(snapshot["image_path"], os.path.dirname(filename)),
+            image_data=snapshot["image_data"],
+            image_height=snapshot["image_height"],
+            image_width=snapshot["image_width"],
+            other_data=snapshot["other_data"],
+            flags=snapshot["flags"],
+            label_format=snapshot["label_format"],
+            image_data_store=snapshot["image_data_store"],
         )
+    return label_file
+
+
+def own_changes(path):
+    """
+    Context in which files next to `path` are written or removed by the tool itself, the folder watcher does not
+    report them. May be used on any thread.
+    """
+    return CORE.Object.folder_watcher.own_changes(os.path.dirname(path))
+
+
+def on_labels_saved(snapshot, label_file):
+    # Written in the background, the image may have been switched meanwhile
+    if snapshot["image_path"] == CORE.Variable.image_path:
         CORE.Variable.label_file = label_file
-        items = CORE.Object.info_file_list_widget.findItems(CORE.Variable.image_path, Qt.MatchExactly)
-        if len(items) > 0:
-            if len(items) != 1:
-                logger.error("There are duplicate files.")
-                raise RuntimeError("There are duplicate files.")
-            items[0].setCheckState(Qt.Checked)
+    journal = CORE.Variable.edit_journal
+    if journal is not None and journal.path == EditJournal.get_path(snapshot["filename"]):
+        with own_changes(journal.path):
+            journal.rebase(label_file.filename, snapshot)
+    item = CORE.Object.info_file_list_widget.find_item(snapshot["image_path"])
+    if item is not None:
+        item.setCheckState(Qt.Checked)
+    # Summarized from the snapshot, the label file just written is not parsed again
+    refresh_catalog(snapshot["image_path"], summarize_shapes(snapshot["shapes"]))
+
+
+def refresh_catalog(image_path, summary=None):
+    """
+    Update the label summary of an image in the catalogue of the opened folder after its label file changed.
+
+    Args:
+        image_path: image whose label file changed
+        summary: summary of the shapes written to the label file, see `AnnotationCatalog.refresh`
+    """
+    if CORE.Variable.annotation_catalog is None:
+        return
+    try:
+        entry = CORE.Variable.annotation_catalog.refresh(image_path, summary)
+    except Exception as e:
+        logger.warning(f"Failed updating the catalogue for {image_path}: {e}")
+        return
+    if entry is not None and CORE.Variable.label_index is not None:
+        CORE.Variable.label_index.add(entry)
+
+
+def filter_file_list(query=None):
+    """
+    Hide the images of the file list not matching a file search query, see `LabelIndex` for the syntax.
+
+    Args:
+        query: file search query, the text of the file search box if None
+    """
+    if query is None:
+        query = CORE.Object.info_file_search_widget.text()
+    widget = CORE.Object.info_file_list_widget
+    if CORE.Variable.label_index is not None and len(CORE.Variable.label_index) == widget.count():
+        rows = CORE.Variable.label_index.query(query)
+    else:
+        # Not opened from a folder, only file names are searched
+        terms = query.split()
+        rows = {row for row in range(widget.count()) if all(term in widget.item(row).text() for term in terms)} if terms else None
+    for row in range(widget.count()):
+        hidden = rows is not None and row not in rows
+        if widget.isRowHidden(row) != hidden:
+            widget.setRowHidden(row, hidden)
+
+
+def get_visible_index(start, step):
+    """
+    Index of the first image of the file list from `start` on, in the direction of `step`, which is not hidden by the
+    file search.
+
+    Returns:
+        Optional[int]: index of the image, None if there is none
+    """
+    widget = CORE.Object.info_file_list_widget
+    for i in range(start, widget.count() if step > 0 else -1, step):
+        if not widget.isRowHidden(i):
+            return i
+    return None
+
+
+def on_auto_save_failed(filename, error):
+    CORE.Object.status_bar.showMessage(f"Error auto saving {filename}: {error}")
+
+
+def journal_labels(filename):
+    """
+    Append the edits made since the last call to the edit journal of the current image.
+    """
+    try:
+        with own_changes(CORE.Variable.edit_journal.path):
+            CORE.Variable.edit_journal.record(snapshot_labels(filename))
+    except OSError as e:
+        logger.error(f"Error writing edit journal: {e}")
+        CORE.Object.status_bar.showMessage(f"Error writing edit journal: {e}")
+
+
+def reset_journal():
+    """
+    Start the edit journal of the current image from the labels just loaded.
+
+    For an image without label file, edits left in its journal, e.g. by a crash, are loaded onto the canvas.
+
+    Returns:
+        bool: whether edits were recovered from the journal
+    """
+    if CORE.Variable.edit_journal is not None:
+        CORE.Variable.edit_journal.close()
+        CORE.Variable.edit_journal = None
+    if not CORE.Variable.settings.get("edit_journal", True) or CORE.Variable.image_path is None:
+        return False
+    filename = system.get_image_label_file()
+    journal = EditJournal(EditJournal.get_path(filename))
+    label_file = CORE.Variable.label_file
+    recovered = label_file is not None and label_file.recovered
+    if label_file is None:
+        data = EditJournal.replay(journal.path, None, {"shapes": [], "flags": {}})
+        if data is not None and (data["shapes"] or data["flags"]):
+            CORE.Object.canvas.load_labels(LabelFile.parse_shapes(data["shapes"]))
+            load_flags({**{k: False for k in CORE.Variable.image_flags or []}, **data["flags"]})
+            recovered = True
+    snapshot = snapshot_labels(filename)
+    base_shapes = label_file.shapes if label_file is not None else []
+    # Shapes may be skipped when loaded, e.g. hidden classes
+    synced = not recovered and len(base_shapes) == len(snapshot["shapes"])
+    journal.reset(label_file.filename if label_file is not None else None, snapshot, synced)
+    CORE.Variable.edit_journal = journal
+    return recovered
+
+
+def compact_journal():
+    """
+    Fold the edit journal of the current image into its label file when labels are auto saved, and close it.
+    """
+    journal = CORE.Variable.edit_journal
+    if journal is None:
+        return
+    # The image was already closed, there is no label file to fold the journal into
+    if journal.size and CORE.Variable.image_path is not None and CORE.Variable.settings.get("auto_save", True):
+        save_labels(system.get_image_label_file())
+    journal.close()
+    CORE.Variable.edit_journal = None
+
+
+def discard_journal():
+    """
+    Drop the edits recorded in the edit journal of the current image, they are not written to the label file.
+    """
+    if CORE.Variable.edit_journal is not None:
+        with own_changes(CORE.Variable.edit_journal.path):
+            CORE.Variable.edit_journal.discard()
+        CORE.Variable.edit_journal = None
+
+
+def save_labels(filename):
+    # Saved synchronously, a scheduled auto save would only write older labels
+    CORE.Object.auto_save_writer.cancel()
+    try:
+        snapshot = snapshot_labels(filename)
+        on_labels_saved(snapshot, write_labels(snapshot))
         return True
     except LabelFileError as e:
         QtWidgets.QMessageBox.critical(
@@ -148,8 +334,53 @@ def save_file_as():
     save_label_file(SaveFileDialog().get_save_file_name())
 
 
+def export_portable_label_file():
+    """
+    Export the label file of the current image to a self-contained JSON label file, image data saved in the blob
+    store is embedded. Unsaved labels are saved first.
+    """
+    if not CORE.Variable.image or CORE.Variable.image.isNull():
+        QtWidgets.QMessageBox.critical(
+            CORE.Object.main_window,
+            "Error",
+            "Cannot export empty image",
+            QtWidgets.QMessageBox.Ok
+        )
+        return
+    CORE.Object.auto_save_writer.flush()
+    if CORE.Variable.is_dirty or CORE.Variable.label_file is None:
+        save_file()
+        if CORE.Variable.is_dirty or CORE.Variable.label_file is None:
+            return
+    label_file = CORE.Variable.label_file
+    default_filename = os.path.splitext(label_file.filename)[0] + LabelFile.suffix
+    filename, _ = QtWidgets.QFileDialog.getSaveFileName(
+        CORE.Object.main_window,
+        f"{Constants.APP_NAME} - Export Portable Label File",
+        default_filename,
+        f"Label files (*{LabelFile.suffix})",
+    )
+    if not filename:
+        return
+    try:
+        with own_changes(filename):
+            label_file.export_json(filename, embed_image_data=True)
+    except LabelFileError as e:
+        QtWidgets.QMessageBox.critical(
+            CORE.Object.main_window,
+            "Error",
+            f"Error exporting label data: <b>{e}</b>",
+            QtWidgets.QMessageBox.Ok
+        )
+        logger.error(f"Error exporting label data: {e}")
+        return
+    CORE.Object.status_bar.showMessage(f"Exported {filename}")
+
+
 def load_file(filename: str = None):
-    CORE.Variable.settings.save()
+    # Labels of the previous image are written before they are replaced
+    CORE.Object.auto_save_writer.flush()
+    compact_journal()
 
     # For auto labeling
     # TODO self.clear_auto_labeling_marks()
@@ -176,39 +407,33 @@ def load_file(filename: str = None):
         logger.error(f"Error opening file: No such file: {filename}")
         return False
 
-    # assumes same name, but json extension
     CORE.Object.status_bar.showMessage(f"Loading {os.path.basename(filename)}...")
-    label_file = os.path.splitext(filename)[0] + ".json"
-    image_dir = None
-    if CORE.Variable.output_dir:
-        image_dir = os.path.dirname(filename)
-        label_file = os.path.join(CORE.Variable.output_dir, os.path.basename(label_file))
-    if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
-        try:
-            CORE.Variable.label_file = LabelFile(label_file, image_dir)
-        except LabelFileError as e:
-            QtWidgets.QMessageBox.critical(
-                CORE.Object.main_window,
-                "Error opening file",
-                f"<p><b>{e}</b></p><p>Make sure <i>{label_file}</i> is a valid label file.",
-                QtWidgets.QMessageBox.Ok
-            )
-            logger.error(f"Error reading {label_file}")
-            CORE.Object.status_bar.showMessage(f"Error reading {label_file}")
-            return False
-        CORE.Variable.image_data = CORE.Variable.label_file.image_data
-        CORE.Variable.image_path = os.path.join(os.path.dirname(label_file), CORE.Variable.label_file.image_path)
+    # Usually read and decoded in the background already, see `prefetch_images`
+    loaded = CORE.Object.image_prefetcher.take(filename, CORE.Variable.output_dir)
+    if loaded is None:
+        loaded = LoadedImage(filename, CORE.Variable.output_dir)
+    label_file = loaded.label_file_path
+    if loaded.error is not None:
+        QtWidgets.QMessageBox.critical(
+            CORE.Object.main_window,
+            "Error opening file",
+            f"<p><b>{loaded.error}</b></p><p>Make sure <i>{label_file}</i> is a valid label file.",
+            QtWidgets.QMessageBox.Ok
+        )
+        logger.error(f"Error reading {label_file}")
+        CORE.Object.status_bar.showMessage(f"Error reading {label_file}")
+        return False
+    CORE.Variable.label_file = loaded.label_file
+    CORE.Variable.image_data = loaded.image_data
+    if loaded.image_path is not None:
+        CORE.Variable.image_path = loaded.image_path
+    if loaded.label_file is not None:
         CORE.Variable.other_data = CORE.Variable.label_file.other_data
 
         CORE.Object.item_description.textChanged.disconnect()
         CORE.Object.item_description.setPlainText(CORE.Variable.other_data.get("image_description", ""))
         CORE.Object.item_description.textChanged.connect(on_item_description_change)
-    else:
-        CORE.Variable.image_data = LabelFile.load_image_file(filename)
-        if CORE.Variable.image_data:
-            CORE.Variable.image_path = filename
-        CORE.Variable.label_file = None
-    handling_image = QtGui.QImage.fromData(CORE.Variable.image_data)
+    handling_image = loaded.image
 
     if handling_image.isNull():
         formats = [f"*.{fmt.data().decode()}" for fmt in QtGui.QImageReader.supportedImageFormats()]
@@ -234,7 +459,13 @@ def load_file(filename: str = None):
             flags.update(CORE.Variable.label_file.flags)
     load_flags(flags)
 
-    if CORE.Variable.settings.get("keep_prev", False) and CORE.Object.canvas.is_no_shape:
+    if reset_journal():
+        CORE.Object.status_bar.showMessage(f"Recovered unsaved edits of {filename}")
+        if CORE.Variable.settings.get("auto_save", True) and save_labels(system.get_image_label_file()):
+            set_clean()
+        else:
+            set_dirty()
+    elif CORE.Variable.settings.get("keep_prev", False) and CORE.Object.canvas.is_no_shape:
         system.load_shapes(prev_shapes, replace=False)
         set_dirty()
     else:
@@ -257,19 +488,16 @@ def load_file(filename: str = None):
             set_scroll_value(orientation, CORE.Object.canvas.scroll_values[orientation][CORE.Variable.current_file_full_path])
 
     # set brightness contrast values
-    dialog = BrightnessContrastDialog(img_data_to_pil(CORE.Variable.image_data))
     brightness, contrast = CORE.Variable.brightness_contrast_map.get(CORE.Variable.current_file_full_path, (None, None))
     if CORE.Variable.settings.get("keep_prev_brightness", False) and CORE.Variable.recent_files:
         brightness, _ = CORE.Variable.brightness_contrast_map.get(CORE.Variable.recent_files[0], (None, None))
     if CORE.Variable.settings.get("keep_prev_contrast", False) and CORE.Variable.recent_files:
         _, contrast = CORE.Variable.brightness_contrast_map.get(CORE.Variable.recent_files[0], (None, None))
-    if brightness is not None:
-        dialog.slider_brightness.setValue(brightness)
-    if contrast is not None:
-        dialog.slider_contrast.setValue(contrast)
     CORE.Variable.brightness_contrast_map[CORE.Variable.current_file_full_path] = (brightness, contrast)
+    # The dialog is only needed to apply adjusted values, the pixels shown otherwise are the decoded image
     if brightness is not None or contrast is not None:
-        dialog.on_new_value()
+        dialog = BrightnessContrastDialog(CORE.Variable.image)
+        dialog.set_values(brightness, contrast)
     paint_canvas()
     add_recent_file(CORE.Variable.current_file_full_path)
     toggle_zoom_related_action(True)
@@ -283,9 +511,37 @@ def load_file(filename: str = None):
     else:
         msg = f"Loaded {basename}"
     CORE.Object.status_bar.showMessage(msg)
+    prefetch_images()
     return True
 
 
+def prefetch_images():
+    """
+    Read and decode in the background the images likely to be opened after the current one: the next ones in the
+    direction of navigation and the one before.
+    """
+    count = CORE.Variable.settings.get("prefetch_count", 2)
+    if count <= 0 or CORE.Variable.current_file_full_path not in CORE.Variable.image_list:
+        return
+    current_index = CORE.Variable.image_list.index(CORE.Variable.current_file_full_path)
+    step = 1
+    if CORE.Variable.last_image_index is not None and CORE.Variable.last_image_index > current_index:
+        step = -1
+    CORE.Variable.last_image_index = current_index
+
+    indexes = []
+    index = current_index
+    for _ in range(count):
+        index = get_visible_index(index + step, step)
+        if index is None:
+            break
+        indexes.append(index)
+    index = get_visible_index(current_index - step, -step)
+    if index is not None:
+        indexes.append(index)
+    CORE.Object.image_prefetcher.prefetch([CORE.Variable.image_list[i] for i in indexes], CORE.Variable.output_dir)
+
+
 def open_labeled_image(end_index, step, need_load=True) -> None:
     """
     Open next or previous image
@@ -298,12 +554,15 @@ def open_labeled_image(end_index, step, need_load=True) -> None:
     if not utils.qt_utils.may_continue():
         return
     current_index = CORE.Variable.image_list.index(CORE.Variable.current_file_full_path)
-    for i in range(current_index + step, end_index, step):
-        if CORE.Object.info_file_list_widget.item(i).checkState() == Qt.Checked:
+    # Jumps from labeled image to labeled image, skipping those hidden by the file search
+    i = CORE.Variable.image_list.find_labeled(current_index + step, step)
+    while i is not None and (i < end_index if step > 0 else i > end_index):
+        if not CORE.Object.info_file_list_widget.isRowHidden(i):
             CORE.Variable.current_file_full_path = CORE.Variable.image_list[i]
             if CORE.Variable.current_file_full_path and need_load:
                 load_file(CORE.Variable.current_file_full_path)
             break
+        i = CORE.Variable.image_list.find_labeled(i + step, step)
 
 
 def open_next_image(need_load=True) -> None:
@@ -320,14 +579,16 @@ def open_next_image(need_load=True) -> None:
     if len(CORE.Variable.image_list) <= 0:
         return
 
+    # Images hidden by the file search are skipped
     if CORE.Variable.current_file_full_path is None:
-        filename = CORE.Variable.image_list[0]
+        next_index = get_visible_index(0, 1)
+        if next_index is None:
+            return
+        filename = CORE.Variable.image_list[next_index]
     else:
         current_index = CORE.Variable.image_list.index(CORE.Variable.current_file_full_path)
-        if current_index + 1 < len(CORE.Variable.image_list):
-            filename = CORE.Variable.image_list[current_index + 1]
-        else:
-            filename = CORE.Variable.image_list[-1]
+        next_index = get_visible_index(current_index + 1, 1)
+        filename = CORE.Variable.image_list[next_index if next_index is not None else current_index]
     CORE.Variable.current_file_full_path = filename
 
     if CORE.Variable.current_file_full_path and need_load:
@@ -352,8 +613,9 @@ def open_prev_image():
         return
 
     current_index = CORE.Variable.image_list.index(CORE.Variable.current_file_full_path)
-    if current_index - 1 >= 0:
-        filename = CORE.Variable.image_list[current_index - 1]
+    prev_index = get_visible_index(current_index - 1, -1)
+    if prev_index is not None:
+        filename = CORE.Variable.image_list[prev_index]
         if filename:
             load_file(filename)
 
@@ -387,23 +649,108 @@ def load_image_folder(dir_path, pattern=None, need_load=True):
 
     CORE.Variable.last_open_dir_path = dir_path
     CORE.Variable.current_file_full_path = None
+    CORE.Variable.last_image_index = None
+    CORE.Object.image_prefetcher.clear()
     CORE.Object.info_file_list_widget.clear()
-    for filename in walkthrough_files_in_dir(dir_path):
+    if CORE.Variable.annotation_catalog is not None:
+        CORE.Variable.annotation_catalog.close()
+    # Only the directories changed since the folder was last opened are listed
+    CORE.Variable.annotation_catalog = AnnotationCatalog(dir_path, get_image_extensions(), CORE.Variable.output_dir)
+    CORE.Variable.label_index = LabelIndex(CORE.Object.info_file_list_widget.images)
+    for entry in CORE.Variable.annotation_catalog.scan():
+        filename = entry.path
         if pattern and pattern not in filename:
             continue
-        label_file = os.path.splitext(filename)[0] + ".json"
-        if CORE.Variable.output_dir:
-            label_file = os.path.join(CORE.Variable.output_dir, os.path.basename(label_file))
+        CORE.Variable.label_index.add(entry)
         item = QtWidgets.QListWidgetItem(filename)
         item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-        if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
+        if entry.is_labeled:
             item.setCheckState(Qt.Checked)
         else:
             item.setCheckState(Qt.Unchecked)
         CORE.Object.info_file_list_widget.addItem(item)
+    filter_file_list()
+    watch_image_folder()
     open_next_image(need_load=need_load)
 
 
+def watch_image_folder():
+    """
+    Watch the directories of the opened folder and the annotations directory for changes made by other tools.
+    """
+    CORE.Object.folder_watcher.clear()
+    if not CORE.Variable.settings.get("watch_folder", True) or CORE.Variable.annotation_catalog is None:
+        return
+    dir_mtimes = CORE.Variable.annotation_catalog.get_dirs()
+    if CORE.Variable.output_dir and not os.path.isdir(CORE.Variable.output_dir):
+        dir_mtimes.pop(CORE.Variable.output_dir, None)
+    CORE.Object.folder_watcher.set_dirs(dir_mtimes)
+
+
+def on_folder_changed(dir_paths):
+    """
+    Apply the images and label files added, removed or modified in the opened folder to the file list, only the
+    reported directories are listed again.
+    """
+    catalog = CORE.Variable.annotation_catalog
+    index = CORE.Variable.label_index
+    widget = CORE.Object.info_file_list_widget
+    if catalog is None or index is None or len(index) != widget.count():
+        return
+    try:
+        entries, removed = catalog.update_dirs(dir_paths)
+    except Exception as e:
+        logger.error(f"Failed updating the file list: {e}")
+        return
+
+    images = widget.images
+    # Rows are looked up before the list changes, the rows by path are then rebuilt once by the next lookup
+    new_entries = []
+    for entry in entries:
+        index.add(entry)
+        row = images.get_row(entry.path)
+        if row is None:
+            new_entries.append(entry)
+        else:
+            widget.item(row).setCheckState(Qt.Checked if entry.is_labeled else Qt.Unchecked)
+    # The image being labeled stays in the list until the folder is opened again
+    removed = [path for path in removed if path != CORE.Variable.current_file_full_path]
+    removed_rows = [images.get_row(path) for path in removed]
+    for row in sorted((row for row in removed_rows if row is not None), reverse=True):
+        widget.takeItem(row)
+    for path in removed:
+        index.remove(path)
+
+    # Natural order, by binary search on the paths already listed. Entries are sorted, each is inserted after the
+    # ones before it.
+    keys = {}
+
+    def get_key(path):
+        if path not in keys:
+            keys[path] = catalog.get_sort_key(path)
+        return keys[path]
+
+    rows = []
+    for entry in new_entries:
+        key = get_key(entry.path)
+        low, high = rows[-1] if rows else 0, len(images)
+        while low < high:
+            middle = (low + high) // 2
+            if get_key(images[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        rows.append(low)
+    for i, (row, entry) in enumerate(zip(rows, new_entries)):
+        item = QtWidgets.QListWidgetItem(entry.path)
+        item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
+        item.setCheckState(Qt.Checked if entry.is_labeled else Qt.Unchecked)
+        widget.insertItem(row + i, item)
+    if entries or removed:
+        filter_file_list()
+    CORE.Object.folder_watcher.add_dirs(catalog.get_dirs())
+
+
 def open_video():
     if not utils.qt_utils.may_continue():
         return
@@ -437,6 +784,7 @@ def add_recent_file(filename: str):
     elif len(CORE.Variable.recent_files) > 10:
         CORE.Variable.recent_files.pop()
     CORE.Variable.recent_files.insert(0, filename)
+    CORE.Variable.settings.set("recent_files", list(CORE.Variable.recent_files))
 
 
 def update_file_menu():
@@ -478,7 +826,7 @@ def change_output_dir():
 
 
 def get_label_file():
-    if CORE.Variable.current_file_full_path.lower().endswith(".json"):
+    if LabelFile.is_label_file(CORE.Variable.current_file_full_path):
         label_file = CORE.Variable.current_file_full_path
     else:
         label_file = os.path.splitext(CORE.Variable.current_file_full_path)[0] + ".json"
@@ -486,7 +834,7 @@ def get_label_file():
 
 
 def get_image_file():
-    if not CORE.Variable.current_file_full_path.lower().endswith(".json"):
+    if not LabelFile.is_label_file(CORE.Variable.current_file_full_path):
         image_file = CORE.Variable.current_file_full_path
     else:
         image_file = CORE.Variable.image_path
@@ -504,13 +852,21 @@ def delete_label_file():
     if answer != QtWidgets.QMessageBox.Yes:
         return
 
-    label_file = get_label_file()
-    if os.path.exists(label_file):
-        os.remove(label_file)
-        logger.info("Label file is removed: %s", label_file)
+    # A pending auto save would write the label file again
+    CORE.Object.auto_save_writer.cancel()
+    discard_journal()
+    label_file = LabelFile.find_label_file(get_label_file())
+    if label_file is not None:
+        # Remove the label file in every format, an older one would be loaded otherwise
+        while label_file is not None:
+            with own_changes(label_file):
+                os.remove(label_file)
+            logger.info("Label file is removed: %s", label_file)
+            label_file = LabelFile.find_label_file(label_file)
 
         item = CORE.Object.info_file_list_widget.currentItem()
         item.setCheckState(Qt.Unchecked)
+        refresh_catalog(CORE.Variable.current_file_full_path)
 
         filename = CORE.Variable.current_file_full_path
         reset_state()
@@ -533,6 +889,8 @@ def delete_image_file():
     if answer != QtWidgets.QMessageBox.Yes:
         return
 
+    CORE.Object.auto_save_writer.cancel()
+    discard_journal()
     image_file = get_image_file()
     if os.path.exists(image_file):
         image_path, image_name = os.path.split(image_file)
@@ -542,10 +900,11 @@ def delete_image_file():
         if CORE.Variable.output_dir:
             label_dir_path = CORE.Variable.output_dir
         label_name = os.path.splitext(image_name)[0] + ".json"
-        label_file = os.path.join(label_dir_path, label_name)
-        if os.path.exists(label_file):
+        label_file = LabelFile.find_label_file(os.path.join(label_dir_path, label_name))
+        while label_file is not None:
             os.remove(label_file)
-            logger.info("Label file is removed: %s", image_file)
+            logger.info("Label file is removed: %s", label_file)
+            label_file = LabelFile.find_label_file(label_file)
 
         if CORE.Variable.current_file_full_path is None:
             filename = CORE.Variable.image_list[0]
@@ -569,6 +928,7 @@ def delete_image_file():
 def close_file():
     if not utils.qt_utils.may_continue():
         return
+    compact_journal()
     reset_state()
     set_clean()
     toggle_zoom_related_action(False)
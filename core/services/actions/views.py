@@ -4,16 +4,13 @@ from PyQt5.QtCore import Qt
 from core.configs.core import CORE
 from core.views.dialogs.brightness_contrast_dialog import BrightnessContrastDialog
 from core.views.dialogs.cross_line_style_dialog import CrossLineStyleDialog
-from utils.image import img_data_to_pil
 
 
 def set_brightness_contrast():
-    dialog = BrightnessContrastDialog(img_data_to_pil(CORE.Variable.image_data))
+    dialog = BrightnessContrastDialog(CORE.Variable.image)
     brightness, contrast = CORE.Variable.brightness_contrast_map.get(CORE.Variable.current_file_full_path, (None, None))
-    if brightness is not None:
-        dialog.slider_brightness.setValue(brightness)
-    if contrast is not None:
-        dialog.slider_contrast.setValue(contrast)
+    if brightness is not None or contrast is not None:
+        dialog.set_values(brightness, contrast)
     dialog.exec_()
 
     brightness = dialog.slider_brightness.value()
@@ -0,0 +1,140 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from PyQt5 import QtCore
+
+from utils.logger import logger
+
+
+class AutoSaveWriter(QtCore.QObject):
+    """
+    Save labels in the background, collapsing bursts of edits into one write.
+
+    `schedule` (re)starts a debounce timer on the GUI thread. When it fires, the labels are snapshotted on the GUI
+    thread, where the widgets live, and handed to a writer thread which serializes and writes them. Snapshots of a
+    file that were not written yet are replaced by newer ones.
+
+    Usage:
+        writer = AutoSaveWriter(snapshot_labels, write_labels, delay=500)
+        writer.saved.connect(on_labels_saved)
+        writer.schedule(label_file)  # after every edit
+        writer.flush()  # before switching files and on exit
+    """
+
+    # (snapshot, result of `write`), emitted on the GUI thread
+    saved = QtCore.pyqtSignal(object, object)
+    # (label file, error message), emitted on the GUI thread
+    failed = QtCore.pyqtSignal(str, str)
+
+    def __init__(self, snapshot: Callable[[str], Optional[dict]], write: Callable[[dict], object], delay: int = 500, parent=None):
+        """
+        Args:
+            snapshot: called on the GUI thread with the label file, returns the data to write or None to skip
+            write: called on the writer thread with a snapshot, serializes and writes it
+            delay: milliseconds without edits before the labels are saved
+        """
+        super().__init__(parent)
+        self._snapshot = snapshot
+        self._write = write
+        self._filename: Optional[str] = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._submit)
+        self._condition = threading.Condition()
+        # Snapshots waiting for the writer thread, by label file
+        self._pending: Dict[str, dict] = {}
+        self._writing = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def delay(self) -> int:
+        return self._timer.interval()
+
+    @delay.setter
+    def delay(self, value: int):
+        self._timer.setInterval(value)
+
+    def schedule(self, filename: str):
+        """
+        Save the labels to `filename` once no edit happened for `delay` milliseconds.
+        """
+        if self._filename is not None and self._filename != filename:
+            self._submit()
+        self._filename = filename
+        self._timer.start()
+
+    def _submit(self):
+        self._timer.stop()
+        filename, self._filename = self._filename, None
+        if filename is None:
+            return
+        snapshot = self._snapshot(filename)
+        if snapshot is None:
+            return
+        with self._condition:
+            self._pending[filename] = snapshot
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="AutoSaveWriter", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                filename = next(iter(self._pending))
+                snapshot = self._pending.pop(filename)
+                self._writing = True
+            try:
+                result = self._write(snapshot)
+            except Exception as e:
+                logger.error(f"Error auto saving {filename}: {e}")
+                self.failed.emit(filename, str(e))
+            else:
+                self.saved.emit(snapshot, result)
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def wait(self):
+        """
+        Block until every submitted snapshot is written.
+        """
+        with self._condition:
+            while self._pending or self._writing:
+                self._condition.wait()
+
+    def flush(self):
+        """
+        Save the scheduled labels now and wait until they are written, e.g. before the labels are replaced.
+        """
+        self._submit()
+        self.wait()
+
+    def cancel(self):
+        """
+        Drop the scheduled save and wait for the submitted ones, before the labels are saved synchronously.
+        """
+        self._timer.stop()
+        self._filename = None
+        self.wait()
+
+    def close(self):
+        """
+        Flush and stop the writer thread.
+        """
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # A later submit starts a new writer thread
+        self._closed = False
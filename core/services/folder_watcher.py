@@ -0,0 +1,136 @@
+import contextlib
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+from PyQt5 import QtCore
+
+
+def _stat_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class FolderWatcher(QtCore.QObject):
+    """
+    Report the directories of the opened folder changed on disk, e.g. by other tools adding images or label files.
+
+    Changes are collected until none happened for `delay` milliseconds, so that a burst of files written by a
+    prelabeling job is handled at once.
+
+    Directories are watched with their modification time as of the last time the file list was updated from them.
+    Files written by the tool itself, e.g. label files and edit journals, are written within `own_changes`, which
+    moves that time forward when nothing else changed the directory before. A directory whose modification time is
+    then still the recorded one only had our own changes and is not reported, they are already in the file list.
+
+    Usage:
+        watcher = FolderWatcher(delay=500)
+        watcher.changed.connect(on_folder_changed)
+        watcher.set_dirs(catalog.get_dirs())
+        with watcher.own_changes(label_dir):
+            label_file.save(...)
+    """
+
+    # sorted list of changed directories, emitted on the GUI thread
+    changed = QtCore.pyqtSignal(list)
+
+    def __init__(self, delay: int = 500, parent=None):
+        super().__init__(parent)
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._emit_changed)
+        self._changed: Set[str] = set()
+        # Modification times of the watched directories, see `own_changes`, guarded by `_lock`
+        self._mtimes: Dict[str, Optional[int]] = {}
+        # Directories whose modification time was moved forward by own changes since they were last reported
+        self._own: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def get_dirs(self) -> List[str]:
+        return self._watcher.directories()
+
+    def set_dirs(self, dir_mtimes: Dict[str, Optional[int]]):
+        """
+        Watch only the directories of `dir_mtimes`, changes reported for the previous directories are dropped.
+
+        Args:
+            dir_mtimes: {directory: modification time the file list is up to date with}
+        """
+        self.clear()
+        self.add_dirs(dir_mtimes)
+
+    def add_dirs(self, dir_mtimes: Dict[str, Optional[int]]):
+        """
+        Watch more directories, or record the modification times the file list was just updated with.
+        """
+        with self._lock:
+            self._mtimes.update(dir_mtimes)
+            self._own.difference_update(dir_mtimes)
+        watched = set(self._watcher.directories())
+        dir_paths = [path for path in dir_mtimes if path not in watched]
+        if dir_paths:
+            self._watcher.addPaths(dir_paths)
+
+    def remove_dirs(self, dir_paths: List[str]):
+        with self._lock:
+            for path in dir_paths:
+                self._mtimes.pop(path, None)
+                self._own.discard(path)
+        watched = set(self._watcher.directories())
+        dir_paths = [path for path in dir_paths if path in watched]
+        if dir_paths:
+            self._watcher.removePaths(dir_paths)
+
+    def clear(self):
+        self._timer.stop()
+        self._changed.clear()
+        with self._lock:
+            self._mtimes.clear()
+            self._own.clear()
+        if self._watcher.directories():
+            self._watcher.removePaths(self._watcher.directories())
+
+    @contextlib.contextmanager
+    def own_changes(self, dir_path: str):
+        """
+        Changes made to `dir_path` by the tool itself within this context are not reported. May be used on any thread.
+
+        A change made by another tool while the context is open is not told apart, it is as short as a file write.
+        """
+        before = _stat_mtime(dir_path)
+        try:
+            yield
+        finally:
+            after = _stat_mtime(dir_path)
+            with self._lock:
+                if dir_path in self._mtimes:
+                    if before is not None and self._mtimes[dir_path] == before:
+                        self._mtimes[dir_path] = after
+                        if after != before:
+                            self._own.add(dir_path)
+                    else:
+                        # Changed by something else before, it is listed again when reported
+                        self._mtimes[dir_path] = None
+
+    def _on_directory_changed(self, path: str):
+        self._changed.add(path)
+        self._timer.start()
+
+    def _emit_changed(self):
+        changed, self._changed = self._changed, set()
+        dir_paths = []
+        with self._lock:
+            for path in sorted(changed):
+                own = path in self._own
+                self._own.discard(path)
+                mtime = self._mtimes.get(path)
+                if own and mtime is not None and _stat_mtime(path) == mtime:
+                    continue
+                dir_paths.append(path)
+        if dir_paths:
+            self.changed.emit(dir_paths)
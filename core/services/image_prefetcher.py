@@ -0,0 +1,182 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from core.dto.exceptions import LabelFileError
+from core.dto.label_file import LabelFile
+from utils.edit_journal import EditJournal
+from utils.image import DecodedImage
+from utils.logger import logger
+
+
+def _stat_signature(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_label_file_path(filename: str, output_dir: Optional[str] = None) -> str:
+    """
+    Label file of an image in the default format, whether it exists or not.
+    """
+    label_file = os.path.splitext(filename)[0] + ".json"
+    if output_dir:
+        label_file = os.path.join(output_dir, os.path.basename(label_file))
+    return label_file
+
+
+def get_signature(filename: str, output_dir: Optional[str] = None) -> tuple:
+    """
+    Modification times and sizes of an image, its label file and edit journal, which change when any is written.
+    """
+    label_file = LabelFile.find_label_file(get_label_file_path(filename, output_dir))
+    journal = EditJournal.get_path(label_file) if label_file is not None else None
+    return _stat_signature(filename), label_file, _stat_signature(label_file), _stat_signature(journal)
+
+
+class LoadedImage:
+    """
+    An image and its label file read from disk and decoded, ready to be shown.
+    """
+
+    def __init__(self, filename: str, output_dir: Optional[str] = None):
+        self.filename = filename
+        self.output_dir = output_dir
+        # Taken before reading, a file written meanwhile makes the image stale rather than being missed
+        self.signature = get_signature(filename, output_dir)
+        self.label_file_path: Optional[str] = self.signature[1]
+        self.label_file: Optional[LabelFile] = None
+        self.image_data: Optional[bytes] = None
+        self.image_path: Optional[str] = None
+        self.image: DecodedImage = DecodedImage()
+        self.error: Optional[LabelFileError] = None
+        self._read()
+
+    def _read(self):
+        if self.label_file_path is not None:
+            image_dir = os.path.dirname(self.filename) if self.output_dir else None
+            try:
+                self.label_file = LabelFile(self.label_file_path, image_dir)
+                self.image_data = self.label_file.image_data
+            except LabelFileError as e:
+                self.error = e
+                return
+            self.image_path = os.path.join(os.path.dirname(self.label_file_path), self.label_file.image_path)
+        else:
+            self.image_data = LabelFile.load_image_file(self.filename)
+            if self.image_data:
+                self.image_path = self.filename
+        if self.image_data:
+            self.image = DecodedImage(self.image_data)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.image_data or b"") + self.image.sizeInBytes()
+
+    def is_stale(self) -> bool:
+        return get_signature(self.filename, self.output_dir) != self.signature
+
+
+class ImagePrefetcher:
+    """
+    Read and decode the images likely to be opened next on worker threads, keeping them in an LRU cache bounded in
+    bytes of decoded pixels and image data.
+
+    Entries are checked against the modification times of the image, its label file and edit journal when taken,
+    so that labels saved since they were read are read again. Taking an entry removes it, the label file it holds is
+    then edited by its user.
+
+    Usage:
+        prefetcher = ImagePrefetcher(max_bytes=512 * 1024 * 1024)
+        loaded = prefetcher.take(filename) or LoadedImage(filename)
+        prefetcher.prefetch([next_file, next_next_file, prev_file])
+    """
+
+    def __init__(self, max_bytes: int, workers: int = 2):
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImagePrefetcher")
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[tuple, LoadedImage]" = OrderedDict()
+        self._size = 0
+        self._futures: Dict[tuple, Future] = {}
+        # Bumped by `clear`, images read before are not cached
+        self._generation = 0
+
+    def _load(self, key: tuple, generation: int) -> Optional[LoadedImage]:
+        try:
+            loaded = LoadedImage(*key)
+        except Exception as e:
+            logger.warning(f"Failed prefetching {key[0]}: {e}")
+            loaded = None
+        with self._lock:
+            self._futures.pop(key, None)
+            if loaded is not None and generation == self._generation:
+                self._put(key, loaded)
+        return loaded
+
+    def _put(self, key: tuple, loaded: LoadedImage):
+        if key in self._cache:
+            self._size -= self._cache.pop(key).nbytes
+        if loaded.nbytes > self.max_bytes:
+            return
+        self._cache[key] = loaded
+        self._size += loaded.nbytes
+        while self._size > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._size -= evicted.nbytes
+
+    def prefetch(self, filenames: Iterable[str], output_dir: Optional[str] = None):
+        """
+        Read `filenames` in the background, most likely to be opened first. Queued reads of other images are
+        cancelled.
+        """
+        keys = [(filename, output_dir) for filename in filenames]
+        with self._lock:
+            for key, future in list(self._futures.items()):
+                if key not in keys and future.cancel():
+                    del self._futures[key]
+            for key in keys:
+                if key in self._cache or key in self._futures:
+                    continue
+                self._futures[key] = self._executor.submit(self._load, key, self._generation)
+
+    def take(self, filename: str, output_dir: Optional[str] = None) -> Optional[LoadedImage]:
+        """
+        Remove the prefetched image from the cache, waiting for it if it is being read.
+
+        Returns:
+            Optional[LoadedImage]: None if the image was not prefetched or changed since
+        """
+        key = (filename, output_dir)
+        with self._lock:
+            future = self._futures.pop(key, None)
+            loaded = self._cache.pop(key, None)
+            if loaded is not None:
+                self._size -= loaded.nbytes
+        if loaded is None and future is not None and not future.cancel():
+            loaded = future.result()
+            with self._lock:
+                if self._cache.get(key) is loaded:
+                    self._size -= self._cache.pop(key).nbytes
+        if loaded is None or loaded.is_stale():
+            return None
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._cache.clear()
+            self._size = 0
+            self._generation += 1
+
+    def close(self):
+        self.clear()
+        self._executor.shutdown(wait=True)
@@ -31,8 +31,4 @@ def label_order_changed():
 
 
 def file_search_changed():
-    files_action.load_image_folder(
-        dir_path=CORE.Variable.last_open_dir_path,
-        pattern=CORE.Object.info_file_search_widget.text(),
-        need_load=False
-    )
+    files_action.filter_file_list(CORE.Object.info_file_search_widget.text())
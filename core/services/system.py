@@ -22,13 +22,26 @@ def get_instruction_label():
         return shortcuts
 
 
+def get_image_label_file():
+    """
+    Label file the labels of the current image are saved to.
+    """
+    label_file = f"{os.path.splitext(CORE.Variable.image_path)[0]}.json"
+    if CORE.Variable.output_dir:
+        label_file = os.path.join(CORE.Variable.output_dir, os.path.basename(label_file))
+    return label_file
+
+
 def set_dirty():
     CORE.Action.undo.setEnabled(CORE.Object.canvas.is_shape_restorable)
+    label_file = get_image_label_file()
+    journal = CORE.Variable.edit_journal
+    if journal is not None:
+        files.journal_labels(label_file)
     if CORE.Variable.settings.get("auto_save", True):
-        label_file = f"{os.path.splitext(CORE.Variable.image_path)[0]}.json"
-        if CORE.Variable.output_dir:
-            label_file = os.path.join(CORE.Variable.output_dir, os.path.basename(label_file))
-        files.save_labels(label_file)
+        # Written in the background once the edits settle, with a journal only once it grew large
+        if journal is None or journal.size >= CORE.Variable.settings.get("edit_journal_compact_size", 1024 * 1024):
+            CORE.Object.auto_save_writer.schedule(label_file)
         return
     CORE.Variable.is_dirty = True
     CORE.Action.save_file.setEnabled(True)
@@ -62,6 +75,8 @@ def set_clean():
 
 
 def reset_state():
+    # Labels scheduled to be auto saved would be snapshotted from the cleared state otherwise
+    CORE.Object.auto_save_writer.flush()
     CORE.Object.label_list_widget.clear()
     CORE.Variable.current_file_full_path = None
     CORE.Variable.image_path = None
@@ -76,12 +91,11 @@ def has_label_file():
     if CORE.Variable.current_file_full_path is None:
         return False
 
-    label_file = get_label_file()
-    return os.path.exists(label_file)
+    return LabelFile.find_label_file(get_label_file()) is not None
 
 
 def get_label_file():
-    if CORE.Variable.current_file_full_path.lower().endswith(".json"):
+    if LabelFile.is_label_file(CORE.Variable.current_file_full_path):
         label_file = CORE.Variable.current_file_full_path
     else:
         label_file = os.path.splitext(CORE.Variable.current_file_full_path)[0] + ".json"
@@ -359,10 +373,11 @@ def update_attributes(i: int):
 
 
 def save_attributes(_shapes):
-    filename = os.path.splitext(CORE.Variable.image_path)[0] + ".json"
-    if CORE.Variable.output_dir:
-        label_file_without_path = os.path.basename(filename)
-        filename = os.path.join(CORE.Variable.output_dir, label_file_without_path)
+    if CORE.Variable.edit_journal is not None:
+        # Journaled like any other edit instead of rewriting the label file
+        set_dirty()
+        return True
+    filename = get_image_label_file()
     label_file = LabelFile()
 
     def format_shape(s):
@@ -399,6 +414,7 @@ def save_attributes(_shapes):
         flag = item.checkState() == Qt.Checked
         flags[key] = flag
     try:
+        CORE.Object.auto_save_writer.cancel()
         if os.path.dirname(filename) and not os.path.exists(os.path.dirname(filename)):
             os.makedirs(os.path.dirname(filename))
         label_file.save(
@@ -410,13 +426,13 @@ def save_attributes(_shapes):
             image_width=CORE.Variable.image.width(),
             other_data=CORE.Variable.other_data,
             flags=flags,
+            label_format=CORE.Variable.settings.get("label_format", "json"),
+            image_data_store=CORE.Variable.settings.get("image_data_store", "blob"),
         )
         CORE.Variable.label_file = label_file
-        items = CORE.Object.info_file_list_widget.findItems(CORE.Variable.image_path, Qt.MatchExactly)
-        if len(items) > 0:
-            if len(items) != 1:
-                raise RuntimeError("There are duplicate files.")
-            items[0].setCheckState(Qt.Checked)
+        item = CORE.Object.info_file_list_widget.find_item(CORE.Variable.image_path)
+        if item is not None:
+            item.setCheckState(Qt.Checked)
         return True
     except LabelFileError as e:
         QtWidgets.QMessageBox.critical(
@@ -6,6 +6,7 @@ from core.services import system
 from core.services.actions.edit import edit_label
 from core.services.signals import files as files_signal
 from core.services.signals.views.area.information import label_selection_changed, label_item_changed, label_order_changed, file_search_changed
+from core.views.modules.file_list_widget import FileListWidget
 from core.views.modules.label_filter_combo_box import LabelFilterComboBox
 from core.views.modules.label_list_widget import LabelListWidget
 from core.views.modules.unique_label_list_widget import UniqueLabelListWidget
@@ -156,11 +157,20 @@ class InformationArea(QtWidgets.QWidget):
     def generate_file_dock(self):
         file_search = QtWidgets.QLineEdit()
         file_search.setObjectName("FileSearch")
-        file_search.setPlaceholderText(self.tr("Search Filename"))
-        file_search.textChanged.connect(file_search_changed)
+        file_search.setPlaceholderText(self.tr("Search Filename / label:car / shapes>10"))
+        file_search.setToolTip(self.tr(
+            "Terms separated by spaces must all match:\n"
+            "label:car, type:polygon, shapes>10 (>, >=, <, <=, =), labeled, unlabeled, or part of the filename"
+        ))
+        # The file list is filtered once typing pauses
+        file_search_timer = QtCore.QTimer(self)
+        file_search_timer.setSingleShot(True)
+        file_search_timer.setInterval(300)
+        file_search_timer.timeout.connect(file_search_changed)
+        file_search.textChanged.connect(lambda _: file_search_timer.start())
         CORE.Object.info_file_search_widget = file_search
 
-        file_list_widget = QtWidgets.QListWidget()
+        file_list_widget = FileListWidget()
         file_list_widget.setObjectName("FileList")
         file_list_widget.itemSelectionChanged.connect(files_signal.file_selection_changed)
         CORE.Object.info_file_list_widget = file_list_widget
@@ -68,6 +68,13 @@ class FileMenu(BaseMenu):
                 "Save labels to a different file",
                 enabled=False
             ),
+            "export_portable_label_file": self.menu_action(
+                "Export Portable Label File...",
+                files_action.export_portable_label_file,
+                None,
+                "save-as",
+                "Export the label file to JSON with its image data embedded",
+            ),
             "auto_save": self.menu_action(
                 text="Save &Automatically",
                 slot=lambda x: CORE.Variable.settings.set("auto_save", x),
@@ -1,36 +1,47 @@
-import PIL.Image
-import PIL.ImageEnhance
+import math
+
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtWidgets import QDialog, QWidget, QLabel, QHBoxLayout, QPushButton, QVBoxLayout, QSlider, QMessageBox
+from PyQt5.QtWidgets import QDialog, QWidget, QLabel, QHBoxLayout, QPushButton, QVBoxLayout, QSlider, QMessageBox, QApplication
 
 from core.configs.core import CORE
+from utils.image import DecodedImage, get_auto_contrast, get_brightness_contrast_lut
 from utils.logger import logger
 
 
 class BrightnessContrastDialog(QDialog):
-    def __init__(self, img):
+    """
+    Adjust brightness and contrast of the current image with a lookup table. While a slider is dragged the table is
+    applied to a proxy of the image at screen resolution, the full image is only adjusted when it is released.
+    """
+
+    def __init__(self, image):
         super(BrightnessContrastDialog, self).__init__(CORE.Object.main_window)
         self.setModal(True)
         self.setWindowTitle("Brightness/Contrast")
 
-        if not isinstance(img, PIL.Image.Image):
-            logger.error("Image must be PIL.Image")
+        if not isinstance(image, DecodedImage):
+            logger.error("Image must be DecodedImage")
             QMessageBox.critical(
                 CORE.Object.main_window,
                 "Error opening file",
-                "Image must be PIL.Image",
+                "Image must be DecodedImage",
                 QMessageBox.Ok
             )
             return
 
-        self.img = img
-        self.original_img = img.copy()
+        self.image = image
+        # Never modified, adjustments are applied to new images
+        self.img = image.to_pil()
+        # Downscaled image previewed while dragging, created when a slider is first pressed
+        self.proxy_img = None
 
         # Brightness slider and label
         self.slider_brightness = self.__create_slider()
         self.brightness_label = QLabel(f"{self.slider_brightness.value() / 50:.2f}")
         self.slider_brightness.valueChanged.connect(self.update_brightness_label)
+        self.slider_brightness.sliderPressed.connect(self.get_proxy_img)
+        self.slider_brightness.sliderReleased.connect(self.on_new_value)
 
         brightness_layout = QHBoxLayout()
         brightness_layout.addWidget(QLabel(self.tr("Brightness: ")))
@@ -44,6 +55,8 @@ class BrightnessContrastDialog(QDialog):
         self.slider_contrast = self.__create_slider()
         self.contrast_label = QLabel(f"{self.slider_contrast.value() / 50:.2f}")
         self.slider_contrast.valueChanged.connect(self.update_contrast_label)
+        self.slider_contrast.sliderPressed.connect(self.get_proxy_img)
+        self.slider_contrast.sliderReleased.connect(self.on_new_value)
 
         contrast_layout = QHBoxLayout()
         contrast_layout.addWidget(QLabel(self.tr("Contrast:    ")))
@@ -53,6 +66,10 @@ class BrightnessContrastDialog(QDialog):
         contrast_widget = QWidget()
         contrast_widget.setLayout(contrast_layout)
 
+        # Auto contrast button
+        self.auto_button = QPushButton(self.tr("Auto"))
+        self.auto_button.clicked.connect(self.auto_contrast)
+
         # Reset button
         self.reset_button = QPushButton(self.tr("Reset"))
         self.reset_button.clicked.connect(self.reset_values)
@@ -63,6 +80,7 @@ class BrightnessContrastDialog(QDialog):
 
         # Buttons layout
         buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.auto_button)
         buttons_layout.addWidget(self.reset_button)
         buttons_layout.addWidget(self.confirm_button)
 
@@ -88,25 +106,62 @@ class BrightnessContrastDialog(QDialog):
         self.contrast_label.setText(f"{value / 50:.2f}")
         self.on_new_value()
 
-    def on_new_value(self):
+    def set_values(self, brightness=None, contrast=None):
+        """
+        Set the sliders and adjust the image once.
+
+        Args:
+            brightness: brightness slider value, None to keep it
+            contrast: contrast slider value, None to keep it
+        """
+        for slider, value in ((self.slider_brightness, brightness), (self.slider_contrast, contrast)):
+            if value is not None:
+                slider.blockSignals(True)
+                slider.setValue(value)
+                slider.blockSignals(False)
+        self.brightness_label.setText(f"{self.slider_brightness.value() / 50:.2f}")
+        self.contrast_label.setText(f"{self.slider_contrast.value() / 50:.2f}")
+        self.on_new_value()
+
+    def get_lut(self):
+        """
+        Lookup table of the RGBA bands for the slider values, alpha is kept.
+        """
         brightness = self.slider_brightness.value() / 50.0
         contrast = self.slider_contrast.value() / 50.0
+        histogram = self.image.get_histogram() if contrast != 1 else None
+        return get_brightness_contrast_lut(brightness, contrast, histogram) * 3 + list(range(256))
 
-        img = self.img
-        if brightness != 1:
-            img = PIL.ImageEnhance.Brightness(img).enhance(brightness)
-        if contrast != 1:
-            img = PIL.ImageEnhance.Contrast(img).enhance(contrast)
+    def get_proxy_img(self):
+        if self.proxy_img is None:
+            screen = QApplication.primaryScreen()
+            size = screen.size() * screen.devicePixelRatio() if screen is not None else None
+            factor = math.ceil(max(self.img.width / size.width(), self.img.height / size.height())) if size else 1
+            self.proxy_img = self.img.reduce(factor) if factor > 1 else self.img
+        return self.proxy_img
 
-        img = img.convert("RGB")
-        q_image = QImage(img.tobytes(), img.width, img.height, QImage.Format_RGB888)
-        CORE.Object.canvas.load_pixmap(QPixmap.fromImage(q_image), clear_shapes=False)
+    @staticmethod
+    def __to_pixmap(img):
+        data = img.tobytes()
+        return QPixmap.fromImage(QImage(data, img.width, img.height, img.width * 4, QImage.Format_RGBA8888))
+
+    def on_new_value(self):
+        if self.slider_brightness.isSliderDown() or self.slider_contrast.isSliderDown():
+            CORE.Object.canvas.load_preview(self.__to_pixmap(self.get_proxy_img().point(self.get_lut())))
+            return
+
+        if self.slider_brightness.value() == 50 and self.slider_contrast.value() == 50:
+            pixmap = QPixmap.fromImage(self.image)
+        else:
+            pixmap = self.__to_pixmap(self.img.point(self.get_lut()))
+        CORE.Object.canvas.load_pixmap(pixmap, clear_shapes=False)
+
+    def auto_contrast(self):
+        brightness, contrast = get_auto_contrast(self.image.get_histogram())
+        self.set_values(min(max(round(brightness * 50), 0), 150), min(max(round(contrast * 50), 0), 150))
 
     def reset_values(self):
-        self.slider_brightness.setValue(50)
-        self.slider_contrast.setValue(50)
-        self.img = self.original_img.copy()
-        self.on_new_value()
+        self.set_values(50, 50)
 
     def confirm_values(self):
         self.accept()
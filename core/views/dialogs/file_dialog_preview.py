@@ -5,6 +5,7 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QFileDialog, QVBoxLayout
 
 from core.views.modules.scroll_area_preview import ScrollAreaPreview
+from utils.label_binary import is_binary_label, read_label_binary
 
 
 class FileDialogPreview(QFileDialog):
@@ -25,10 +26,13 @@ class FileDialogPreview(QFileDialog):
         self.currentChanged.connect(self.on_change)
 
     def on_change(self, path):
-        if path.lower().endswith(".json"):
-            with open(path, "r") as f:
-                data = json.load(f)
-                self.label_preview.set_text(json.dumps(data, indent=4, sort_keys=False))
+        if path.lower().endswith(".json") or is_binary_label(path):
+            if is_binary_label(path):
+                data, _ = read_label_binary(path)
+            else:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            self.label_preview.set_text(json.dumps(data, indent=4, sort_keys=False))
             self.label_preview.label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
             self.label_preview.setHidden(False)
         else:
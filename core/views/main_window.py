@@ -3,6 +3,10 @@ from PyQt5.QtWidgets import QMainWindow, QStatusBar, QWidget, QHBoxLayout, QVBox
 import utils
 from core.configs.constants import Constants
 from core.configs.core import CORE
+from core.services.actions import files
+from core.services.auto_save import AutoSaveWriter
+from core.services.folder_watcher import FolderWatcher
+from core.services.image_prefetcher import ImagePrefetcher
 from core.services.system import set_item_description
 from core.views.area.information import InformationArea
 from core.views.area.label import LabelArea
@@ -22,6 +26,24 @@ class MainWindow(QMainWindow):
         self.setObjectName("MainWindow")
         CORE.Object.main_window = self
 
+        auto_save_writer = AutoSaveWriter(files.snapshot_labels, files.write_labels, CORE.Variable.settings.get("auto_save_delay", 500), self)
+        auto_save_writer.saved.connect(files.on_labels_saved)
+        auto_save_writer.failed.connect(files.on_auto_save_failed)
+        CORE.Object.auto_save_writer = auto_save_writer
+        CORE.Variable.settings.writer = AutoSaveWriter(
+            CORE.Variable.settings.snapshot,
+            CORE.Variable.settings.write,
+            CORE.Variable.settings.get("settings_save_delay", 1000),
+            self,
+        )
+        folder_watcher = FolderWatcher(CORE.Variable.settings.get("watch_folder_delay", 500), self)
+        folder_watcher.changed.connect(files.on_folder_changed)
+        CORE.Object.folder_watcher = folder_watcher
+        CORE.Object.image_prefetcher = ImagePrefetcher(
+            CORE.Variable.settings.get("prefetch_cache_size", 512) * 1024 * 1024,
+            CORE.Variable.settings.get("prefetch_workers", 2),
+        )
+
         status_bar = QStatusBar()
         CORE.Object.status_bar = status_bar
         status_bar.showMessage(f"{Constants.APP_NAME} - {Constants.APP_DESCRIPTION}")
@@ -66,10 +88,15 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         if not utils.qt_utils.may_continue():
             event.ignore()
+            return
         CORE.Variable.settings.set("filename", CORE.Variable.current_file_full_path if CORE.Variable.current_file_full_path else "")
-        CORE.Variable.settings.set("window/size", self.size())
-        CORE.Variable.settings.set("window/position", self.pos())
+        CORE.Variable.settings.set("window/size", [self.width(), self.height()])
+        CORE.Variable.settings.set("window/position", [self.x(), self.y()])
         # CORE.Variable.settings.set("window/state", self.parent.parent.saveState())
-        CORE.Variable.settings.set("recent_files", CORE.Variable.recent_files)
+        CORE.Variable.settings.set("recent_files", list(CORE.Variable.recent_files))
+        files.compact_journal()
+        CORE.Object.auto_save_writer.close()
+        CORE.Object.image_prefetcher.close()
 
-        # CORE.Variable.settings.save()
+        CORE.Variable.settings.save()
+        CORE.Variable.settings.writer.close()
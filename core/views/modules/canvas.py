@@ -135,6 +135,8 @@ class Canvas(QWidget):
         self.cross_line: 'CrossLine' = CrossLine()
         # Canvas Pixmap
         self.pixmap: QtGui.QPixmap = QtGui.QPixmap()
+        # Downscaled pixmap drawn over the whole image instead of the pixmap, e.g. while adjusting brightness
+        self.preview_pixmap: Optional[QtGui.QPixmap] = None
         # Operating Line, It means:
         #     Edge from last point to current if create_mode == ShapeType.POLYGON
         #     Diagonal line of the rectangle if create_mode == ShapeType.RECTANGLE
@@ -831,6 +833,7 @@ class Canvas(QWidget):
         """
         self.restore_cursor()
         self.pixmap = None
+        self.preview_pixmap = None
         self.shapes_backups = []
         self.update()
 
@@ -887,10 +890,21 @@ class Canvas(QWidget):
             clear_shapes: Whether it is needed to clear shapes
         """
         self.pixmap = pixmap
+        self.preview_pixmap = None
         if clear_shapes:
             self.shapes = []
         self.update()
 
+    def load_preview(self, pixmap: Optional[QtGui.QPixmap]) -> None:
+        """
+        Show a pixmap of any size in place of the pixmap of current image, shapes and coordinates are unchanged
+
+        Args:
+            pixmap: Preview of current image, None to show the pixmap again
+        """
+        self.preview_pixmap = pixmap
+        self.update()
+
     def load_shapes(self, shapes: List[Shape], replace: bool = True) -> None:
         """
         Load shapes into the current list.
@@ -1494,7 +1508,10 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.get_image_offset_to_center())
 
-        p.drawPixmap(0, 0, self.pixmap)
+        if self.preview_pixmap is not None:
+            p.drawPixmap(QtCore.QRectF(self.pixmap.rect()), self.preview_pixmap, QtCore.QRectF(self.preview_pixmap.rect()))
+        else:
+            p.drawPixmap(0, 0, self.pixmap)
         CORE.Variable.shape_scale = self.scale
 
         # Draw loading/waiting screen
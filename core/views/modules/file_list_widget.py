@@ -0,0 +1,132 @@
+from typing import Dict, List, Optional
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt
+
+
+class FileList:
+    """
+    Paths of the file list in row order, with constant time lookup of a row by path and a bitset of the labeled rows.
+    It is the only record of rows and labeled images, `LabelIndex` refers to it.
+
+    Behaves like the list of paths, `index` and `in` do not scan it.
+    """
+
+    def __init__(self):
+        self._paths: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # One byte per row, 1 if the image is labeled
+        self._labeled = bytearray()
+        # Rows were inserted or removed, the rows by path are rebuilt before they are used
+        self._stale = False
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __getitem__(self, row):
+        return self._paths[row]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __contains__(self, path):
+        return self.get_row(path) is not None
+
+    def index(self, path: str) -> int:
+        row = self.get_row(path)
+        if row is None:
+            raise ValueError(f"{path} is not in the file list")
+        return row
+
+    def get_row(self, path: str) -> Optional[int]:
+        if self._stale:
+            self._rows = {path: row for row, path in enumerate(self._paths)}
+            self._stale = False
+        return self._rows.get(path)
+
+    def append(self, path: str, labeled: bool):
+        self._rows[path] = len(self._paths)
+        self._paths.append(path)
+        self._labeled.append(labeled)
+
+    def insert(self, row: int, path: str, labeled: bool):
+        self._paths.insert(row, path)
+        self._labeled.insert(row, labeled)
+        self._stale = True
+
+    def pop(self, row: int) -> str:
+        del self._labeled[row]
+        self._stale = True
+        return self._paths.pop(row)
+
+    def clear(self):
+        self._paths = []
+        self._rows = {}
+        self._labeled = bytearray()
+        self._stale = False
+
+    def is_labeled(self, row: int) -> bool:
+        return bool(self._labeled[row])
+
+    def set_labeled(self, row: int, labeled: bool):
+        self._labeled[row] = labeled
+
+    def find_labeled(self, start: int, step: int, labeled: bool = True) -> Optional[int]:
+        """
+        First row from `start` on, in the direction of `step`, whose image is labeled or unlabeled as `labeled`.
+
+        Returns:
+            Optional[int]: the row, None if there is none
+        """
+        flag = b"\x01" if labeled else b"\x00"
+        if step > 0:
+            row = self._labeled.find(flag, max(start, 0))
+        elif start >= 0:
+            row = self._labeled.rfind(flag, 0, start + 1)
+        else:
+            row = -1
+        return row if row >= 0 else None
+
+
+class FileListWidget(QtWidgets.QListWidget):
+    """
+    List of the images of the opened folder, checked when they are labeled. `images` indexes the paths of the items,
+    it is kept in sync as long as items are added and removed through this widget.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.images = FileList()
+        self.itemChanged.connect(self._on_item_changed)
+
+    def addItem(self, item):
+        if isinstance(item, str):
+            item = QtWidgets.QListWidgetItem(item)
+        super().addItem(item)
+        self.images.append(item.text(), item.checkState() == Qt.Checked)
+
+    def insertItem(self, row: int, item):
+        if isinstance(item, str):
+            item = QtWidgets.QListWidgetItem(item)
+        row = min(max(row, 0), self.count())
+        super().insertItem(row, item)
+        self.images.insert(row, item.text(), item.checkState() == Qt.Checked)
+
+    def takeItem(self, row: int):
+        item = super().takeItem(row)
+        if item is not None:
+            self.images.pop(row)
+        return item
+
+    def clear(self):
+        super().clear()
+        self.images.clear()
+
+    def find_item(self, path: str) -> Optional[QtWidgets.QListWidgetItem]:
+        row = self.images.get_row(path)
+        return self.item(row) if row is not None else None
+
+    def _on_item_changed(self, item: QtWidgets.QListWidgetItem):
+        row = self.images.get_row(item.text())
+        if row is not None:
+            self.images.set_labeled(row, item.checkState() == Qt.Checked)
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# utils.logger writes to ../logs/app.log relative to the working directory, as when the app runs from core/
+_WORK_DIR = tempfile.mkdtemp(prefix="semi_tests_")
+os.makedirs(os.path.join(_WORK_DIR, "logs"))
+os.makedirs(os.path.join(_WORK_DIR, "run"))
+os.chdir(os.path.join(_WORK_DIR, "run"))
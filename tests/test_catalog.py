@@ -0,0 +1,48 @@
+import json
+import os
+
+from utils.catalog import AnnotationCatalog, summarize_shapes
+from utils.function import get_image_extensions, walkthrough_files_in_dir
+
+IMAGES = [
+    "1.jpg", "10.jpg", "2.jpg", "a.jpg",
+    "sub/b2.jpg", "sub/b2/9.jpeg", "sub/b2/10.png", "sub/b10.png", "sub/b2a.jpg", "sub/b1/3.jpg",
+    "sub/v1.2/1.jpg", "sub/v1.10.jpg", "sub/x.y.d/1.jpg", "sub/x.jpg",
+    "z/2024.01.05/1.jpg", "z/2024.01.5.jpg",
+]
+
+
+def _make_tree(root):
+    for name in IMAGES:
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"")
+
+
+def test_scan_order_matches_walkthrough(tmp_path):
+    root = str(tmp_path)
+    _make_tree(root)
+    catalog = AnnotationCatalog(root, get_image_extensions())
+    expected = walkthrough_files_in_dir(root)
+    assert [entry.path for entry in catalog.scan()] == expected
+    # Ranks are kept in the catalogue, scanning again keeps the order
+    assert [entry.path for entry in AnnotationCatalog(root, get_image_extensions()).scan()] == expected
+    keys = sorted(expected, key=catalog.get_sort_key)
+    assert keys == expected
+
+
+def test_refresh_with_summary(tmp_path):
+    root = str(tmp_path)
+    _make_tree(root)
+    catalog = AnnotationCatalog(root, get_image_extensions())
+    catalog.scan()
+    image_path = os.path.join(root, "a.jpg")
+    shapes = [{"label": "b", "shape_type": "polygon"}, {"label": "a", "shape_type": "rectangle"}]
+    with open(os.path.join(root, "a.json"), "w", encoding="utf-8") as f:
+        json.dump({"shapes": shapes}, f)
+    # The summary is used as is, the label file is not read
+    entry = catalog.refresh(image_path, (5, ["x"], ["point"]))
+    assert (entry.shape_count, entry.labels, entry.shape_types) == (5, ["x"], ["point"])
+    entry = catalog.refresh(image_path)
+    assert (entry.shape_count, entry.labels, entry.shape_types) == summarize_shapes(shapes) == (2, ["a", "b"], ["polygon", "rectangle"])
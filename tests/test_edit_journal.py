@@ -0,0 +1,107 @@
+import json
+
+from utils.edit_journal import EditJournal
+
+
+def _snapshot(shapes, flags=None, keys=None, **other_data):
+    return {
+        "keys": keys if keys is not None else list(range(len(shapes))),
+        "shapes": shapes,
+        "flags": flags or {},
+        "other_data": other_data,
+    }
+
+
+def _shape(label, x=0):
+    return {"label": label, "points": [[x, 0], [x + 1, 1]], "shape_type": "rectangle"}
+
+
+def _write_label_file(path, shapes):
+    data = {"version": "1", "shapes": shapes, "flags": {}, "imagePath": "a.jpg", "imageData": None}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _record_edits(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    shapes = [_shape("a"), _shape("b", 5), _shape("c", 9)]
+    data = _write_label_file(label_file, shapes)
+    journal = EditJournal(EditJournal.get_path(label_file))
+    journal.reset(label_file, _snapshot(shapes, keys=["ka", "kb", "kc"]))
+    # Update, delete, add, reorder, flags and image level data
+    edited = [_shape("c", 9), {**_shape("a"), "label": "a2", "description": "x"}, _shape("d", 20)]
+    journal.record(_snapshot(shapes[:1] + shapes[1:], keys=["ka", "kb", "kc"]))
+    journal.record(_snapshot([edited[1], shapes[2]], keys=["ka", "kc"]))
+    journal.record(_snapshot(edited, keys=["kc", "ka", "kd"], flags={"f": True}, note="n"))
+    journal.close()
+    return label_file, data, edited
+
+
+def test_replay_round_trip(tmp_path):
+    label_file, data, edited = _record_edits(tmp_path)
+    replayed = EditJournal.replay(EditJournal.get_path(label_file), label_file, data)
+    assert replayed["shapes"] == edited
+    assert replayed["flags"] == {"f": True}
+    assert replayed["note"] == "n"
+
+
+def test_replay_without_journal(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    data = _write_label_file(label_file, [_shape("a")])
+    assert EditJournal.replay(EditJournal.get_path(label_file), label_file, data) is None
+
+
+def test_replay_truncated_journal(tmp_path):
+    label_file, data, edited = _record_edits(tmp_path)
+    path = EditJournal.get_path(label_file)
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # Last line cut while it was appended, the complete edits before it are kept
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines[:-1]) + "\n" + lines[-1][:len(lines[-1]) // 2])
+    replayed = EditJournal.replay(path, label_file, data)
+    assert replayed is not None
+    assert len(replayed["shapes"]) == 3
+    assert replayed["shapes"][-1] == edited[-1]
+
+
+def test_replay_changed_label_file(tmp_path):
+    label_file, data, _ = _record_edits(tmp_path)
+    data = _write_label_file(label_file, [_shape("z")])
+    assert EditJournal.replay(EditJournal.get_path(label_file), label_file, data) is None
+    assert data["shapes"] == [_shape("z")]
+
+
+def _write_journal(label_file, records):
+    header = {"op": "base", "version": EditJournal.VERSION, "sha1": None}
+    with open(EditJournal.get_path(label_file), "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in [header] + records))
+
+
+def test_replay_inconsistent_journal(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    inconsistent = [
+        [{"op": "delete", "key": 7}],
+        [{"op": "update", "key": 7, "set": {"label": "x"}, "unset": []}],
+        [{"op": "reset", "keys": [0, 1], "shapes": [_shape("a")], "flags": {}, "other_data": {}}],
+        [{"op": "order", "keys": [0, 5]}],
+        [{"op": "flags", "flags": {"f": True}}, {"op": "unknown"}],
+        [{"op": "update", "key": 0, "set": {"label": "x"}, "unset": []}, {"op": "delete", "key": 3}],
+    ]
+    for records in inconsistent:
+        data = {"shapes": [_shape("a"), _shape("b")], "flags": {}}
+        _write_journal(label_file, records)
+        assert EditJournal.replay(EditJournal.get_path(label_file), None, data) is None
+        # Left as read
+        assert data == {"shapes": [_shape("a"), _shape("b")], "flags": {}}
+
+
+def test_replay_invalid_journal(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    data = {"shapes": [_shape("a")], "flags": {}}
+    for text in ["", "not json\n", "[1]\n", '{"op": "add"}\n']:
+        with open(EditJournal.get_path(label_file), "w", encoding="utf-8") as f:
+            f.write(text)
+        assert EditJournal.replay(EditJournal.get_path(label_file), None, data) is None
@@ -0,0 +1,61 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from utils.batch_converter import BatchConverter
+from utils.label_binary import find_label_file, json_to_binary, list_label_files, read_label_data
+
+
+def _label_data(label="a"):
+    return {
+        "version": "1",
+        "flags": {},
+        "shapes": [{"label": label, "points": [[1.5, 2.0], [30.0, 2.0], [30.0, 20.25], [1.5, 20.25]], "shape_type": "rectangle"}],
+        "imagePath": "a.jpg",
+        "imageData": None,
+        "imageHeight": 32,
+        "imageWidth": 48,
+    }
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def test_read_label_data_binary(tmp_path):
+    json_file = str(tmp_path / "a.json")
+    _write_json(json_file, _label_data())
+    binary_file = json_to_binary(json_file)
+    assert read_label_data(binary_file) == read_label_data(json_file)
+
+
+def test_find_label_file_newest(tmp_path):
+    json_file = str(tmp_path / "a.json")
+    assert find_label_file(json_file) is None
+    _write_json(json_file, _label_data())
+    binary_file = json_to_binary(json_file)
+    os.utime(json_file, ns=(1, 1))
+    assert find_label_file(json_file) == binary_file
+    os.utime(binary_file, ns=(0, 0))
+    assert find_label_file(binary_file) == json_file
+    assert list_label_files(str(tmp_path)) == [json_file]
+
+
+def test_batch_export_reads_binary_labels(tmp_path):
+    label_dir, output_dir = tmp_path / "labels", tmp_path / "out"
+    label_dir.mkdir()
+    cv2.imwrite(str(label_dir / "a.jpg"), np.zeros((32, 48, 3), dtype=np.uint8))
+    json_file = str(label_dir / "a.json")
+    _write_json(json_file, _label_data())
+    json_to_binary(json_file)
+    os.remove(json_file)
+    classes_file = str(tmp_path / "classes.txt")
+    with open(classes_file, "w", encoding="utf-8") as f:
+        f.write("a\n")
+    result = BatchConverter(classes_file, workers=1).convert(str(label_dir), str(output_dir), "yolo", mode="hbb")
+    assert result.failed == 0
+    with open(output_dir / "a.txt", "r", encoding="utf-8") as f:
+        assert f.read().split()[0] == "0"
@@ -0,0 +1,59 @@
+import base64
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from core.dto.exceptions import LabelFileError
+from core.dto.label_file import LabelFile
+
+
+def _write_label(path, image_data=None, image_height=32, image_width=48):
+    data = {
+        "version": "1",
+        "flags": {},
+        "shapes": [{"label": "a", "points": [[1, 2], [30, 20]], "shape_type": "rectangle"}],
+        "imagePath": "a.jpg",
+        "imageData": image_data,
+        "imageHeight": image_height,
+        "imageWidth": image_width,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def test_load_without_image(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    _write_label(label_file)
+    label = LabelFile(label_file)
+    assert len(label.shapes) == 1
+    assert label.image_data is None
+    assert label.image_size == (32, 48)
+
+
+def test_image_read_on_first_access(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    _write_label(label_file, image_height=10, image_width=10)
+    label = LabelFile(label_file)
+    # Written after loading, the image is only looked up when needed
+    cv2.imwrite(str(tmp_path / "a.jpg"), np.zeros((32, 48, 3), dtype=np.uint8))
+    assert label.image_size == (32, 48)
+    assert label.image_data == (tmp_path / "a.jpg").read_bytes()
+
+
+def test_embedded_image(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    image_bytes = cv2.imencode(".png", np.zeros((20, 30, 3), dtype=np.uint8))[1].tobytes()
+    _write_label(label_file, base64.b64encode(image_bytes).decode("utf-8"))
+    label = LabelFile(label_file)
+    assert label.image_size == (20, 30)
+    assert label.image_data == image_bytes
+
+
+def test_invalid_embedded_image(tmp_path):
+    label_file = str(tmp_path / "a.json")
+    _write_label(label_file, "not base64!")
+    label = LabelFile(label_file)
+    with pytest.raises(LabelFileError):
+        label.image_data
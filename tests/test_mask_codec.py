@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from utils.mask_codec import rasterize_bands, rasterize_polygons
+
+
+def _random_polygons(rng, height, width, count):
+    # Points may lie outside the image, those polygons are clipped by the canvas
+    polygons = [
+        rng.integers((-width // 4, -height // 4), (width * 5 // 4, height * 5 // 4), size=(rng.integers(3, 10), 2)).astype(np.int32)
+        for _ in range(count)
+    ]
+    return polygons, list(range(1, count + 1))
+
+
+@pytest.mark.parametrize("tile_size", [7, 64, 100, 257])
+def test_tiled_matches_full_canvas(tile_size):
+    rng = np.random.default_rng(tile_size)
+    for _ in range(20):
+        height, width = rng.integers(50, 600, size=2)
+        polygons, values = _random_polygons(rng, height, width, 30)
+        expected = rasterize_polygons(polygons, values, (height, width))
+        np.testing.assert_array_equal(rasterize_polygons(polygons, values, (height, width), tile_size=tile_size), expected)
+
+
+@pytest.mark.parametrize("tile_size", [64, 100])
+def test_tiled_matches_full_canvas_with_lut(tile_size):
+    rng = np.random.default_rng(0)
+    polygons, values = _random_polygons(rng, 300, 400, 40)
+    lut = rng.integers(0, 256, size=(41, 3), dtype=np.uint8)
+    expected = rasterize_polygons(polygons, values, (300, 400), lut=lut)
+    np.testing.assert_array_equal(rasterize_polygons(polygons, values, (300, 400), lut=lut, tile_size=tile_size), expected)
+
+
+def test_tiled_triangle():
+    polygons = [np.array([[10, 10], [190, 60], [30, 180]], dtype=np.int32)]
+    expected = rasterize_polygons(polygons, [1], (200, 200))
+    assert expected[12, 19] == 1 and expected[14, 10] == 1
+    np.testing.assert_array_equal(rasterize_polygons(polygons, [1], (200, 200), tile_size=64), expected)
+
+
+def test_bands_cover_image():
+    polygons = [np.array([[0, 0], [99, 0], [99, 149], [0, 149]], dtype=np.int32)]
+    bands = list(rasterize_bands(polygons, [1], (150, 100), 64))
+    assert [y0 for y0, _ in bands] == [0, 64, 128]
+    assert sum(band.shape[0] for _, band in bands) == 150
+    assert all((band == 1).all() for _, band in bands)
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+from utils.label_converter import LabelConverter
+
+
+def _write_label(path, label="car"):
+    data = {
+        "shapes": [{"label": label, "points": [[1, 2], [10, 2], [10, 20], [1, 20]], "shape_type": "rectangle", "group_id": 3}],
+        "imagePath": os.path.basename(os.path.splitext(path)[0]) + ".jpg",
+        "imageData": None,
+        "imageHeight": 32,
+        "imageWidth": 48,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+@pytest.fixture
+def converter(tmp_path):
+    classes_file = tmp_path / "classes.txt"
+    classes_file.write_text("car\n", encoding="utf-8")
+    return LabelConverter(str(classes_file))
+
+
+def test_custom_to_mot(tmp_path, converter):
+    label_dir, save_path = tmp_path / "labels", tmp_path / "mot"
+    label_dir.mkdir()
+    save_path.mkdir()
+    for i in (2, 10, 1):
+        _write_label(str(label_dir / f"seq-{i:06d}.json"))
+    converter.custom_to_mot(str(label_dir), str(save_path))
+    frames = [int(line.split(",")[0]) for line in (save_path / "gt.txt").read_text(encoding="utf-8").splitlines()]
+    assert frames == [1, 2, 10]
+
+
+def test_custom_to_mot_unnumbered_frame(tmp_path, converter):
+    label_dir, save_path = tmp_path / "labels", tmp_path / "mot"
+    label_dir.mkdir()
+    save_path.mkdir()
+    _write_label(str(label_dir / "seq-000001.json"))
+    _write_label(str(label_dir / "cover.json"))
+    with pytest.raises(ValueError):
+        converter.custom_to_mot(str(label_dir), str(save_path))
+    assert os.listdir(save_path) == []
+
+
+def test_custom_to_mot_keeps_previous_outputs(tmp_path, converter):
+    label_dir, save_path = tmp_path / "labels", tmp_path / "mot"
+    label_dir.mkdir()
+    save_path.mkdir()
+    _write_label(str(label_dir / "seq-000001.json"))
+    converter.custom_to_mot(str(label_dir), str(save_path))
+    gt = (save_path / "gt.txt").read_text(encoding="utf-8")
+    # Unknown label, the export fails while the outputs are written
+    _write_label(str(label_dir / "seq-000002.json"), "bus")
+    with pytest.raises(ValueError):
+        converter.custom_to_mot(str(label_dir), str(save_path))
+    assert sorted(os.listdir(save_path)) == ["det.txt", "gt.txt", "seqinfo.ini"]
+    assert (save_path / "gt.txt").read_text(encoding="utf-8") == gt
@@ -0,0 +1,343 @@
+import multiprocessing
+import os
+import os.path as osp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.export_manifest import ExportManifest, hash_file
+from utils.label_converter import LabelConverter
+from utils.logger import logger
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+# Per-file conversions supported by the batch engine: (source format, target format) -> source file suffix.
+# "custom" is the native label format of SemiLabelTool.
+BATCH_TASKS: Dict[Tuple[str, str], str] = {
+    ("yolo", "custom"): ".txt",
+    ("yolo_obb", "custom"): ".txt",
+    ("yolo_pose", "custom"): ".txt",
+    ("voc", "custom"): ".xml",
+    ("dota", "custom"): ".txt",
+    ("mask", "custom"): ".png",
+    ("custom", "yolo"): ".json",
+    ("custom", "voc"): ".json",
+    ("custom", "dota"): ".json",
+    ("custom", "mask"): ".json",
+    ("custom", "ppocr"): ".json",
+}
+
+# Suffix of the files written for each target format
+OUTPUT_SUFFIX = {
+    "custom": ".json",
+    "yolo": ".txt",
+    "voc": ".xml",
+    "dota": ".txt",
+    "mask": ".png",
+}
+
+# Converter owned by each worker process, see `_init_worker`
+_worker_converter: Optional[LabelConverter] = None
+
+
+class BatchResult:
+    """
+    Aggregated outcome of one batch conversion
+    """
+
+    def __init__(self, total: int = 0):
+        self.total: int = total
+        # Files converted without error
+        self.converted: int = 0
+        # Files left untouched by an incremental conversion, their outputs are up to date
+        self.skipped: int = 0
+        # Files producing no annotation, same meaning as `is_empty_file` of LabelConverter exports
+        self.empty_files: int = 0
+        # source file -> error message
+        self.errors: Dict[str, str] = {}
+        # Labels collected by exports returning a class set (PPOCR kie)
+        self.class_set: set = set()
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(total={self.total}, converted={self.converted}, skipped={self.skipped}, empty_files={self.empty_files}, failed={self.failed})"
+
+
+def _init_worker(classes_file, pose_cfg_file, lock):
+    global _worker_converter
+    _worker_converter = LabelConverter(classes_file, pose_cfg_file)
+    if lock is not None:
+        _worker_converter.output_lock = lock
+
+
+def _convert_one(job: tuple) -> tuple:
+    """
+    Run one per-file conversion in the current (worker) process.
+
+    Args:
+        job: (source format, target format, source file, output file, image file, options)
+
+    Returns:
+        tuple: (source file, is_empty_file, class_set, error message or None)
+    """
+    source_format, target_format, source_file, output_file, image_file, options = job
+    converter = _worker_converter
+    mode = options.get("mode")
+    skip_empty_files = options.get("skip_empty_files", False)
+    is_empty_file, class_set = False, None
+    try:
+        if target_format == "custom":
+            if source_format == "yolo":
+                converter.yolo_to_custom(source_file, output_file, image_file, mode)
+            elif source_format == "yolo_obb":
+                converter.yolo_obb_to_custom(source_file, output_file, image_file)
+            elif source_format == "yolo_pose":
+                converter.yolo_pose_to_custom(source_file, output_file, image_file)
+            elif source_format == "voc":
+                converter.voc_to_custom(source_file, output_file, osp.basename(image_file), mode)
+            elif source_format == "dota":
+                converter.dota_to_custom(source_file, output_file, image_file)
+            elif source_format == "mask":
+                # Files are already spread over processes, trace classes in the worker itself
+                converter.mask_to_custom(source_file, output_file, image_file, options["mapping_table"], workers=1)
+        elif not osp.exists(source_file) and target_format not in ("yolo", "voc"):
+            # Only yolo and voc exports define an output for images without label file
+            is_empty_file = True
+        elif target_format == "yolo":
+            is_empty_file = converter.custom_to_yolo(source_file, output_file, mode, skip_empty_files)
+        elif target_format == "voc":
+            is_empty_file = converter.custom_to_voc(image_file, source_file, output_file, mode, skip_empty_files)
+        elif target_format == "dota":
+            converter.custom_to_dota(source_file, output_file)
+        elif target_format == "mask":
+            converter.custom_to_mask(source_file, output_file, options["mapping_table"])
+        elif target_format == "ppocr":
+            class_set = converter.custom_to_pporc(image_file, source_file, output_file, mode)
+    except Exception as e:
+        return source_file, False, None, f"{type(e).__name__}: {e}"
+    return source_file, bool(is_empty_file), class_set, None
+
+
+def _convert_ppocr_chunk(jobs: List[tuple]) -> List[tuple]:
+    """
+    Export a chunk of pages to PPOCR through one session, so output files are opened once per chunk.
+
+    Returns:
+        List[tuple]: outcome of each job, same as `_convert_one`
+    """
+    _, _, _, save_path, _, options = jobs[0]
+    outcomes = []
+    session = None
+    try:
+        session = _worker_converter.open_pporc_session(save_path, options.get("mode"), workers=options.get("crop_workers"))
+        with session:
+            for _, _, source_file, _, image_file, _ in jobs:
+                if not osp.exists(source_file):
+                    outcomes.append((source_file, True, None, None))
+                    continue
+                try:
+                    class_set = session.add_page(image_file, source_file)
+                except Exception as e:
+                    outcomes.append((source_file, False, None, f"{type(e).__name__}: {e}"))
+                    continue
+                outcomes.append((source_file, False, class_set or None, None))
+    except Exception as e:
+        # Lines of the chunk may not be written, none of its pages is reported as converted
+        error = f"{type(e).__name__}: {e}"
+        outcomes = [(source_file, False, None, error) for _, _, source_file, _, _, _ in jobs]
+    if session is not None:
+        outcomes = [
+            (source_file, False, None, f"{type(session.errors[source_file]).__name__}: {session.errors[source_file]}")
+            if source_file in session.errors else (source_file, is_empty_file, class_set, error)
+            for source_file, is_empty_file, class_set, error in outcomes
+        ]
+    return outcomes
+
+
+class BatchConverter:
+    """
+    Convert every label file of a directory with a pool of worker processes.
+
+    Each worker owns its own LabelConverter, so the per-file methods of LabelConverter are reused unchanged.
+    """
+
+    def __init__(self, classes_file=None, pose_cfg_file=None, workers: int = None):
+        self.classes_file = classes_file
+        self.pose_cfg_file = pose_cfg_file
+        self.workers = workers or os.cpu_count() or 1
+
+    @staticmethod
+    def find_image_file(image_dir: str, stem: str) -> Optional[str]:
+        for ext in IMAGE_EXTENSIONS + tuple(e.upper() for e in IMAGE_EXTENSIONS):
+            image_file = osp.join(image_dir, stem + ext)
+            if osp.exists(image_file):
+                return image_file
+        return None
+
+    @staticmethod
+    def list_files(dir_path: str, suffixes) -> List[str]:
+        return sorted(
+            entry.path for entry in os.scandir(dir_path)
+            if entry.is_file() and entry.name.lower().endswith(suffixes)
+        )
+
+    def build_jobs(self, source_dir, output_dir, source_format, target_format, image_dir=None, options=None) -> Tuple[List[tuple], Dict[str, str]]:
+        """
+        Pair every source file with its output and image file.
+
+        Returns:
+            Tuple: (jobs, errors of files which can not be converted at all)
+        """
+        if (source_format, target_format) not in BATCH_TASKS:
+            supported = ", ".join(f"{s}->{t}" for s, t in BATCH_TASKS)
+            logger.error(f"Unsupported batch conversion: {source_format}->{target_format}")
+            raise ValueError(f"Unsupported batch conversion: {source_format}->{target_format}. Supported: {supported}")
+        image_dir = image_dir or source_dir
+        options = options or {}
+        jobs, errors = [], {}
+        if target_format == "custom":
+            if source_format == "mask" and "mapping_table" not in options:
+                raise ValueError("mask conversion requires a `mapping_table` option")
+            for source_file in self.list_files(source_dir, (BATCH_TASKS[(source_format, target_format)],)):
+                stem = osp.splitext(osp.basename(source_file))[0]
+                image_file = self.find_image_file(image_dir, stem)
+                if image_file is None:
+                    errors[source_file] = f"No image found for {stem} in {image_dir}"
+                    continue
+                output_file = osp.join(output_dir, stem + OUTPUT_SUFFIX[target_format])
+                jobs.append((source_format, target_format, source_file, output_file, image_file, options))
+        else:
+            if target_format == "mask" and "mapping_table" not in options:
+                raise ValueError("mask conversion requires a `mapping_table` option")
+            # Exports are driven by images, so that yolo and voc can produce outputs for unlabeled images
+            for image_file in self.list_files(image_dir, IMAGE_EXTENSIONS):
+                stem = osp.splitext(osp.basename(image_file))[0]
+                source_file = LabelConverter.get_label_file(source_dir, image_file)
+                if target_format == "ppocr":
+                    output_file = output_dir
+                else:
+                    output_file = osp.join(output_dir, stem + OUTPUT_SUFFIX[target_format])
+                jobs.append((source_format, target_format, source_file, output_file, image_file, options))
+        return jobs, errors
+
+    def convert(self, source_dir: str, output_dir: str, target_format: str, source_format: str = "custom", image_dir: str = None, mode: str = None, skip_empty_files: bool = False,
+                mapping_table: dict = None, progress_callback: Callable[[int, int, str], None] = None, chunk_size: int = 32,
+                incremental: bool = False) -> BatchResult:
+        """
+        Convert all label files of `source_dir` into `target_format`.
+
+        Args:
+            source_dir: directory of the files to convert
+            output_dir: directory to write converted files to
+            target_format: format to convert to, "custom" for importing into SemiLabelTool format
+            source_format: format of the files in `source_dir`
+            image_dir: directory of the corresponding images, defaults to `source_dir`
+            mode: mode passed through to LabelConverter, e.g. "hbb"/"seg" for yolo or "rec"/"kie" for ppocr
+            skip_empty_files: same meaning as in LabelConverter exports
+            mapping_table: color mapping table for mask conversions
+            progress_callback: called as `progress_callback(done, total, source_file)` after each file
+            chunk_size: number of files sent to a worker at once
+            incremental: only convert files changed since the last conversion into `output_dir`, see ExportManifest.
+                Outputs of removed source files are deleted. Not supported for ppocr, which appends to shared files.
+
+        Returns:
+            BatchResult: aggregated conversion result
+        """
+        options = {"mode": mode, "skip_empty_files": skip_empty_files}
+        if mapping_table is not None:
+            options["mapping_table"] = mapping_table
+        os.makedirs(output_dir, exist_ok=True)
+        if target_format == "ppocr" and mode == "rec":
+            os.makedirs(osp.join(output_dir, "crop_img"), exist_ok=True)
+
+        jobs, errors = self.build_jobs(source_dir, output_dir, source_format, target_format, image_dir, options)
+        result = BatchResult(len(jobs) + len(errors))
+        result.errors.update(errors)
+
+        manifest, manifest_name = None, f"{source_format}_to_{target_format}"
+        if not incremental:
+            ExportManifest.discard(output_dir, manifest_name)
+        elif target_format == "ppocr":
+            logger.warning("Incremental conversion is not supported for ppocr, converting all files")
+        else:
+            manifest = ExportManifest(output_dir, manifest_name, self.get_signature(options))
+            for source_file in manifest.stale_sources(job[2] for job in jobs):
+                manifest.remove(source_file)
+            pending = []
+            for job in jobs:
+                # Outputs also hold the size of the image, e.g. VOC <size> or normalized YOLO coordinates
+                if manifest.is_unchanged(job[2], [job[4]]):
+                    result.skipped += 1
+                else:
+                    # Outputs are regenerated from scratch, some formats write nothing for empty labels
+                    manifest.remove(job[2])
+                    pending.append(job)
+            logger.info(f"{result.skipped} of {len(jobs)} files are up to date")
+            jobs = pending
+        if not jobs:
+            if manifest is not None:
+                manifest.save()
+            return result
+
+        workers = min(self.workers, len(jobs))
+        # PPOCR appends every image to the same Label.txt/rec_gt.txt/ppocr_kie.json
+        lock = multiprocessing.Lock() if target_format == "ppocr" and workers > 1 else None
+        logger.info(f"Converting {len(jobs)} files from {source_format} to {target_format} with {workers} workers")
+
+        if target_format == "ppocr":
+            # Pages are exported by chunks, each chunk sharing one PPOCR session.
+            # Crops are encoded by a thread pool, a single thread per process when already running processes.
+            options["crop_workers"] = 1 if workers > 1 else None
+            chunk_size = max(1, chunk_size)
+            chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+            if workers <= 1:
+                _init_worker(self.classes_file, self.pose_cfg_file, None)
+                outcomes = map(_convert_ppocr_chunk, chunks)
+                self._collect((outcome for chunk in outcomes for outcome in chunk), result, progress_callback)
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.classes_file, self.pose_cfg_file, lock)) as executor:
+                    outcomes = executor.map(_convert_ppocr_chunk, chunks)
+                    self._collect((outcome for chunk in outcomes for outcome in chunk), result, progress_callback)
+        elif workers <= 1:
+            _init_worker(self.classes_file, self.pose_cfg_file, None)
+            self._collect(map(_convert_one, jobs), result, progress_callback)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.classes_file, self.pose_cfg_file, lock)) as executor:
+                self._collect(executor.map(_convert_one, jobs, chunksize=max(1, chunk_size)), result, progress_callback)
+
+        if manifest is not None:
+            for _, _, source_file, output_file, image_file, _ in jobs:
+                if source_file not in result.errors:
+                    manifest.record(source_file, [output_file] if osp.isfile(output_file) else [], [image_file])
+            manifest.save()
+
+        if result.errors:
+            logger.warning(f"{result.failed} of {result.total} files failed to convert")
+        return result
+
+    def get_signature(self, options: dict) -> dict:
+        """
+        Options which invalidate all previous outputs of an incremental conversion when changed.
+        """
+        signature = {key: value for key, value in options.items() if key != "crop_workers"}
+        signature["classes"] = hash_file(self.classes_file) if self.classes_file else None
+        signature["pose_cfg"] = hash_file(self.pose_cfg_file) if self.pose_cfg_file else None
+        return signature
+
+    @staticmethod
+    def _collect(outcomes, result: BatchResult, progress_callback):
+        done = len(result.errors)
+        for source_file, is_empty_file, class_set, error in outcomes:
+            done += 1
+            if error is not None:
+                logger.error(f"Failed converting {source_file}: {error}")
+                result.errors[source_file] = error
+            else:
+                result.converted += 1
+                result.empty_files += int(is_empty_file)
+                if class_set:
+                    result.class_set.update(class_set)
+            if progress_callback is not None:
+                progress_callback(done, result.total, source_file)
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import os.path as osp
+import threading
+
+
+class BlobStore:
+    """
+    Content-addressed store of image data, shared by the label files of a directory.
+
+    Each blob is stored once under `<root>/<sha[:2]>/<sha>`, named by the SHA-256 of its content, so identical images
+    saved by several label files or versions are only written once.
+
+    Usage:
+        store = BlobStore.for_label_file(label_file)
+        ref = store.put(image_bytes)
+        with open(store.get_path(ref), "rb") as f:
+            ...
+    """
+
+    DIRNAME = ".semi_blobs"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @classmethod
+    def for_label_file(cls, label_file: str) -> "BlobStore":
+        return cls(osp.join(osp.dirname(osp.abspath(label_file)), cls.DIRNAME))
+
+    @staticmethod
+    def get_ref(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get_path(self, ref: str) -> str:
+        return osp.join(self.root, ref[:2], ref)
+
+    def exists(self, ref: str) -> bool:
+        return osp.isfile(self.get_path(ref))
+
+    def put(self, data: bytes) -> str:
+        """
+        Store `data` unless it is already stored.
+
+        Returns:
+            str: reference of the blob, the hex SHA-256 of `data`
+        """
+        ref = self.get_ref(data)
+        path = self.get_path(ref)
+        if osp.isfile(path):
+            return ref
+        os.makedirs(osp.dirname(path), exist_ok=True)
+        # Renamed once complete, a blob is never seen half written
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if osp.exists(tmp_path):
+                os.remove(tmp_path)
+        return ref
+
+    def get(self, ref: str) -> bytes:
+        with open(self.get_path(ref), "rb") as f:
+            return f.read()
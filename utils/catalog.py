@@ -0,0 +1,524 @@
+import json
+import os
+import os.path as osp
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from natsort import natsort
+
+from utils.label_binary import BINARY_SUFFIX, read_label_data
+from utils.logger import logger
+
+LABEL_SUFFIXES = (".json", BINARY_SUFFIX)
+
+_os_sort_key = natsort.os_sort_keygen()
+
+
+def _sort_key(name: str, is_dir: bool) -> tuple:
+    """
+    Key of an entry of a directory, in the order `natsort.os_sorted` gives the paths of the images below it.
+
+    Keys of full paths are the keys of their parts one after the other, only the suffixes of the file name are split
+    off, so a directory is keyed like a parent in a path. A directory comes before a file of the same stem, as in
+    `os_sorted` when the directory's images start with a digit (`b2/9.jpg` before `b2.jpg`). `os_sorted` orders
+    images starting with a letter after the file, this order keeps the images of a directory together instead.
+    """
+    if is_dir:
+        return _os_sort_key(osp.join(name, "_"))[:-1]
+    return _os_sort_key(name)
+
+
+def summarize_label_file(label_file: str) -> Tuple[int, List[str], List[str]]:
+    """
+    Read what the catalogue keeps of a label file.
+
+    Returns:
+        Tuple: (shape count, sorted labels, sorted shape types)
+    """
+    return summarize_shapes(read_label_data(label_file).get("shapes") or [])
+
+
+def summarize_shapes(shapes: List[dict]) -> Tuple[int, List[str], List[str]]:
+    """
+    What the catalogue keeps of the shapes of a label file, as written to it.
+
+    Returns:
+        Tuple: (shape count, sorted labels, sorted shape types)
+    """
+    labels = sorted({str(shape.get("label")) for shape in shapes})
+    shape_types = sorted({str(shape.get("shape_type")) for shape in shapes})
+    return len(shapes), labels, shape_types
+
+
+class CatalogEntry:
+    """
+    An image of the catalogue and a summary of its label file, `labels` and `shape_types` are sorted and must not be
+    modified, they may be shared by several entries.
+    """
+
+    __slots__ = ("path", "mtime_ns", "label_file", "shape_count", "labels", "shape_types")
+
+    def __init__(self, path: str, mtime_ns: int, label_file: Optional[str], shape_count: int, labels: List[str], shape_types: List[str]):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.label_file = label_file
+        self.shape_count = shape_count
+        self.labels = labels
+        self.shape_types = shape_types
+
+    @property
+    def is_labeled(self) -> bool:
+        return self.label_file is not None
+
+
+class AnnotationCatalog:
+    """
+    Persistent catalogue of the images of a folder and of their label files, kept in SQLite in the folder.
+
+    Every directory is recorded with its modification time, which changes when entries are added, removed or
+    renamed in it, e.g. when a label file is saved. `scan` only lists the directories whose modification time
+    changed and only reads the label files whose modification time changed, so reopening an unchanged folder
+    reads no directory listing nor label file.
+
+    Usage:
+        catalog = AnnotationCatalog(folder, [".jpg", ".png"])
+        for entry in catalog.scan():
+            print(entry.path, entry.is_labeled, entry.shape_count)
+    """
+
+    FILENAME = ".semi_catalog.db"
+    VERSION = 2
+
+    def __init__(self, root: str, extensions: Iterable[str], label_dir: str = None):
+        """
+        Args:
+            root: folder of the images, walked recursively
+            extensions: lower case image file extensions, with the dot
+            label_dir: directory of the label files, next to the images if None
+        """
+        self.root = root
+        self.extensions = tuple(sorted({ext.lower() for ext in extensions}))
+        self.label_dir = label_dir
+        self.path = osp.join(root, self.FILENAME)
+        # Listing of `label_dir` during a scan, see `_list_label_dir`
+        self._label_names: Optional[Dict[str, int]] = None
+        try:
+            self._conn = sqlite3.connect(self.path)
+            self._init_db()
+        except sqlite3.Error as e:
+            logger.warning(f"Can not use catalogue {self.path}, keeping it in memory: {e}")
+            self._conn = sqlite3.connect(":memory:")
+            self._init_db()
+
+    def _init_db(self):
+        # The rollback journal is kept between transactions, creating and deleting it would change the modification
+        # time of the folder, which would then be listed again on every scan
+        self._conn.execute("PRAGMA journal_mode = PERSIST")
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER, subdirs TEXT);
+                CREATE TABLE IF NOT EXISTS images (
+                    path TEXT PRIMARY KEY, dir TEXT, rank INTEGER, mtime_ns INTEGER, label_file TEXT,
+                    label_mtime_ns INTEGER, shape_count INTEGER, labels TEXT, shape_types TEXT
+                );
+                CREATE INDEX IF NOT EXISTS images_dir ON images (dir);
+            """)
+            # Everything is rebuilt when what is catalogued changes
+            config = json.dumps({"version": self.VERSION, "extensions": self.extensions, "label_dir": self.label_dir})
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+            if row is None or row[0] != config:
+                self._conn.execute("DELETE FROM dirs")
+                self._conn.execute("DELETE FROM images")
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?)", (config,))
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _stat_mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _find_label_file(self, image_path: str, names: Dict[str, int] = None) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Find the label file of an image, the most recently modified one when it exists in several formats.
+
+        Args:
+            names: {file name: modification time} of the label directory when it was just listed
+        """
+        stem = osp.splitext(osp.basename(image_path))[0]
+        label_dir = self.label_dir or osp.dirname(image_path)
+        found = None
+        for suffix in LABEL_SUFFIXES:
+            name = stem + suffix
+            if names is not None:
+                mtime = names.get(name)
+            else:
+                mtime = self._stat_mtime(osp.join(label_dir, name))
+            if mtime is not None and (found is None or mtime > found[1]):
+                found = (osp.join(label_dir, name), mtime)
+        return found if found is not None else (None, None)
+
+    def _label_row(self, label_file: Optional[str], label_mtime: Optional[int], cached: Optional[tuple]) -> tuple:
+        """
+        (label_file, label_mtime_ns, shape_count, labels, shape_types) of an image, reusing the cached row when the
+        label file did not change.
+        """
+        if label_file is None:
+            return None, None, 0, "[]", "[]"
+        if cached is not None and cached[0] == label_file and cached[1] == label_mtime:
+            return cached
+        try:
+            shape_count, labels, shape_types = summarize_label_file(label_file)
+        except Exception as e:
+            logger.warning(f"Failed reading label file {label_file}: {e}")
+            shape_count, labels, shape_types = 0, [], []
+        return label_file, label_mtime, shape_count, json.dumps(labels, ensure_ascii=False), json.dumps(shape_types)
+
+    def _list_label_dir(self) -> Dict[str, int]:
+        """
+        {file name: modification time} of the label files in `label_dir`, listed once per scan.
+        """
+        if self._label_names is None:
+            self._label_names = {}
+            try:
+                with os.scandir(self.label_dir) as entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith(LABEL_SUFFIXES) and entry.is_file():
+                            self._label_names[entry.name] = entry.stat().st_mtime_ns
+            except OSError as e:
+                logger.warning(f"Failed listing {self.label_dir}: {e}")
+        return self._label_names
+
+    def _scan_dir(self, dir_path: str, mtime_ns: int) -> List[Tuple[str, int]]:
+        """
+        List a changed directory and update its images.
+
+        Returns:
+            List: (path, rank) of its subdirectories, ranks order the images and subdirectories of the directory
+        """
+        subdirs, images, names = [], [], {}
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # Like os.walk, symbolic links to directories are not followed
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                        continue
+                    lower_name = entry.name.lower()
+                    if lower_name.endswith(self.extensions):
+                        images.append((entry.path, entry.stat().st_mtime_ns))
+                    elif self.label_dir is None and lower_name.endswith(LABEL_SUFFIXES):
+                        names[entry.name] = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+        label_names = names if self.label_dir is None else self._list_label_dir()
+        cached = {
+            row[0]: row[1:]
+            for row in self._conn.execute(
+                "SELECT path, rank, mtime_ns, label_file, label_mtime_ns, shape_count, labels, shape_types FROM images WHERE dir = ?",
+                (dir_path,),
+            )
+        }
+        row = self._conn.execute("SELECT subdirs FROM dirs WHERE path = ?", (dir_path,)).fetchone()
+        cached_ranks = {path: cached_row[0] for path, cached_row in cached.items()}
+        cached_ranks.update(json.loads(row[0]) if row is not None else [])
+        ranks = self._rank_entries(subdirs, [path for path, _ in images], cached_ranks)
+
+        rows = []
+        for path, mtime in images:
+            label_file, label_mtime = self._find_label_file(path, label_names)
+            cached_row = cached.get(path)
+            row = (ranks[path], mtime) + self._label_row(label_file, label_mtime, cached_row[2:] if cached_row is not None else None)
+            if row != cached_row:
+                rows.append((path, dir_path) + row)
+        current = {path for path, _ in images}
+        self._conn.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in cached if path not in current])
+        self._conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        subdirs = [(path, ranks[path]) for path in subdirs]
+        self._conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (dir_path, mtime_ns, json.dumps(subdirs)))
+        return subdirs
+
+    @staticmethod
+    def _rank_entries(subdirs: List[str], images: List[str], cached_ranks: Dict[str, int]) -> Dict[str, int]:
+        """
+        Rank the subdirectories and images of a directory in natural order.
+
+        Entries listed before keep their relative order and only new ones are placed by binary search, computing
+        natural sort keys is what costs most when a large directory gets a few new files.
+        """
+        is_dir = set(subdirs)
+        keys = {}
+
+        def get_key(path):
+            if path not in keys:
+                keys[path] = _sort_key(osp.basename(path), path in is_dir)
+            return keys[path]
+
+        known = sorted((path for path in subdirs + images if path in cached_ranks), key=cached_ranks.get)
+        new = [path for path in subdirs + images if path not in cached_ranks]
+        if len(new) > len(known):
+            ordered = sorted(subdirs + images, key=get_key)
+        else:
+            ordered = known
+            for path in sorted(new, key=get_key):
+                key = get_key(path)
+                low, high = 0, len(ordered)
+                while low < high:
+                    middle = (low + high) // 2
+                    if get_key(ordered[middle]) < key:
+                        low = middle + 1
+                    else:
+                        high = middle
+                ordered.insert(low, path)
+        return {path: rank for rank, path in enumerate(ordered)}
+
+    def _revalidate_label_dir(self) -> List[str]:
+        """
+        Match every image with the label files of `label_dir` again, returns the images whose label file changed.
+        """
+        names = self._list_label_dir()
+        rows = []
+        for path, label_file, label_mtime, shape_count, labels, shape_types in self._conn.execute(
+            "SELECT path, label_file, label_mtime_ns, shape_count, labels, shape_types FROM images"
+        ).fetchall():
+            cached = (label_file, label_mtime, shape_count, labels, shape_types)
+            row = self._label_row(*self._find_label_file(path, names), cached)
+            if row != cached:
+                rows.append(row + (path,))
+        self._conn.executemany(
+            "UPDATE images SET label_file = ?, label_mtime_ns = ?, shape_count = ?, labels = ?, shape_types = ? WHERE path = ?", rows
+        )
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('label_dir_mtime', ?)", (str(self._stat_mtime(self.label_dir)),))
+        return [row[-1] for row in rows]
+
+    def _get_dir_rows(self, dir_path: str) -> Dict[str, tuple]:
+        return {
+            row[0]: row[1:]
+            for row in self._conn.execute(
+                "SELECT path, mtime_ns, label_file, label_mtime_ns, shape_count, labels, shape_types FROM images WHERE dir = ?",
+                (dir_path,),
+            )
+        }
+
+    def _remove_dir(self, dir_path: str) -> List[str]:
+        """
+        Drop a directory and its subdirectories, returns the removed images.
+        """
+        removed = []
+        stack = [dir_path]
+        while stack:
+            path = stack.pop()
+            row = self._conn.execute("SELECT subdirs FROM dirs WHERE path = ?", (path,)).fetchone()
+            if row is not None:
+                stack.extend(subdir for subdir, _ in json.loads(row[0]))
+            removed.extend(self._get_dir_rows(path))
+            self._conn.execute("DELETE FROM images WHERE dir = ?", (path,))
+            self._conn.execute("DELETE FROM dirs WHERE path = ?", (path,))
+        return removed
+
+    def get_dirs(self) -> Dict[str, Optional[int]]:
+        """
+        Directories of the folder and `label_dir`, with their modification times as of the last time they were listed.
+        """
+        dirs = {}
+        if self.label_dir is not None:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'label_dir_mtime'").fetchone()
+            dirs[self.label_dir] = int(row[0]) if row is not None and row[0] != "None" else None
+        dirs.update(self._conn.execute("SELECT path, mtime_ns FROM dirs"))
+        return dirs
+
+    def get_sort_key(self, image_path: str) -> tuple:
+        """
+        Key of an image in the order of `scan`, to insert images into its result.
+        """
+        parts = osp.relpath(image_path, self.root).split(os.sep)
+        return tuple(_sort_key(part, True) for part in parts[:-1]) + (_sort_key(parts[-1], False),)
+
+    def update_dirs(self, dir_paths: Iterable[str]) -> Tuple[List[CatalogEntry], List[str]]:
+        """
+        Bring directories up to date after they were reported changed, e.g. by a file system watcher, without
+        visiting the rest of the folder. New subdirectories are scanned and removed ones dropped.
+
+        Args:
+            dir_paths: changed directories of the folder, or `label_dir`
+
+        Returns:
+            Tuple: (images added or whose label file changed, in the order of `scan`; paths of the removed images)
+        """
+        changed, removed = set(), set()
+        with self._conn:
+            self._label_names = None
+            revalidate = False
+            stack = list(dir_paths)
+            while stack:
+                dir_path = stack.pop()
+                if self.label_dir is not None and osp.normpath(dir_path) == osp.normpath(self.label_dir):
+                    revalidate = True
+                row = self._conn.execute("SELECT subdirs FROM dirs WHERE path = ?", (dir_path,)).fetchone()
+                if row is None and dir_path != self.root:
+                    # Not part of the folder, or a new subdirectory already scanned with its parent
+                    continue
+                mtime = self._stat_mtime(dir_path)
+                if mtime is None:
+                    removed.update(self._remove_dir(dir_path))
+                    continue
+                before = self._get_dir_rows(dir_path)
+                # Listed even if its modification time did not change, a label file may have been rewritten in place
+                try:
+                    subdirs = [path for path, _ in self._scan_dir(dir_path, mtime)]
+                except OSError as e:
+                    logger.warning(f"Failed listing {dir_path}: {e}")
+                    continue
+                after = self._get_dir_rows(dir_path)
+                removed.update(path for path in before if path not in after)
+                changed.update(path for path, row in after.items() if before.get(path) != row)
+                old_subdirs = [path for path, _ in json.loads(row[0])] if row is not None else []
+                for path in old_subdirs:
+                    if path not in subdirs:
+                        removed.update(self._remove_dir(path))
+                for path in subdirs:
+                    if path not in old_subdirs:
+                        changed.update(self._scan_new_dir(path))
+            if revalidate:
+                changed.update(self._revalidate_label_dir())
+
+            entries = []
+            changed -= removed
+            for path in changed:
+                row = self._conn.execute(
+                    "SELECT mtime_ns, label_file, shape_count, labels, shape_types FROM images WHERE path = ?", (path,)
+                ).fetchone()
+                if row is not None:
+                    mtime_ns, label_file, shape_count, labels, shape_types = row
+                    entries.append(CatalogEntry(path, mtime_ns, label_file, shape_count, json.loads(labels), json.loads(shape_types)))
+        entries.sort(key=lambda entry: self.get_sort_key(entry.path))
+        return entries, sorted(removed)
+
+    def _scan_new_dir(self, dir_path: str) -> List[str]:
+        """
+        Scan a new directory and its subdirectories, returns their images.
+        """
+        images = []
+        stack = [dir_path]
+        while stack:
+            path = stack.pop()
+            mtime = self._stat_mtime(path)
+            if mtime is None:
+                continue
+            try:
+                stack.extend(subdir for subdir, _ in self._scan_dir(path, mtime))
+            except OSError as e:
+                logger.warning(f"Failed listing {path}: {e}")
+                continue
+            images.extend(self._get_dir_rows(path))
+        return images
+
+    def scan(self) -> List[CatalogEntry]:
+        """
+        Bring the catalogue up to date with the folder.
+
+        Returns:
+            List[CatalogEntry]: images of the folder, in natural order
+        """
+        with self._conn:
+            cached_dirs = {
+                path: (mtime_ns, json.loads(subdirs))
+                for path, mtime_ns, subdirs in self._conn.execute("SELECT path, mtime_ns, subdirs FROM dirs")
+            }
+            self._label_names = None
+            # {directory: [(rank, path) of its subdirectories]}
+            tree = {}
+            stack = [self.root]
+            while stack:
+                dir_path = stack.pop()
+                mtime = self._stat_mtime(dir_path)
+                if mtime is None:
+                    continue
+                cached = cached_dirs.get(dir_path)
+                if cached is not None and cached[0] == mtime:
+                    subdirs = cached[1]
+                else:
+                    try:
+                        subdirs = self._scan_dir(dir_path, mtime)
+                    except OSError as e:
+                        logger.warning(f"Failed listing {dir_path}: {e}")
+                        continue
+                tree[dir_path] = [(rank, path) for path, rank in subdirs]
+                stack.extend(path for path, _ in subdirs)
+            removed = [(path,) for path in cached_dirs if path not in tree]
+            if removed:
+                self._conn.executemany("DELETE FROM images WHERE dir = ?", removed)
+                self._conn.executemany("DELETE FROM dirs WHERE path = ?", removed)
+
+            if self.label_dir is not None:
+                mtime = self._stat_mtime(self.label_dir)
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'label_dir_mtime'").fetchone()
+                # Images of changed directories were matched with the label files already
+                if row is None or row[0] != str(mtime):
+                    if mtime is not None:
+                        self._revalidate_label_dir()
+                    else:
+                        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('label_dir_mtime', ?)", (str(mtime),))
+
+            images: Dict[str, list] = {}
+            # Few distinct label sets are shared by many images, each is decoded once and its list shared
+            decoded: Dict[str, List[str]] = {}
+            for dir_path, rank, path, mtime_ns, label_file, shape_count, labels, shape_types in self._conn.execute(
+                "SELECT dir, rank, path, mtime_ns, label_file, shape_count, labels, shape_types FROM images"
+            ):
+                if labels not in decoded:
+                    decoded[labels] = json.loads(labels)
+                if shape_types not in decoded:
+                    decoded[shape_types] = json.loads(shape_types)
+                entry = CatalogEntry(path, mtime_ns, label_file, shape_count, decoded[labels], decoded[shape_types])
+                images.setdefault(dir_path, []).append((rank, entry))
+        return self._ordered(self.root, tree, images)
+
+    @staticmethod
+    def _ordered(root: str, tree: Dict[str, list], images: Dict[str, list]) -> List[CatalogEntry]:
+        """
+        Images in natural order of their paths, the order of os.walk listings sorted with `natsort.os_sorted`.
+        """
+        result = []
+        # Pairs of (rank, image entry or subdirectory path), a subdirectory is replaced by its content
+        stack = [(0, root)]
+        while stack:
+            _, item = stack.pop()
+            if isinstance(item, CatalogEntry):
+                result.append(item)
+                continue
+            children = images.get(item, []) + tree.get(item, [])
+            children.sort(key=lambda child: child[0], reverse=True)
+            stack.extend(children)
+        return result
+
+    def refresh(self, image_path: str, summary: Tuple[int, List[str], List[str]] = None) -> Optional[CatalogEntry]:
+        """
+        Update the label summary of one image, e.g. after its label file was saved or deleted.
+
+        Args:
+            image_path: image whose label file changed
+            summary: `summarize_shapes` of the shapes just written to the label file, which is then not read again
+        """
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT mtime_ns, label_file, label_mtime_ns, shape_count, labels, shape_types FROM images WHERE path = ?", (image_path,)
+            ).fetchone()
+            if row is None:
+                return None
+            label_file, label_mtime = self._find_label_file(image_path)
+            if summary is not None and label_file is not None:
+                shape_count, labels, shape_types = summary
+                labels, shape_types = json.dumps(labels, ensure_ascii=False), json.dumps(shape_types)
+            else:
+                label_file, label_mtime, shape_count, labels, shape_types = self._label_row(label_file, label_mtime, None)
+            self._conn.execute(
+                "UPDATE images SET label_file = ?, label_mtime_ns = ?, shape_count = ?, labels = ?, shape_types = ? WHERE path = ?",
+                (label_file, label_mtime, shape_count, labels, shape_types, image_path),
+            )
+        return CatalogEntry(image_path, row[0], label_file, shape_count, json.loads(labels), json.loads(shape_types))
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import tempfile
+
+
+class CocoStreamWriter:
+    """
+    Write a COCO annotation file record by record.
+
+    `images` and `annotations` are emitted while they are produced, annotations are spooled to a temporary
+    file and appended after the images, so memory stays constant regardless of the dataset size. The output is
+    written to a temporary file next to `output_file` and only replaces it once complete.
+
+    Usage:
+        with CocoStreamWriter(output_file, coco_header) as writer:
+            writer.add_image({...})
+            writer.add_annotation({...})
+    """
+
+    # Annotations are kept in memory up to this size before spilling to disk
+    SPOOL_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, output_file: str, header: dict):
+        """
+        Args:
+            output_file: path of the COCO json to write
+            header: COCO top-level fields, `images` and `annotations` are ignored
+        """
+        self.output_file = output_file
+        self.header = {k: v for k, v in header.items() if k not in ("images", "annotations")}
+        self.image_count = 0
+        self.annotation_count = 0
+        self._file = None
+        self._temp_path = None
+        self._spool = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self):
+        fd, self._temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.output_file)}.", dir=os.path.dirname(self.output_file) or ".")
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self._spool = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE, mode="w+", encoding="utf-8")
+        self._file.write("{\n")
+        for key, value in self.header.items():
+            self._file.write(f"    {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n")
+        self._file.write('    "images": [')
+
+    def add_image(self, image: dict):
+        self._file.write(",\n        " if self.image_count else "\n        ")
+        self._file.write(json.dumps(image, ensure_ascii=False))
+        self.image_count += 1
+
+    def add_annotation(self, annotation: dict):
+        self._spool.write(",\n        " if self.annotation_count else "\n        ")
+        self._spool.write(json.dumps(annotation, ensure_ascii=False))
+        self.annotation_count += 1
+
+    def close(self):
+        try:
+            self._file.write("\n    ],\n" if self.image_count else "],\n")
+            self._file.write('    "annotations": [')
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, self._file)
+            self._file.write("\n    ]\n}\n" if self.annotation_count else "]\n}\n")
+            self._spool.close()
+            self._file.close()
+            # mkstemp creates the file readable by the owner only
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(self._temp_path, 0o666 & ~umask)
+            os.replace(self._temp_path, self.output_file)
+        except BaseException:
+            self.abort()
+            raise
+        self._temp_path = None
+
+    def abort(self):
+        self._spool.close()
+        self._file.close()
+        if self._temp_path is not None:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+            self._temp_path = None
+
+
+class CocoStreamReader:
+    """
+    Iterate a COCO annotation file without loading it as a whole.
+
+    The file is read in chunks and each element of the top-level arrays (`images`, `annotations`, `categories`, ...)
+    is decoded on its own, so peak memory is bounded by the chunk size and the largest single element.
+
+    Usage:
+        for key, item in CocoStreamReader(input_file):
+            if key == "annotations":
+                ...
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    WHITESPACE = " \t\n\r"
+
+    def __init__(self, input_file: str, chunk_size: int = None):
+        self.input_file = input_file
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self._decoder = json.JSONDecoder()
+        self._file = None
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        with open(self.input_file, "r", encoding="utf-8") as f:
+            self._file = f
+            self._buffer, self._pos, self._eof = "", 0, False
+            yield from self._iter_top_level()
+            self._file = None
+
+    def _fill(self) -> bool:
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop consumed text before growing the buffer
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """
+        Skip whitespaces and return the next significant character, "" at the end of file.
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self.WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Invalid COCO file {self.input_file}: expect '{char}' at offset {self._pos}")
+        self._pos += 1
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Numbers and literals may be truncated by the chunk boundary
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _iter_top_level(self):
+        self._expect("{")
+        while self._peek() not in ("}", ""):
+            key = self._decode()
+            self._expect(":")
+            if self._peek() == "[":
+                self._pos += 1
+                while self._peek() not in ("]", ""):
+                    yield key, self._decode()
+                    if self._peek() == ",":
+                        self._pos += 1
+                self._expect("]")
+            else:
+                # Scalar and object values such as `info` are small, skip them
+                self._decode()
+            if self._peek() == ",":
+                self._pos += 1
+        self._expect("}")
@@ -0,0 +1,296 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+from utils.export_manifest import hash_file
+from utils.logger import logger
+
+
+def _diff_dict(old: dict, new: dict) -> Optional[dict]:
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    if not changed and not removed:
+        return None
+    return {"set": changed, "unset": removed}
+
+
+def _patch_dict(data: dict, patch: dict):
+    for k in patch["unset"]:
+        data.pop(k, None)
+    data.update(patch["set"])
+
+
+class JournalState:
+    """
+    Labels of an image as tracked by the journal: shapes by key in z-order, flags and image level data.
+    """
+
+    def __init__(self, keys: List, shapes: List[dict], flags: dict, other_data: dict):
+        self.keys = list(keys)
+        self.shapes = dict(zip(self.keys, shapes))
+        self.flags = flags
+        self.other_data = other_data
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> "JournalState":
+        """
+        Args:
+            snapshot: {"keys": [...], "shapes": [...], "flags": {...}, "other_data": {...}}, keys identify shapes
+                across snapshots
+        """
+        return cls(snapshot["keys"], snapshot["shapes"], snapshot["flags"], snapshot["other_data"])
+
+
+class EditJournal:
+    """
+    Append-only journal of the edits made to an image's labels since its label file was written.
+
+    Each edit is appended as small JSON lines describing what changed (added, deleted, updated or reordered shapes,
+    flags and image level data), so an edit costs I/O in the size of the change instead of the label file. The
+    journal starts with the content hash of the label file it applies to, `replay` folds it into the label data
+    when the label file is loaded again, e.g. after a crash. Compacting is writing the label file and calling
+    `rebase`, which starts the journal over.
+
+    Usage:
+        journal = EditJournal(EditJournal.get_path(label_file))
+        journal.reset(label_file, base_snapshot)  # labels as loaded
+        journal.record(snapshot)  # after every edit
+        ...  # write the label file from `written_snapshot`
+        journal.rebase(label_file, written_snapshot)
+    """
+
+    VERSION = 1
+    suffix = ".journal"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.base_file: Optional[str] = None
+        self.synced = True
+        self.state: Optional[JournalState] = None
+        # Bytes appended since the journal was started, 0 while nothing was written
+        self.size = 0
+        self._file = None
+        # Snapshot keys to the keys written to the journal, the shapes of the label file are 0..n-1
+        self._keys: Dict = {}
+
+    @classmethod
+    def get_path(cls, label_file: str) -> str:
+        return os.path.splitext(label_file)[0] + cls.suffix
+
+    def reset(self, base_file: Optional[str], snapshot: dict, synced: bool = True):
+        """
+        Start tracking the labels of an image without writing anything, the journal file is created by the first
+        recorded edit and any existing one is replaced.
+
+        Args:
+            base_file: label file the labels were loaded from, None if the image has none yet
+            snapshot: labels as loaded
+            synced: whether the snapshot holds the shapes of the label file in the same order, otherwise the whole
+                state is written with the first edit
+        """
+        self.close()
+        self.base_file = base_file
+        self.synced = synced
+        self.state = JournalState.from_snapshot(snapshot)
+        self.size = 0
+        self._keys = {key: i for i, key in enumerate(self.state.keys)}
+
+    def _open(self):
+        sha1 = hash_file(self.base_file) if self.base_file and os.path.exists(self.base_file) else None
+        self._file = open(self.path, "w", encoding="utf-8")
+        self.size = 0
+        records = [{"op": "base", "version": self.VERSION, "sha1": sha1}]
+        if not self.synced:
+            records.append(self._reset_record(self.state))
+        self._append(records)
+
+    @staticmethod
+    def _reset_record(state: JournalState) -> dict:
+        return {
+            "op": "reset",
+            "keys": state.keys,
+            "shapes": [state.shapes[key] for key in state.keys],
+            "flags": state.flags,
+            "other_data": state.other_data,
+        }
+
+    def _journal_key(self, key) -> int:
+        if key not in self._keys:
+            self._keys[key] = len(self._keys)
+        return self._keys[key]
+
+    def _append(self, records: List[dict]):
+        for record in records:
+            if "key" in record:
+                record["key"] = self._journal_key(record["key"])
+            if "keys" in record:
+                record["keys"] = [self._journal_key(key) for key in record["keys"]]
+        text = "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records)
+        self._file.write(text)
+        # Survives a crash of the application, not of the system
+        self._file.flush()
+        self.size += len(text)
+
+    @staticmethod
+    def diff(old: JournalState, new: JournalState) -> List[dict]:
+        """
+        Records turning `old` into `new`.
+        """
+        records = []
+        for key in old.keys:
+            if key not in new.shapes:
+                records.append({"op": "delete", "key": key})
+        for key in new.keys:
+            if key not in old.shapes:
+                records.append({"op": "add", "key": key, "shape": new.shapes[key]})
+                continue
+            patch = _diff_dict(old.shapes[key], new.shapes[key])
+            if patch is not None:
+                records.append({"op": "update", "key": key, **patch})
+        # Deleted shapes are dropped and added ones appended, anything else is a change of z-order
+        kept = [key for key in old.keys if key in new.shapes]
+        if kept + [key for key in new.keys if key not in old.shapes] != new.keys:
+            records.append({"op": "order", "keys": new.keys})
+        if old.flags != new.flags:
+            records.append({"op": "flags", "flags": new.flags})
+        patch = _diff_dict(old.other_data, new.other_data)
+        if patch is not None:
+            records.append({"op": "other_data", **patch})
+        return records
+
+    def record(self, snapshot: dict) -> int:
+        """
+        Append the changes from the last recorded labels to `snapshot`.
+
+        Returns:
+            int: bytes appended
+        """
+        state = JournalState.from_snapshot(snapshot)
+        records = self.diff(self.state, state)
+        if records and self._file is None:
+            # Written from the labels before this edit
+            self._open()
+        self.state = state
+        if not records:
+            return 0
+        size = self.size
+        self._append(records)
+        return self.size - size
+
+    def rebase(self, base_file: str, snapshot: dict):
+        """
+        Start over from a label file written from `snapshot`, keeping the edits recorded after the snapshot was taken.
+        """
+        current = self.state
+        self.reset(base_file, snapshot)
+        records = self.diff(self.state, current) if current is not None else []
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if records:
+            self._open()
+            self._append(records)
+        if current is not None:
+            self.state = current
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """
+        Drop the recorded edits, e.g. when they are discarded by the user.
+        """
+        self.close()
+        self.size = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @staticmethod
+    def replay(path: str, base_file: Optional[str], data: dict) -> Optional[dict]:
+        """
+        Fold a journal into label data loaded from `base_file`.
+
+        Args:
+            path: journal file
+            base_file: label file `data` was read from, None if there is none
+            data: label data as written to the label file, updated in place
+
+        Returns:
+            Optional[dict]: `data` with the edits applied, None if there is no journal for this label file or it is
+                ignored, `data` is then left as read
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().split("\n")
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Ignoring unreadable edit journal {path}: {e}")
+            return None
+        records = []
+        for line in lines:
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Interrupted while appending, the edits before are complete
+                logger.warning(f"Edit journal {path} is truncated")
+                break
+        if not records or not isinstance(records[0], dict) or records[0].get("op") != "base" or records[0].get("version") != EditJournal.VERSION:
+            logger.warning(f"Ignoring invalid edit journal {path}")
+            return None
+        header = records[0]
+        sha1 = hash_file(base_file) if base_file and os.path.exists(base_file) else None
+        if header.get("sha1") != sha1:
+            logger.warning(f"Ignoring edit journal {path}, its label file was changed since")
+            return None
+
+        try:
+            result = EditJournal._apply(records[1:], data)
+        except Exception as e:
+            # Records that do not fit the label file, the label data is left untouched
+            logger.warning(f"Ignoring inconsistent edit journal {path}: {e!r}")
+            return None
+        data.clear()
+        data.update(result)
+        return data
+
+    @staticmethod
+    def _apply(records: List[dict], data: dict) -> dict:
+        # Copies are patched so that a failing record leaves `data` as read
+        result = dict(data)
+        shapes: Dict = dict(enumerate(data.get("shapes") or []))
+        keys = list(shapes)
+        for record in records:
+            op = record["op"]
+            if op == "reset":
+                if len(record["keys"]) != len(record["shapes"]):
+                    raise ValueError("reset keys do not match its shapes")
+                keys = list(record["keys"])
+                shapes = dict(zip(keys, record["shapes"]))
+                result["flags"] = record["flags"]
+                _patch_dict(result, {"set": record["other_data"], "unset": []})
+            elif op == "add":
+                keys.append(record["key"])
+                shapes[record["key"]] = record["shape"]
+            elif op == "delete":
+                keys.remove(record["key"])
+                del shapes[record["key"]]
+            elif op == "update":
+                shape = dict(shapes[record["key"]])
+                _patch_dict(shape, record)
+                shapes[record["key"]] = shape
+            elif op == "order":
+                if sorted(record["keys"]) != sorted(keys):
+                    raise ValueError("order keys do not match the shapes")
+                keys = list(record["keys"])
+            elif op == "flags":
+                result["flags"] = record["flags"]
+            elif op == "other_data":
+                _patch_dict(result, record)
+            else:
+                raise ValueError(f"unknown record {op}")
+        result["shapes"] = [shapes[key] for key in keys]
+        return result
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import os.path as osp
+from typing import Dict, Iterable, List, Optional
+
+from utils.logger import logger
+
+
+def hash_file(file_path: str) -> str:
+    """
+    SHA-1 of a file's content.
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class ExportManifest:
+    """
+    Record of the label files an export was built from, used to only regenerate outputs of changed label files.
+
+    Each source file is recorded with its modification time, size and content hash, mapped to the outputs generated
+    from it. The content is only hashed when the modification time or size changed, so touching a file does not
+    trigger a conversion. Other files an output is built from, such as the image whose size it holds, are recorded
+    with their modification time and size as dependencies of the source file. The manifest is dropped when the export
+    options (`signature`) change.
+
+    Usage:
+        manifest = ExportManifest(output_dir, "yolo", {"mode": "hbb", "classes": classes})
+        if not manifest.is_unchanged(label_file, [image_file]):
+            ...  # convert
+            manifest.record(label_file, [output_file], [image_file])
+        manifest.save()
+    """
+
+    VERSION = 2
+
+    def __init__(self, output_dir: str, export_format: str, signature: dict = None):
+        """
+        Args:
+            output_dir: directory the export is written to, which also holds the manifest
+            export_format: name of the exported format, one manifest is kept per format
+            signature: json serializable export options, outputs are regenerated when they change
+        """
+        self.output_dir = output_dir
+        self.export_format = export_format
+        self.signature = json.loads(json.dumps(signature or {}))
+        self.path = self.get_path(output_dir, export_format)
+        self.entries: Dict[str, dict] = {}
+        # Content hashes computed by `is_unchanged`, reused by `record`
+        self._hashes: Dict[str, Optional[str]] = {}
+        self.load()
+
+    @staticmethod
+    def get_path(output_dir: str, export_format: str) -> str:
+        return osp.join(output_dir, f".semi_export_{export_format}.manifest.json")
+
+    @classmethod
+    def discard(cls, output_dir: str, export_format: str):
+        """
+        Delete the manifest of an export, to be called when the export is rebuilt without it.
+        """
+        path = cls.get_path(output_dir, export_format)
+        if osp.exists(path):
+            os.remove(path)
+
+    def load(self):
+        if not osp.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable export manifest {self.path}: {e}")
+            return
+        if data.get("version") != self.VERSION or data.get("signature") != self.signature:
+            logger.info(f"Export options of {self.export_format} changed, regenerating all outputs")
+            return
+        self.entries = data.get("entries", {})
+
+    def save(self):
+        data = {"version": self.VERSION, "format": self.export_format, "signature": self.signature, "entries": self.entries}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(source_file: str) -> str:
+        return osp.abspath(source_file)
+
+    @staticmethod
+    def _stat(source_file: str) -> Optional[List[int]]:
+        try:
+            stat = os.stat(source_file)
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _hash(self, key: str) -> Optional[str]:
+        if key not in self._hashes:
+            self._hashes[key] = hash_file(key) if osp.exists(key) else None
+        return self._hashes[key]
+
+    def get(self, source_file: str) -> Optional[dict]:
+        return self.entries.get(self._key(source_file))
+
+    def _stat_dependencies(self, dependencies: Iterable[str]) -> Dict[str, Optional[List[int]]]:
+        return {self._key(dependency): self._stat(dependency) for dependency in dependencies}
+
+    def is_unchanged(self, source_file: str, dependencies: Iterable[str] = ()) -> bool:
+        """
+        Whether the outputs recorded for `source_file` are up to date, a missing source file is a valid state.
+
+        Args:
+            dependencies: other files the outputs are built from, up to date when their modification time and size
+                are the recorded ones
+        """
+        key = self._key(source_file)
+        entry = self.entries.get(key)
+        if entry is None or not all(osp.exists(output) for output in entry["outputs"]):
+            return False
+        if self._stat_dependencies(dependencies) != entry.get("dependencies", {}):
+            return False
+        stat = self._stat(key)
+        if stat == entry["stat"]:
+            return True
+        if stat is None or entry["stat"] is None or self._hash(key) != entry["sha1"]:
+            return False
+        # Same content with a new modification time
+        entry["stat"] = stat
+        return True
+
+    def record(self, source_file: str, outputs: Iterable[str] = (), dependencies: Iterable[str] = (), **extra):
+        """
+        Record the outputs generated from the current content of `source_file`.
+
+        Args:
+            dependencies: other files the outputs are built from, see `is_unchanged`
+            extra: format specific data stored with the entry, e.g. the COCO image id
+        """
+        key = self._key(source_file)
+        entry = {
+            "stat": self._stat(key),
+            "sha1": self._hash(key),
+            "outputs": [osp.abspath(output) for output in outputs],
+            "dependencies": self._stat_dependencies(dependencies),
+        }
+        entry.update(extra)
+        self.entries[key] = entry
+        self._hashes.pop(key, None)
+
+    def stale_sources(self, source_files: Iterable[str]) -> List[str]:
+        """
+        Recorded sources which are not part of `source_files` anymore.
+        """
+        current = {self._key(source_file) for source_file in source_files}
+        return [key for key in self.entries if key not in current]
+
+    def remove(self, source_file: str, delete_outputs: bool = True):
+        entry = self.entries.pop(self._key(source_file), None)
+        if entry is None or not delete_outputs:
+            return
+        for output in entry["outputs"]:
+            if osp.exists(output):
+                os.remove(output)
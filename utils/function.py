@@ -13,12 +13,16 @@ def has_chinese(s):
     return bool(re.search('[\u4e00-\u9fff]', str(s)))
 
 
-def walkthrough_files_in_dir(folder_path):
-    extensions = [
+def get_image_extensions():
+    return [
         f".{fmt.data().decode().lower()}"
         for fmt in QtGui.QImageReader.supportedImageFormats()
     ]
 
+
+def walkthrough_files_in_dir(folder_path):
+    extensions = get_image_extensions()
+
     file_list = []
     for root, _, files in os.walk(folder_path):
         for file in files:
@@ -1,10 +1,12 @@
 import base64
 import io
+from typing import List, Optional, Tuple
 
 import PIL.ExifTags
 import PIL.Image
 import PIL.ImageOps
 import numpy as np
+from PyQt5 import QtGui
 
 
 def img_data_to_pil(img_data):
@@ -14,6 +16,127 @@ def img_data_to_pil(img_data):
     return img_pil
 
 
+class DecodedImage(QtGui.QImage):
+    """
+    An image decoded once into a single RGBA pixel buffer, shared without copying by Qt (it is a QImage), NumPy
+    (`array`) and PIL (`to_pil`).
+
+    Views are read-only and only valid as long as this image is referenced.
+
+    Usage:
+        image = DecodedImage(image_bytes)
+        pixmap = QtGui.QPixmap.fromImage(image)
+        gray = image.array[..., :3].mean(axis=2)
+    """
+
+    def __init__(self, img_data=None):
+        super().__init__()
+        self._array = None
+        self._histogram: Optional[List[int]] = None
+        if img_data:
+            image = QtGui.QImage.fromData(img_data)
+            if not image.isNull():
+                if image.format() != QtGui.QImage.Format_RGBA8888:
+                    image = image.convertToFormat(QtGui.QImage.Format_RGBA8888)
+                self.swap(image)
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        Read-only (height, width, 4) uint8 RGBA view of the pixels.
+        """
+        if self._array is None and not self.isNull():
+            bits = self.constBits()
+            bits.setsize(self.sizeInBytes())
+            rows = np.frombuffer(bits, dtype=np.uint8).reshape(self.height(), self.bytesPerLine())
+            self._array = rows[:, :self.width() * 4].reshape(self.height(), self.width(), 4)
+        return self._array
+
+    def to_pil(self) -> PIL.Image.Image:
+        """
+        Read-only RGBA PIL image on the pixels, PIL operations return new images.
+        """
+        bits = self.constBits()
+        bits.setsize(self.sizeInBytes())
+        return PIL.Image.frombuffer("RGBA", (self.width(), self.height()), bits, "raw", "RGBA", self.bytesPerLine(), 1)
+
+    def get_histogram(self) -> List[int]:
+        """
+        Histogram of the RGBA bands, 256 values each, computed once.
+        """
+        if self._histogram is None:
+            self._histogram = self.to_pil().histogram() if not self.isNull() else [0] * 1024
+        return self._histogram
+
+
+def _get_luminance_mean(histogram: List[int], lut: List[int]) -> float:
+    """
+    Mean luminance of an image, as converted by PIL, once `lut` is applied to its RGB bands.
+    """
+    total = sum(histogram[:256]) or 1
+    return sum(
+        weight * sum(count * lut[value] for value, count in enumerate(histogram[band * 256:band * 256 + 256]))
+        for band, weight in enumerate((0.299, 0.587, 0.114))
+    ) / total
+
+
+def get_brightness_contrast_lut(brightness: float, contrast: float, histogram: Optional[List[int]] = None) -> List[int]:
+    """
+    Lookup table of a channel giving the same result as `PIL.ImageEnhance.Brightness` followed by `Contrast`.
+
+    Args:
+        brightness: brightness factor, 1 keeps the image
+        contrast: contrast factor, 1 keeps the image
+        histogram: RGBA histogram of the image, required if contrast is not 1
+
+    Returns:
+        List[int]: 256 output values
+    """
+    lut = [min(max(int(value * brightness), 0), 255) for value in range(256)]
+    if contrast == 1:
+        return lut
+    # Contrast is scaled around the mean luminance of the brightened image
+    mean = int(_get_luminance_mean(histogram, lut) + 0.5)
+    return [min(max(int(mean + contrast * (value - mean)), 0), 255) for value in lut]
+
+
+def get_auto_contrast(histogram: List[int], cutoff: float = 0.005) -> Tuple[float, float]:
+    """
+    Brightness and contrast factors stretching the RGB values between the `cutoff` darkest and lightest ones to the
+    full range.
+
+    Args:
+        histogram: RGBA histogram of the image
+        cutoff: fraction of the values ignored at each end
+
+    Returns:
+        Tuple[float, float]: brightness and contrast factors, 1 if the image is uniform
+    """
+    rgb = [sum(counts) for counts in zip(histogram[:256], histogram[256:512], histogram[512:768])]
+    total = sum(rgb)
+    if not total:
+        return 1.0, 1.0
+    low, high, count = 0, 255, 0
+    for value, value_count in enumerate(rgb):
+        count += value_count
+        if count > total * cutoff:
+            low = value
+            break
+    count = 0
+    for value in range(255, -1, -1):
+        count += rgb[value]
+        if count > total * cutoff:
+            high = value
+            break
+    mean = _get_luminance_mean(histogram, list(range(256)))
+    if high <= low or mean <= low:
+        return 1.0, 1.0
+    # The brightened mean is brightness * mean, so low is mapped to 0 when contrast = mean / (mean - low)
+    contrast = mean / (mean - low)
+    brightness = 255 / ((high - low) * contrast)
+    return brightness, contrast
+
+
 def img_data_to_arr(img_data):
     img_pil = img_data_to_pil(img_data)
     img_arr = np.array(img_pil)
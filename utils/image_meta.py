@@ -0,0 +1,219 @@
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from typing import Optional, Tuple
+
+import PIL.Image
+
+from utils.logger import logger
+
+# JPEG start of frame markers, which carry the image size. DHT(C4), JPG(C8) and DAC(CC) are not frames.
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+# PNG color type -> channels of the decoded image, palette images are decoded as RGB
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+
+def _read_jpeg_header(data) -> Optional[Tuple[int, int, int]]:
+    pos, length = 2, len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Fill byte
+            pos += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            pos += 2
+            continue
+        segment_length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            if pos + 10 > length:
+                return None
+            height, width, components = struct.unpack(">HHB", data[pos + 5:pos + 10])
+            return width, height, components
+        pos += 2 + segment_length
+    return None
+
+
+def _read_png_header(data) -> Optional[Tuple[int, int, int]]:
+    if len(data) < 26 or bytes(data[12:16]) != b"IHDR":
+        return None
+    width, height, _, color_type = struct.unpack(">IIBB", data[16:26])
+    return width, height, PNG_CHANNELS.get(color_type, 3)
+
+
+def _read_bmp_header(data) -> Optional[Tuple[int, int, int]]:
+    if len(data) < 26:
+        return None
+    header_size = struct.unpack("<I", data[14:18])[0]
+    if header_size == 12:
+        width, height, _, bit_count = struct.unpack("<HHHH", data[18:26])
+    elif len(data) >= 30:
+        width, height, _, bit_count = struct.unpack("<iiHH", data[18:30])
+    else:
+        return None
+    # Negative height means a top-down bitmap
+    return abs(width), abs(height), 4 if bit_count == 32 else 3
+
+
+def _read_tiff_header(data) -> Optional[Tuple[int, int, int]]:
+    endian = "<" if bytes(data[:2]) == b"II" else ">"
+    ifd_offset = struct.unpack(endian + "I", data[4:8])[0]
+    if ifd_offset + 2 > len(data):
+        return None
+    entry_count = struct.unpack(endian + "H", data[ifd_offset:ifd_offset + 2])[0]
+    tags = {}
+    for i in range(entry_count):
+        entry = ifd_offset + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag, value_type = struct.unpack(endian + "HH", data[entry:entry + 4])
+        if tag not in (256, 257, 277):
+            continue
+        # SHORT values are left aligned in the 4 bytes value field
+        fmt = endian + ("H" if value_type == 3 else "I")
+        tags[tag] = struct.unpack(fmt, data[entry + 8:entry + 8 + struct.calcsize(fmt)])[0]
+    if 256 not in tags or 257 not in tags:
+        return None
+    return tags[256], tags[257], tags.get(277, 1)
+
+
+def read_image_header(data) -> Optional[Tuple[int, int, int]]:
+    """
+    Read the size of an image from its header without decoding pixels.
+
+    Supports JPEG, PNG, BMP and TIFF.
+
+    Args:
+        data: bytes-like object holding (at least the beginning of) the encoded image
+
+    Returns:
+        Optional[Tuple[int, int, int]]: (width, height, depth), None if the format is not supported
+    """
+    try:
+        head = bytes(data[:8])
+        if head[:2] == b"\xff\xd8":
+            return _read_jpeg_header(data)
+        if head == b"\x89PNG\r\n\x1a\n":
+            return _read_png_header(data)
+        if head[:2] == b"BM":
+            return _read_bmp_header(data)
+        if head[:4] in (b"II*\x00", b"MM\x00*"):
+            return _read_tiff_header(data)
+    except struct.error:
+        pass
+    return None
+
+
+def probe_image_file(image_file: str) -> Tuple[int, int, int]:
+    """
+    Get (width, height, depth) of an image file, reading only its header when the format is supported.
+    """
+    with open(image_file, "rb") as f:
+        try:
+            # Only the pages holding the header are actually read
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                header = read_image_header(data)
+        except ValueError:
+            # Empty file can not be mapped
+            header = None
+    if header is not None:
+        return header
+    # PIL only parses the header when opening
+    with PIL.Image.open(image_file) as img:
+        width, height = img.size
+        return width, height, len(img.getbands())
+
+
+class ImageMetaCache:
+    """
+    Persistent cache of image (width, height, depth), keyed by path, modification time and file size.
+
+    Shared by all converters through `image_meta_cache`, so exporting a dataset probes each image at most once.
+    """
+
+    def __init__(self, path: str = None):
+        self.path: str = os.path.join(os.path.expanduser("~"), ".semi_image_meta.db") if path is None else path
+        self._memory: dict = {}
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # Connections must not be shared with forked worker processes
+        self._pid: Optional[int] = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._pid == os.getpid():
+            return self._connection
+        self._pid = os.getpid()
+        self._memory = {}
+        self._connection = None
+        try:
+            self._connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS image_meta ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, width INTEGER, height INTEGER, depth INTEGER)"
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Image meta cache is disabled, failed opening {self.path}: {e}")
+            self._connection = None
+        return self._connection
+
+    def get(self, image_file: str) -> Tuple[int, int, int]:
+        """
+        Get (width, height, depth) of an image file.
+        """
+        image_file = os.path.abspath(image_file)
+        stat = os.stat(image_file)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            connection = self._connect()
+            cached = self._memory.get(image_file)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            row = None
+            if connection is not None:
+                try:
+                    row = connection.execute(
+                        "SELECT mtime_ns, size, width, height, depth FROM image_meta WHERE path = ?", (image_file,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed reading image meta cache of {image_file}: {e}")
+                if row is not None and tuple(row[:2]) == key:
+                    meta = tuple(row[2:])
+                    self._memory[image_file] = (key, meta)
+                    return meta
+
+        meta = probe_image_file(image_file)
+        with self._lock:
+            self._memory[image_file] = (key, meta)
+            connection = self._connect()
+            if connection is not None:
+                try:
+                    connection.execute("INSERT OR REPLACE INTO image_meta VALUES (?, ?, ?, ?, ?, ?)", (image_file, *key, *meta))
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed caching image meta of {image_file}: {e}")
+        return meta
+
+    def get_size(self, image_file: str) -> Tuple[int, int]:
+        """
+        Get (width, height) of an image file.
+        """
+        width, height, _ = self.get(image_file)
+        return width, height
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
+            self._memory = {}
+
+
+image_meta_cache = ImageMetaCache()
@@ -0,0 +1,181 @@
+import base64
+import json
+import os
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+BINARY_SUFFIX = ".slbl"
+JSON_SUFFIX = ".json"
+MAGIC = b"SLBL"
+VERSION = 1
+
+# magic, version, reserved, metadata size, point count, image size
+_HEADER = struct.Struct("<4sHHIQQ")
+_POINT_DTYPE = np.dtype("<f4")
+
+
+def _align(size: int) -> int:
+    return (size + 3) // 4 * 4
+
+
+def is_binary_label(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() == BINARY_SUFFIX
+
+
+def encode_label(data: dict, image_bytes: Optional[bytes] = None) -> bytes:
+    """
+    Encode label data of the custom format into the binary label format.
+
+    The file is a fixed header, the label data without points as UTF-8 JSON, the points of all shapes as one packed
+    little-endian float32 array and the raw image bytes, if any. Point counts of the shapes are kept in the metadata.
+
+    Args:
+        data: label data as written to JSON, `imageData` is ignored
+        image_bytes: raw (not base64) image bytes to embed
+
+    Returns:
+        bytes: content of the binary label file
+    """
+    shapes = data.get("shapes") or []
+    points = [np.asarray(shape["points"], dtype=_POINT_DTYPE).reshape(-1, 2) for shape in shapes]
+    # Keys keep their order, so that the data exports back to the same JSON
+    meta = {k: None if k == "imageData" else v for k, v in data.items()}
+    meta["shapes"] = [{k: v for k, v in shape.items() if k != "points"} for shape in shapes]
+    meta["pointCounts"] = [len(p) for p in points]
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    meta_bytes += b" " * (_align(len(meta_bytes)) - len(meta_bytes))
+    point_bytes = np.concatenate(points).tobytes() if points else b""
+    image_bytes = bytes(image_bytes) if image_bytes is not None else b""
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(meta_bytes), sum(meta["pointCounts"]), len(image_bytes))
+    return b"".join([header, meta_bytes, point_bytes, image_bytes])
+
+
+def decode_label(buffer) -> Tuple[dict, Optional[bytes]]:
+    """
+    Decode a binary label file into label data of the custom format.
+
+    Args:
+        buffer: content of the binary label file, any bytes-like object
+
+    Returns:
+        Tuple: (label data with `imageData` set to None, raw embedded image bytes or None)
+    """
+    view = memoryview(buffer)
+    if len(view) < _HEADER.size:
+        raise ValueError("Truncated binary label file")
+    magic, version, _, meta_size, point_count, image_size = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a binary label file")
+    if version > VERSION:
+        raise ValueError(f"Unsupported binary label version: {version}")
+    points_offset = _HEADER.size + meta_size
+    image_offset = points_offset + point_count * 2 * _POINT_DTYPE.itemsize
+    if len(view) < image_offset + image_size:
+        raise ValueError("Truncated binary label file")
+
+    data = json.loads(bytes(view[_HEADER.size:points_offset]).decode("utf-8"))
+    point_counts = data.pop("pointCounts")
+    points = np.frombuffer(view, dtype=_POINT_DTYPE, count=point_count * 2, offset=points_offset).reshape(-1, 2)
+    # Python floats are created once for the whole array, then split by shape
+    points = points.astype(np.float64).tolist()
+    start = 0
+    for shape, count in zip(data["shapes"], point_counts):
+        shape["points"] = points[start:start + count]
+        start += count
+    image_bytes = bytes(view[image_offset:image_offset + image_size]) if image_size else None
+    return data, image_bytes
+
+
+def read_label_binary(filename: str) -> Tuple[dict, Optional[bytes]]:
+    with open(filename, "rb") as f:
+        return decode_label(f.read())
+
+
+def read_label_data(filename: str) -> dict:
+    """
+    Read label data of the custom format from a JSON or binary label file.
+
+    The embedded image of a binary label file is not decoded, `imageData` is None, readers which need the image
+    bytes use `read_label_binary`.
+    """
+    if is_binary_label(filename):
+        data, _ = read_label_binary(filename)
+        return data
+    with open(filename, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_label_file(filename: str) -> Optional[str]:
+    """
+    Find the existing label file of `filename`, a label path of any format.
+
+    When both the JSON and the binary label file exist, the most recently modified one is used, so that JSON files
+    edited by other tools or exported to JSON take precedence over an older binary file.
+
+    Returns:
+        str: path of the label file, None if there is none
+    """
+    candidates = []
+    for suffix in (JSON_SUFFIX, BINARY_SUFFIX):
+        path = os.path.splitext(filename)[0] + suffix
+        try:
+            candidates.append((os.stat(path).st_mtime_ns, path))
+        except OSError:
+            continue
+    if not candidates:
+        return None
+    return max(candidates)[1]
+
+
+def list_label_files(dir_path: str) -> List[str]:
+    """
+    Label files of a directory in any format, one per image, see `find_label_file`.
+    """
+    stems = {}
+    for entry in os.scandir(dir_path):
+        stem, ext = os.path.splitext(entry.name)
+        if ext.lower() in (JSON_SUFFIX, BINARY_SUFFIX) and entry.is_file():
+            stems.setdefault(stem, entry.path)
+    return [find_label_file(path) or path for path in stems.values()]
+
+
+def write_label_binary(filename: str, data: dict, image_bytes: Optional[bytes] = None):
+    with open(filename, "wb") as f:
+        f.write(encode_label(data, image_bytes))
+
+
+def binary_to_json(filename: str, json_file: str = None) -> str:
+    """
+    Export a binary label file to a JSON label file, the embedded image is stored base64 encoded in `imageData`.
+
+    Args:
+        filename: binary label file
+        json_file: output file, defaults to the binary label file with a ".json" suffix
+
+    Returns:
+        str: path of the JSON label file
+    """
+    data, image_bytes = read_label_binary(filename)
+    if image_bytes is not None:
+        data["imageData"] = base64.b64encode(image_bytes).decode("utf-8")
+    json_file = json_file or os.path.splitext(filename)[0] + ".json"
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return json_file
+
+
+def json_to_binary(filename: str, binary_file: str = None) -> str:
+    """
+    Convert a JSON label file to a binary label file, the inverse of `binary_to_json`.
+
+    Returns:
+        str: path of the binary label file
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    image_bytes = base64.b64decode(data["imageData"]) if data.get("imageData") else None
+    binary_file = binary_file or os.path.splitext(filename)[0] + BINARY_SUFFIX
+    write_label_binary(binary_file, data, image_bytes)
+    return binary_file
@@ -0,0 +1,91 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def read_rows(input_file: str, delimiter: str = None) -> List[List[str]]:
+    """
+    Split a text label file into the tokens of its non-empty lines.
+
+    Args:
+        input_file: text label file
+        delimiter: token delimiter, any whitespace if None
+
+    Returns:
+        List[List[str]]: tokens of each line
+    """
+    with open(input_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    if delimiter is None:
+        return [line.split() for line in text.splitlines() if line.strip()]
+    return [[token.strip() for token in line.split(delimiter)] for line in text.splitlines() if line.strip()]
+
+
+def parse_table(input_file: str, columns: int, delimiter: str = None) -> np.ndarray:
+    """
+    Parse a label file whose lines all have the same number of numeric columns.
+
+    Lines with more columns are truncated, lines with fewer columns are skipped.
+
+    Returns:
+        np.ndarray: float64 array with shape (lines, columns)
+    """
+    rows = [row[:columns] for row in read_rows(input_file, delimiter) if len(row) >= columns]
+    if not rows:
+        return np.zeros((0, columns), dtype=np.float64)
+    return np.array(rows, dtype=np.float64)
+
+
+def parse_ragged(input_file: str) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Parse a label file made of a class index followed by a variable number of values, e.g. YOLO segmentation.
+
+    All values are converted in a single call and then split per line.
+
+    Returns:
+        Tuple: (class indexes with shape (lines,), values of each line)
+    """
+    rows = read_rows(input_file)
+    if not rows:
+        return np.zeros((0,), dtype=np.int64), []
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    values = np.array([token for row in rows for token in row], dtype=np.float64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    class_indexes = values[offsets[:-1]].astype(np.int64)
+    return class_indexes, [values[start + 1:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def format_rows(rows, prefixes=None, suffixes=None, delimiter: str = " ") -> str:
+    """
+    Format rows of values into label lines.
+
+    Args:
+        rows: 2D array or list of 1D arrays
+        prefixes: values written before each row, e.g. class indexes
+        suffixes: values written after each row, e.g. label and difficult of DOTA
+
+    Returns:
+        str: formatted lines, each terminated by a line break
+    """
+    rows = rows.tolist() if isinstance(rows, np.ndarray) else [np.asarray(row).tolist() for row in rows]
+    lines = [delimiter.join(map(str, row)) for row in rows]
+    if prefixes is not None:
+        lines = [f"{prefix}{delimiter}{line}" for prefix, line in zip(np.asarray(prefixes).tolist(), lines)]
+    if suffixes is not None:
+        lines = [f"{line}{delimiter}{suffix}" for line, suffix in zip(lines, suffixes)]
+    return "".join(f"{line}\n" for line in lines)
+
+
+def rectangle_to_points(x_min: np.ndarray, y_min: np.ndarray, x_max: np.ndarray, y_max: np.ndarray) -> np.ndarray:
+    """
+    Build the four corners of axis aligned rectangles, clockwise from top left.
+
+    Returns:
+        np.ndarray: corners with shape (rectangles, 4, 2)
+    """
+    return np.stack([
+        np.stack([x_min, y_min], axis=-1),
+        np.stack([x_max, y_min], axis=-1),
+        np.stack([x_max, y_max], axis=-1),
+        np.stack([x_min, y_max], axis=-1),
+    ], axis=1)
@@ -1,12 +1,16 @@
 import configparser
+import contextlib
 import json
 import math
 import os
 import os.path as osp
 import pathlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
-from itertools import chain
 from typing import Tuple
+from xml.dom import minidom
+from xml.etree import ElementTree as ET
 
 import cv2
 import jsonlines
@@ -18,14 +22,24 @@ from defusedxml import ElementTree
 
 from core.configs.constants import Constants
 from core.dto.enums import ShapeType
-from utils.function import is_possible_rectangle
+from utils.calculator import rectangle_from_diagonal
+from utils.coco_stream import CocoStreamReader, CocoStreamWriter
+from utils.export_manifest import ExportManifest
+from utils.function import get_image_extensions, is_possible_rectangle
+from utils.image_meta import image_meta_cache
+from utils.label_binary import find_label_file, list_label_files, read_label_data
+from utils.label_codec import parse_table, parse_ragged, read_rows, format_rows, rectangle_to_points
 from utils.logger import logger
+from utils.mask_codec import rasterize_bands, rasterize_polygons, read_class_map, trace_class_contours, write_png_bands
+from utils.ppocr_export import PPOCRExportSession, gen_quads_from_polys, get_rotate_crop_images
 
 
 class LabelConverter:
     def __init__(self, classes_file=None, pose_cfg_file=None):
         self.classes = []
         self.custom_data = {}
+        # Guards appends to output files shared by several converters, e.g. PPOCR's Label.txt
+        self.output_lock = contextlib.nullcontext()
         if classes_file:
             with open(classes_file, "r", encoding="utf-8") as f:
                 self.classes = f.read().splitlines()
@@ -39,7 +53,11 @@ class LabelConverter:
                     self.pose_classes[class_name] = keypoint_name
 
     def reset(self):
-        self.custom_data = {
+        self.custom_data = self.get_custom_data()
+
+    @staticmethod
+    def get_custom_data() -> dict:
+        return {
             "version": Constants.APP_VERSION,
             "flags": {},
             "shapes": [],
@@ -49,6 +67,11 @@ class LabelConverter:
             "imageWidth": -1
         }
 
+    @staticmethod
+    def write_custom_data(custom_data, output_file):
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(custom_data, f, indent=2, ensure_ascii=False)
+
     @staticmethod
     def calculate_rotation_theta(points) -> float:
         x1, y1 = points[0]
@@ -69,6 +92,16 @@ class LabelConverter:
 
         return rotation_angle_degrees / 360 * (2 * math.pi)
 
+    @staticmethod
+    def calculate_rotation_thetas(points_list: np.ndarray) -> np.ndarray:
+        """
+        Vectorized `calculate_rotation_theta` for an array of rotation shapes with shape (shapes, 4, 2).
+        """
+        diagonal_vectors = points_list[:, 1] - points_list[:, 0]
+        rotation_angles_degrees = np.degrees(np.arctan2(diagonal_vectors[:, 1], diagonal_vectors[:, 0]))
+        rotation_angles_degrees[rotation_angles_degrees < 0] += 360
+        return rotation_angles_degrees / 360 * (2 * math.pi)
+
     @staticmethod
     def calculate_polygon_area(segmentation) -> float:
         x, y = [], []
@@ -82,9 +115,7 @@ class LabelConverter:
 
     @staticmethod
     def get_image_size(image_file) -> Tuple[int, int]:
-        with Image.open(image_file) as img:
-            width, height = img.size
-            return width, height
+        return image_meta_cache.get_size(image_file)
 
     @staticmethod
     def get_min_enclosing_bbox(segmentation) -> list:
@@ -101,58 +132,9 @@ class LabelConverter:
         return [x_min, y_min, bbox_width, bbox_height]
 
     @staticmethod
-    def get_contours_and_labels(mask, mapping_table, epsilon_factor=0.001):
-        results = []
-        input_type = mapping_table["type"]
-        mapping_color = mapping_table["colors"]
-
-        if input_type == "grayscale":
-            color_to_label = {v: k for k, v in mapping_color.items()}
-            binary_img = cv2.imread(mask, cv2.IMREAD_GRAYSCALE)
-            # use the different color_value to find the sub-region for each class
-            for color_value in np.unique(binary_img):
-                class_name = color_to_label.get(color_value, "Unknown")
-                label_map = (binary_img == color_value).astype(np.uint8)
-
-                contours, _ = cv2.findContours(label_map, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                for contour in contours:
-                    epsilon = epsilon_factor * cv2.arcLength(contour, True)
-                    approx = cv2.approxPolyDP(contour, epsilon, True)
-                    if len(approx) < 5:
-                        continue
-
-                    points = []
-                    for point in approx:
-                        x, y = point[0].tolist()
-                        points.append([x, y])
-                    result_item = {"points": points, "label": class_name}
-                    results.append(result_item)
-        elif input_type == "rgb":
-            color_to_label = {tuple(color): label for label, color in mapping_color.items()}
-            rgb_img = cv2.imread(mask)
-            hsv_img = cv2.cvtColor(rgb_img, cv2.COLOR_BGR2HSV)
-
-            _, binary_img = cv2.threshold(hsv_img[:, :, 1], 0, 255, cv2.THRESH_BINARY)
-            contours, _ = cv2.findContours(binary_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            for contour in contours:
-                epsilon = epsilon_factor * cv2.arcLength(contour, True)
-                approx = cv2.approxPolyDP(contour, epsilon, True)
-                if len(approx) < 5:
-                    continue
-
-                x, y, w, h = cv2.boundingRect(contour)
-                center = (int(x + w / 2), int(y + h / 2))
-                rgb_color = rgb_img[center[1], center[0]].tolist()
-                label = color_to_label.get(tuple(rgb_color[::-1]), "Unknown")
-
-                points = []
-                for point in approx:
-                    x, y = point[0].tolist()
-                    points.append([x, y])
-
-                result_item = {"points": points, "label": label}
-                results.append(result_item)
-        return results
+    def get_contours_and_labels(mask, mapping_table, epsilon_factor=0.001, workers=None, tile_size=None):
+        class_map, labels = read_class_map(mask, mapping_table, tile_size)
+        return trace_class_contours(class_map, labels, epsilon_factor, workers, tile_size)
 
     @staticmethod
     def get_coco_data():
@@ -216,103 +198,30 @@ class LabelConverter:
         """
         Generate min area quad from poly.
         """
-        point_num = poly.shape[0]
-        min_area_quad = np.zeros((4, 2), dtype=np.float32)
-        rect = cv2.minAreaRect(poly.astype(np.int32))
-        box = np.array(cv2.boxPoints(rect))
-
-        first_point_idx = 0
-        min_dist = 1e4
-        for i in range(4):
-            dist = (
-                    np.linalg.norm(box[(i + 0) % 4] - poly[0])
-                    + np.linalg.norm(box[(i + 1) % 4] - poly[point_num // 2 - 1])
-                    + np.linalg.norm(box[(i + 2) % 4] - poly[point_num // 2])
-                    + np.linalg.norm(box[(i + 3) % 4] - poly[-1])
-            )
-            if dist < min_dist:
-                min_dist = dist
-                first_point_idx = i
-        for i in range(4):
-            min_area_quad[i] = box[(first_point_idx + i) % 4]
-
-        bbox_new = min_area_quad.tolist()
-        bbox = []
-
-        for box in bbox_new:
-            box = list(map(int, box))
-            bbox.append(box)
-
-        return bbox
+        return gen_quads_from_polys([np.asarray(poly)])[0].tolist()
 
     @staticmethod
     def get_rotate_crop_image(img, points):
-        # Use Green's theory to judge clockwise or counterclockwise
-        d = 0.0
-        for index in range(-1, 3):
-            d += -0.5 * (points[index + 1][1] + points[index][1]) * (points[index + 1][0] - points[index][0])
-        if d < 0:  # counterclockwise
-            tmp = np.array(points)
-            points[1], points[3] = tmp[3], tmp[1]
-
-        try:
-            img_crop_width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
-            img_crop_height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
-            pts_std = np.float32([
-                [0, 0],
-                [img_crop_width, 0],
-                [img_crop_width, img_crop_height],
-                [0, img_crop_height],
-            ])
-            M = cv2.getPerspectiveTransform(points, pts_std)
-            dst_img = cv2.warpPerspective(
-                img,
-                M,
-                (img_crop_width, img_crop_height),
-                borderMode=cv2.BORDER_REPLICATE,
-                flags=cv2.INTER_CUBIC,
-            )
-            dst_img_height, dst_img_width = dst_img.shape[0:2]
-            if dst_img_height * 1.0 / dst_img_width >= 1.5:
-                dst_img = np.rot90(dst_img)
-            return dst_img
-        except Exception as e:
-            print(e)
+        return get_rotate_crop_images(img, np.asarray(points, np.float32)[None])[0]
 
     def yolo_obb_to_custom(self, input_file, output_file, image_file):
         self.reset()
-        with open(input_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
+        table = parse_table(input_file, 9)
         img_w, img_h = self.get_image_size(image_file)
-        for line in lines:
-            line = line.strip().split(" ")
-            class_index = int(line[0])
-            label = self.classes[class_index]
-            shape_type = ShapeType.ROTATION.name
-            # Extracting coordinates from YOLO format
-            x0, y0, x1, y1, x2, y2, x3, y3 = map(float, line[1:])
-            # Rescaling coordinates to image size
-            x0, y0, x1, y1, x2, y2, x3, y3 = (
-                x0 * img_w,
-                y0 * img_h,
-                x1 * img_w,
-                y1 * img_h,
-                x2 * img_w,
-                y2 * img_h,
-                x3 * img_w,
-                y3 * img_h,
-            )
-            # Creating points in the custom format
-            points = [[x0, y0], [x1, y1], [x2, y2], [x3, y3]]
+        shape_type = ShapeType.ROTATION.name
+        # Rescaling coordinates to image size
+        points_list = table[:, 1:9].reshape(-1, 4, 2) * np.array([img_w, img_h], np.float64)
+        directions = self.calculate_rotation_thetas(points_list).tolist()
+        for class_index, points, direction in zip(table[:, 0].astype(np.int64).tolist(), points_list.tolist(), directions):
             shape = {
-                "label": label,
+                "label": self.classes[class_index],
                 "shape_type": shape_type,
                 "flags": {},
                 "points": points,
                 "group_id": None,
                 "description": None,
                 "is_difficult": False,
-                "direction": self.calculate_rotation_theta(points),
+                "direction": direction,
                 "attributes": {},
             }
             self.custom_data["shapes"].append(shape)
@@ -324,23 +233,17 @@ class LabelConverter:
 
     def yolo_pose_to_custom(self, input_file, output_file, image_file):
         self.reset()
-        with open(input_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
+        class_indexes, rows = parse_ragged(input_file)
         img_w, img_h = self.get_image_size(image_file)
+        image_size = np.array([img_w, img_h], np.float64)
         classes = list(self.pose_classes.keys())
-        for i, line in enumerate(lines):
-            line = line.strip().split(" ")
-            class_index = int(line[0])
+        interval = 3 if self.has_visible else 2
+        for i, (class_index, row) in enumerate(zip(class_indexes.tolist(), rows)):
             label = classes[class_index]
             # Add rectangle info
-            cx = float(line[1])
-            cy = float(line[2])
-            nw = float(line[3])
-            nh = float(line[4])
-            x_min = int((cx - nw / 2) * img_w)
-            y_min = int((cy - nh / 2) * img_h)
-            x_max = int((cx + nw / 2) * img_w)
-            y_max = int((cy + nh / 2) * img_h)
+            center, size = row[0:2], row[2:4]
+            x_min, y_min = np.trunc((center - size / 2) * image_size).astype(np.int64).tolist()
+            x_max, y_max = np.trunc((center + size / 2) * image_size).astype(np.int64).tolist()
             points = [
                 [x_min, y_min],
                 [x_max, y_min],
@@ -360,26 +263,20 @@ class LabelConverter:
             self.custom_data["shapes"].append(shape)
             # Add key points info
             key_point_name = self.pose_classes[label]
-            key_points = line[5:]
-            interval = 3 if self.has_visible else 2
-            for j in range(0, len(key_points), interval):
-                x = float(key_points[j]) * img_w
-                y = float(key_points[j + 1]) * img_h
-                flag = int(key_points[j + 2])
-                if (x == 0 and y == 0) or flag == 0:
-                    continue
-                if interval == 3 and flag == 1:
-                    is_difficult = True
-                else:
-                    is_difficult = False
+            key_points = row[4:4 + (len(row) - 4) // interval * interval].reshape(-1, interval)
+            coords = key_points[:, :2] * image_size
+            # 0: Invisible, 1: Occluded, 2: Visible
+            visible = key_points[:, 2].astype(np.int64) if interval == 3 else np.full(len(key_points), 2)
+            keep = ~(((coords[:, 0] == 0) & (coords[:, 1] == 0)) | (visible == 0))
+            for j in np.flatnonzero(keep).tolist():
                 shape = {
-                    "label": key_point_name[j // interval],
+                    "label": key_point_name[j],
                     "shape_type": ShapeType.POINT.name,
                     "flags": {},
-                    "points": [[x, y]],
+                    "points": [coords[j].tolist()],
                     "group_id": i,
                     "description": None,
-                    "is_difficult": is_difficult,
+                    "is_difficult": bool(visible[j] == 1),
                     "attributes": {},
                 }
                 self.custom_data["shapes"].append(shape)
@@ -392,42 +289,27 @@ class LabelConverter:
 
     def yolo_to_custom(self, input_file, output_file, image_file, mode):
         self.reset()
-        with open(input_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
         img_w, img_h = self.get_image_size(image_file)
         image_size = np.array([img_w, img_h], np.float64)
-        for line in lines:
-            line = line.strip().split(" ")
-            class_index = int(line[0])
-            label = self.classes[class_index]
-            if mode == "hbb":
-                shape_type = ShapeType.RECTANGLE.name
-                cx = float(line[1])
-                cy = float(line[2])
-                nw = float(line[3])
-                nh = float(line[4])
-                x_min = int((cx - nw / 2) * img_w)
-                y_min = int((cy - nh / 2) * img_h)
-                x_max = int((cx + nw / 2) * img_w)
-                y_max = int((cy + nh / 2) * img_h)
-                points = [
-                    [x_min, y_min],
-                    [x_max, y_min],
-                    [x_max, y_max],
-                    [x_min, y_max],
-                ]
-            elif mode == "seg":
-                shape_type = ShapeType.POLYGON.name
-                points, masks = [], line[1:]
-                for x, y in zip(masks[0::2], masks[1::2]):
-                    point = [np.float64(x), np.float64(y)]
-                    point = np.array(point, np.float64) * image_size
-                    points.append(point.tolist())
-            else:
-                logger.error(f"Unknown mode: {mode}")
-                raise ValueError(f"Unknown mode: {mode}")
+        if mode == "hbb":
+            shape_type = ShapeType.RECTANGLE.name
+            table = parse_table(input_file, 5)
+            class_indexes = table[:, 0].astype(np.int64).tolist()
+            centers, sizes = table[:, 1:3], table[:, 3:5]
+            top_left = np.trunc((centers - sizes / 2) * image_size).astype(np.int64)
+            bottom_right = np.trunc((centers + sizes / 2) * image_size).astype(np.int64)
+            points_list = rectangle_to_points(top_left[:, 0], top_left[:, 1], bottom_right[:, 0], bottom_right[:, 1]).tolist()
+        elif mode == "seg":
+            shape_type = ShapeType.POLYGON.name
+            class_indexes, rows = parse_ragged(input_file)
+            class_indexes = class_indexes.tolist()
+            points_list = [(row[:len(row) // 2 * 2].reshape(-1, 2) * image_size).tolist() for row in rows]
+        else:
+            logger.error(f"Unknown mode: {mode}")
+            raise ValueError(f"Unknown mode: {mode}")
+        for class_index, points in zip(class_indexes, points_list):
             shape = {
-                "label": label,
+                "label": self.classes[class_index],
                 "shape_type": shape_type,
                 "flags": {},
                 "points": points,
@@ -501,104 +383,110 @@ class LabelConverter:
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(self.custom_data, f, indent=2, ensure_ascii=False)
 
-    def coco_to_custom(self, input_file, image_path, mode):
-        with open(input_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if not self.classes:
-            for cat in data["categories"]:
-                self.classes.append(cat["name"])
-
-        total_info, label_info = {}, {}
-
-        # map category_id to name
-        for dic_info in data["categories"]:
-            label_info[dic_info["id"]] = dic_info["name"]
-
-        # map image_id to info
-        for dic_info in data["images"]:
-            total_info[dic_info["id"]] = {
-                "imageWidth": dic_info["width"],
-                "imageHeight": dic_info["height"],
-                "imagePath": osp.basename(dic_info["file_name"]),
-                "shapes": [],
-            }
-
-        for dic_info in data["annotations"]:
-            difficult = bool(int(str(dic_info.get("ignore", "0"))))
-            label = label_info[dic_info["category_id"]]
-
-            if mode == "rectangle":
-                shape_type = "rectangle"
-                bbox = dic_info["bbox"]
-                x_min = bbox[0]
-                y_min = bbox[1]
-                width = bbox[2]
-                height = bbox[3]
-                x_max = x_min + width
-                y_max = y_min + height
-                points = [
-                    [x_min, y_min],
-                    [x_max, y_min],
-                    [x_max, y_max],
-                    [x_min, y_max],
-                ]
-            elif mode == "polygon":
-                shape_type = "polygon"
-                segmentation = dic_info["segmentation"][0]
-                if len(segmentation) < 6 or len(segmentation) % 2 != 0:
-                    continue
-                points = []
-                for i in range(0, len(segmentation), 2):
-                    points.append([segmentation[i], segmentation[i + 1]])
-            else:
-                logger.error(f"Unknown mode: {mode}")
-                raise ValueError(f"Unknown mode: {mode}")
-
-            shape = {
-                "label": label,
-                "shape_type": shape_type,
-                "flags": {},
-                "points": points,
-                "group_id": None,
-                "description": None,
-                "difficult": difficult,
-                "attributes": {},
-            }
-
-            total_info[dic_info["image_id"]]["shapes"].append(shape)
-
-        for dic_info in total_info.values():
-            self.reset()
-            self.custom_data["shapes"] = dic_info["shapes"]
-            self.custom_data["imagePath"] = dic_info["imagePath"]
-            self.custom_data["imageHeight"] = dic_info["imageHeight"]
-            self.custom_data["imageWidth"] = dic_info["imageWidth"]
+    def coco_to_custom(self, input_file, image_path, mode, workers=None, buckets=64):
+        """
+        Convert a COCO annotation file into one custom label file per image.
 
-            output_file = osp.join(image_path, osp.splitext(dic_info["imagePath"])[0] + ".json")
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(self.custom_data, f, indent=2, ensure_ascii=False)
+        The COCO file is parsed incrementally and annotations are spilled into `buckets` temporary files keyed by
+        image id, so only one bucket of annotations is held in memory while label files are written by a thread pool.
+        """
+        if mode not in ["rectangle", "polygon"]:
+            logger.error(f"Unknown mode: {mode}")
+            raise ValueError(f"Unknown mode: {mode}")
+
+        label_info, image_info = {}, {}
+        with tempfile.TemporaryDirectory() as spill_dir:
+            spill_files = [None] * buckets
+            for key, dic_info in CocoStreamReader(input_file):
+                if key == "categories":
+                    # map category_id to name
+                    label_info[dic_info["id"]] = dic_info["name"]
+                elif key == "images":
+                    # map image_id to (imageWidth, imageHeight, imagePath)
+                    image_info[dic_info["id"]] = (dic_info["width"], dic_info["height"], osp.basename(dic_info["file_name"]))
+                elif key == "annotations":
+                    difficult = bool(int(str(dic_info.get("ignore", "0"))))
+                    if mode == "rectangle":
+                        x_min, y_min, width, height = dic_info["bbox"][:4]
+                        x_max = x_min + width
+                        y_max = y_min + height
+                        points = [
+                            [x_min, y_min],
+                            [x_max, y_min],
+                            [x_max, y_max],
+                            [x_min, y_max],
+                        ]
+                    else:
+                        segmentation = dic_info["segmentation"][0] if dic_info.get("segmentation") else []
+                        if len(segmentation) < 6 or len(segmentation) % 2 != 0:
+                            continue
+                        points = [[segmentation[i], segmentation[i + 1]] for i in range(0, len(segmentation), 2)]
+                    bucket = hash(dic_info["image_id"]) % buckets
+                    if spill_files[bucket] is None:
+                        spill_files[bucket] = open(osp.join(spill_dir, f"{bucket}.jsonl"), "w+", encoding="utf-8")
+                    spill_files[bucket].write(json.dumps([dic_info["image_id"], dic_info["category_id"], difficult, points]) + "\n")
+
+            if not self.classes:
+                self.classes.extend(label_info.values())
+
+            bucket_images = [[] for _ in range(buckets)]
+            for image_id in image_info:
+                bucket_images[hash(image_id) % buckets].append(image_id)
+
+            with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as executor:
+                for bucket, image_ids in enumerate(bucket_images):
+                    shapes_info = {}
+                    spill_file = spill_files[bucket]
+                    if spill_file is not None:
+                        spill_file.seek(0)
+                        for line in spill_file:
+                            image_id, category_id, difficult, points = json.loads(line)
+                            shape = {
+                                "label": label_info[category_id],
+                                "shape_type": mode,
+                                "flags": {},
+                                "points": points,
+                                "group_id": None,
+                                "description": None,
+                                "difficult": difficult,
+                                "attributes": {},
+                            }
+                            shapes_info.setdefault(image_id, []).append(shape)
+                        spill_file.close()
+                    for image_id in shapes_info.keys() - image_info.keys():
+                        logger.warning(f"Skip annotations of unknown image id: {image_id}")
+
+                    futures = []
+                    for image_id in image_ids:
+                        image_width, image_height, image_file = image_info[image_id]
+                        custom_data = self.get_custom_data()
+                        custom_data["shapes"] = shapes_info.get(image_id, [])
+                        custom_data["imagePath"] = image_file
+                        custom_data["imageHeight"] = image_height
+                        custom_data["imageWidth"] = image_width
+                        output_file = osp.join(image_path, osp.splitext(image_file)[0] + ".json")
+                        futures.append(executor.submit(self.write_custom_data, custom_data, output_file))
+                    # Wait for this bucket before loading the next one to keep memory bounded
+                    for future in futures:
+                        future.result()
 
     def dota_to_custom(self, input_file, output_file, image_file):
         self.reset()
 
-        with open(input_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
+        # Skip meta lines such as "imagesource:GoogleEarth" and "gsd:0.146343590398"
+        rows = [row for row in read_rows(input_file) if len(row) >= 10]
         image_width, image_height = self.get_image_size(image_file)
 
-        for line in lines:
-            line = line.strip().split(" ")
-            x0, y0, x1, y1, x2, y2, x3, y3 = [float(i) for i in line[:8]]
-            difficult = line[-1]
-            points = [[x0, y0], [x1, y1], [x2, y2], [x3, y3]]
+        points_list = np.array([row[:8] for row in rows], dtype=np.float64).reshape(-1, 4, 2)
+        directions = self.calculate_rotation_thetas(points_list).tolist()
+        for row, points, direction in zip(rows, points_list.tolist(), directions):
             shape = {
-                "label": line[8],
+                "label": row[8],
                 "description": None,
                 "points": points,
                 "group_id": None,
-                "is_difficult": bool(int(difficult)),
-                "direction": self.calculate_rotation_theta(points),
+                "is_difficult": bool(int(row[-1])),
+                "direction": direction,
                 "shape_type": ShapeType.ROTATION.name,
                 "flags": {},
             }
@@ -611,10 +499,10 @@ class LabelConverter:
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(self.custom_data, f, indent=2, ensure_ascii=False)
 
-    def mask_to_custom(self, input_file, output_file, image_file, mapping_table):
+    def mask_to_custom(self, input_file, output_file, image_file, mapping_table, workers=None, tile_size=None):
         self.reset()
 
-        results = self.get_contours_and_labels(input_file, mapping_table)
+        results = self.get_contours_and_labels(input_file, mapping_table, workers=workers, tile_size=tile_size)
         for result in results:
             shape = {
                 "label": result["label"],
@@ -634,70 +522,108 @@ class LabelConverter:
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(self.custom_data, f, indent=2, ensure_ascii=False)
 
-    def mot_to_custom(self, input_file, output_path, image_path):
-        with open(input_file, "r", encoding="utf-8") as f:
-            mot_data = [line.strip().split(',') for line in f]
-
-        data_to_shape = {}
-        for data in mot_data:
-            frame_id = int(data[0])
-            group_id = int(data[1])
-            x_min = int(data[2])
-            y_min = int(data[3])
-            x_max = int(data[4]) + x_min
-            y_max = int(data[5]) + y_min
-            label = self.classes[int(data[7])]
-            info = [label, x_min, y_min, x_max, y_max, group_id]
-            if frame_id not in data_to_shape:
-                data_to_shape[frame_id] = [info]
-            else:
-                data_to_shape[frame_id].append(info)
-
-        file_list = os.listdir(image_path)
-        for file_name in file_list:
-            if file_name.endswith(".json"):
-                continue
+    @staticmethod
+    def get_label_file(label_dir, image_file):
+        """
+        Label file of `image_file` in `label_dir`, JSON or binary, the JSON path if there is none.
+        """
+        label_file = osp.join(label_dir, osp.splitext(osp.basename(image_file))[0] + ".json")
+        return find_label_file(label_file) or label_file
 
-            self.reset()
-            frame_id = int(osp.splitext(file_name.rsplit("-")[-1])[0])
-            data = data_to_shape[frame_id]
-            image_file = osp.join(image_path, file_name)
-            image_width, image_height = self.get_image_size(image_file)
+    @staticmethod
+    def get_mot_frame_index(file_name):
+        """
+        Frame index of a MOT frame file named like `<name>-<index>.<ext>` or `<index>.<ext>`, None if not numbered.
+        """
+        stem = osp.splitext(file_name.rsplit("-", 1)[-1])[0]
+        return int(stem) if stem.isdigit() else None
 
+    @staticmethod
+    def read_mot_seqinfo(*search_dirs):
+        """
+        Read the (imWidth, imHeight) of a MOT sequence from the first `seqinfo.ini` found, None if there is none.
+        """
+        for search_dir in search_dirs:
+            seqinfo_file = osp.join(search_dir, "seqinfo.ini")
+            if not osp.isfile(seqinfo_file):
+                continue
+            config = configparser.ConfigParser()
+            config.read(seqinfo_file, encoding="utf-8")
+            try:
+                return int(config["Sequence"]["imWidth"]), int(config["Sequence"]["imHeight"])
+            except (KeyError, ValueError):
+                logger.warning(f"No valid image size in {seqinfo_file}")
+        return None
+
+    def mot_to_custom(self, input_file, output_path, image_path, workers=None):
+        # frame, id, bb_left, bb_top, bb_width, bb_height, conf, class, ...
+        mot_data = parse_table(input_file, 8, delimiter=",").astype(np.int64)
+        mot_data[:, 4:6] += mot_data[:, 2:4]
+        # Group rows by frame, keeping their order within each frame
+        mot_data = mot_data[np.argsort(mot_data[:, 0], kind="stable")]
+        frame_ids, starts, counts = np.unique(mot_data[:, 0], return_index=True, return_counts=True)
+        frame_slices = {frame_id: (start, start + count) for frame_id, start, count in zip(frame_ids.tolist(), starts.tolist(), counts.tolist())}
+        labels = np.array(self.classes, dtype=object)
+
+        # Numbered images of the sequence, other files such as seqinfo.ini are not frames
+        image_extensions = tuple(get_image_extensions())
+        file_list = []
+        for file_name in sorted(os.listdir(image_path)):
+            if not file_name.lower().endswith(image_extensions) or not osp.isfile(osp.join(image_path, file_name)):
+                continue
+            frame_id = self.get_mot_frame_index(file_name)
+            if frame_id is not None:
+                file_list.append((file_name, frame_id))
+        if not file_list:
+            return
+        # A MOT sequence has a single resolution, given by seqinfo.ini next to gt/ and img1/
+        image_size = self.read_mot_seqinfo(
+            osp.dirname(osp.abspath(input_file)), osp.dirname(osp.dirname(osp.abspath(input_file))), osp.dirname(osp.abspath(image_path))
+        )
+        if image_size is None:
+            # Otherwise by the first frame that can be read
+            for file_name, _ in file_list:
+                try:
+                    image_size = self.get_image_size(osp.join(image_path, file_name))
+                    break
+                except OSError:
+                    continue
+        if image_size is None:
+            raise ValueError(f"Can not get the image size of the frames in {image_path}")
+        image_width, image_height = image_size
+
+        def write_frame(frame):
+            file_name, frame_id = frame
+            start, end = frame_slices.get(frame_id, (0, 0))
+            rows = mot_data[start:end]
             shapes = []
-            for d in data:
-                label, x_min, y_min, x_max, y_max, group_id = d
-                points = [
-                    [x_min, y_min],
-                    [x_max, y_min],
-                    [x_max, y_max],
-                    [x_min, y_max],
-                ]
-                shape = {
+            for label, (_, group_id, x_min, y_min, x_max, y_max, _, _) in zip(labels[rows[:, 7]].tolist(), rows.tolist()):
+                shapes.append({
                     "label": label,
                     "description": None,
-                    "points": points,
+                    "points": [
+                        [x_min, y_min],
+                        [x_max, y_min],
+                        [x_max, y_max],
+                        [x_min, y_max],
+                    ],
                     "group_id": group_id,
                     "is_difficult": False,
                     "direction": 0,
                     "shape_type": "rectangle",
                     "flags": {},
-                }
-                shapes.append(shape)
-
-            image_path = file_name
-            if output_path != image_path:
-                image_path = osp.join(output_path, file_name)
-            self.custom_data["imagePath"] = image_path
-            self.custom_data["imageWidth"] = image_width
-            self.custom_data["imageHeight"] = image_height
-            self.custom_data["shapes"] = shapes
-
-            output_file = osp.join(
-                output_path, osp.splitext(file_name)[0] + ".json"
-            )
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(self.custom_data, f, indent=2, ensure_ascii=False)
+                })
+            custom_data = self.get_custom_data()
+            # Relative to the label file, as LabelFile resolves it
+            custom_data["imagePath"] = osp.relpath(osp.join(image_path, file_name), output_path)
+            custom_data["imageWidth"] = image_width
+            custom_data["imageHeight"] = image_height
+            custom_data["shapes"] = shapes
+            self.write_custom_data(custom_data, osp.join(output_path, osp.splitext(file_name)[0] + ".json"))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(write_frame, file_list):
+                pass
 
     def odvg_to_custom(self, input_file, output_path):
         # Load od.json or od.jsonl
@@ -777,8 +703,7 @@ class LabelConverter:
     def custom_to_yolo(self, input_file, output_file, mode, skip_empty_files=False):
         is_empty_file = True
         if osp.exists(input_file):
-            with open(input_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = read_label_data(input_file)
         else:
             if not skip_empty_files:
                 pathlib.Path(output_file).touch()
@@ -786,53 +711,29 @@ class LabelConverter:
 
         image_width = data["imageWidth"]
         image_height = data["imageHeight"]
-        image_size = np.array([[image_width, image_height]])
+        image_size = np.array([image_width, image_height], np.float64)
         if mode == "pose":
             pose_data = {}
+        # Class indexes and points of the shapes to export, formatted in bulk after collecting
+        class_indexes, points_list = [], []
         with open(output_file, "w", encoding="utf-8") as f:
             for shape in data["shapes"]:
                 shape_type = shape["shape_type"]
                 if mode == "hbb" and shape_type == "rectangle":
-                    label = shape["label"]
-                    points = shape["points"]
-
-                    class_index = self.classes.index(label)
-
-                    x_center = (points[0][0] + points[2][0]) / (2 * image_width)
-                    y_center = (points[0][1] + points[2][1]) / (2 * image_height)
-                    width = abs(points[2][0] - points[0][0]) / image_width
-                    height = abs(points[2][1] - points[0][1]) / image_height
-
-                    f.write(f"{class_index} {x_center} {y_center} {width} {height}\n")
-                    is_empty_file = False
+                    class_indexes.append(self.classes.index(shape["label"]))
+                    points_list.append(shape["points"][:4])
                 elif mode == "seg" and shape_type == ShapeType.POLYGON.name:
-                    label = shape["label"]
-                    points = np.array(shape["points"])
-                    if len(points) < 3:
+                    if len(shape["points"]) < 3:
                         continue
-                    class_index = self.classes.index(label)
-                    norm_points = points / image_size
-                    f.write(f"{class_index} " + " ".join([" ".join([str(cell[0]), str(cell[1])]) for cell in norm_points.tolist()]) + "\n")
-                    is_empty_file = False
+                    class_indexes.append(self.classes.index(shape["label"]))
+                    points_list.append(shape["points"])
                 elif mode == "obb" and shape_type == ShapeType.ROTATION.name:
-                    label = shape["label"]
-                    points = shape["points"]
-                    if not any(0 <= p[0] < image_width and 0 <= p[1] < image_height for p in points):
-                        logger.warning(f"{data['imagePath']}: Skip out of bounds coordinates of {points}!")
-                        continue
-                    points = list(chain.from_iterable(points))
-                    normalized_coords = [
-                        points[i] / image_width
-                        if i % 2 == 0
-                        else points[i] / image_height
-                        for i in range(8)
-                    ]
-                    x0, y0, x1, y1, x2, y2, x3, y3 = normalized_coords
-                    class_index = self.classes.index(label)
-                    f.write(f"{class_index} {x0} {y0} {x1} {y1} {x2} {y2} {x3} {y3}\n")
-                    is_empty_file = False
+                    class_indexes.append(self.classes.index(shape["label"]))
+                    points_list.append(shape["points"][:4])
                 elif mode == "pose":
-                    if shape_type not in ["rectangle", "point"]:
+                    # Label files of the app spell shape types in upper case, other tools in lower case
+                    shape_type = shape_type.upper()
+                    if shape_type not in [ShapeType.RECTANGLE.name, ShapeType.POINT.name]:
                         continue
                     label = shape["label"]
                     points = shape["points"]
@@ -851,6 +752,24 @@ class LabelConverter:
                         visible = 1 if difficult is True else 2
                         pose_data[group_id]["keypoints"][label] = [x, y, visible]
                     is_empty_file = False
+            if mode == "hbb" and points_list:
+                points = np.array(points_list, np.float64)
+                centers = (points[:, 0] + points[:, 2]) / (2 * image_size)
+                sizes = np.abs(points[:, 2] - points[:, 0]) / image_size
+                f.write(format_rows(np.hstack([centers, sizes]), class_indexes))
+                is_empty_file = False
+            elif mode == "seg" and points_list:
+                f.write(format_rows([(np.array(points, np.float64) / image_size).ravel() for points in points_list], class_indexes))
+                is_empty_file = False
+            elif mode == "obb" and points_list:
+                points = np.array(points_list, np.float64)
+                in_bounds = ((points >= 0) & (points < image_size)).all(axis=2).any(axis=1)
+                for i in np.flatnonzero(~in_bounds).tolist():
+                    logger.warning(f"{data['imagePath']}: Skip out of bounds coordinates of {points_list[i]}!")
+                if in_bounds.any():
+                    normalized_coords = (points[in_bounds] / image_size).reshape(-1, 8)
+                    f.write(format_rows(normalized_coords, np.array(class_indexes)[in_bounds]))
+                    is_empty_file = False
             if mode == "pose":
                 classes = list(self.pose_classes.keys())
                 max_key_points = max([len(kpts) for kpts in self.pose_classes.values()])
@@ -896,11 +815,11 @@ class LabelConverter:
 
     def custom_to_voc(self, image_file, input_file, output_dir, mode, skip_empty_files=False):
         is_emtpy_file = True
-        image = cv2.imread(image_file)
-        image_height, image_width, image_depth = image.shape
+        # Depth stays the one of the 3 channels images cv2.imread decoded, whatever the header says
+        image_width, image_height, _ = image_meta_cache.get(image_file)
+        image_depth = 3
         if osp.exists(input_file):
-            with open(input_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = read_label_data(input_file)
             shapes = data["shapes"]
         else:
             if not skip_empty_files:
@@ -910,7 +829,7 @@ class LabelConverter:
 
         image_path = osp.basename(image_file)
         root = Element("annotation")
-        SubElement(root, "folder").text = osp.dirname(output_dir)
+        ET.SubElement(root, "folder").text = osp.dirname(output_dir)
         ET.SubElement(root, "filename").text = osp.basename(image_path)
         size = ET.SubElement(root, "size")
         ET.SubElement(size, "width").text = str(image_width)
@@ -962,175 +881,204 @@ class LabelConverter:
 
         return is_emtpy_file
 
-    def custom_to_coco(self, input_path, output_path, mode):
-        coco_data = self.get_coco_data()
-
+    def custom_to_coco(self, input_path, output_path, mode, incremental=False):
+        """
+        Args:
+            incremental: only read label files changed since the last export into `output_path` and patch their
+                records into the existing COCO file, see ExportManifest
+        """
+        coco_header = self.get_coco_data()
         for i, class_name in enumerate(self.classes):
-            coco_data["categories"].append(
+            coco_header["categories"].append(
                 {"id": i + 1, "name": class_name, "supercategory": ""}
             )
 
         image_id = 0
         annotation_id = 0
 
-        label_file_list = os.listdir(input_path)
-        for file_name in label_file_list:
-            if not file_name.endswith(".json"):
-                continue
-            image_id += 1
-            input_file = osp.join(input_path, file_name)
-            with open(input_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            coco_data["images"].append(
-                {
-                    "id": image_id,
-                    "file_name": data["imagePath"],
-                    "width": data["imageWidth"],
-                    "height": data["imageHeight"],
-                    "license": 0,
-                    "flickr_url": "",
-                    "coco_url": "",
-                    "date_captured": "",
-                }
-            )
-
-            for shape in data["shapes"]:
-                annotation_id += 1
-                label = shape["label"]
-                points = shape["points"]
-                difficult = shape.get("difficult", False)
-                class_id = self.classes.index(label)
-                bbox, segmentation, area = [], [], 0
-                shape_type = shape["shape_type"]
-                if shape_type == "rectangle" and mode in ["rectangle", "polygon"]:
-                    x_min = min(points[0][0], points[2][0])
-                    y_min = min(points[0][1], points[2][1])
-                    x_max = max(points[0][0], points[2][0])
-                    y_max = max(points[0][1], points[2][1])
-                    width = x_max - x_min
-                    height = y_max - y_min
-                    bbox = [x_min, y_min, width, height]
-                    area = width * height
-                elif shape_type == "polygon" and mode == "polygon":
-                    for point in points:
-                        segmentation += point
-                    bbox = self.get_min_enclosing_bbox(segmentation)
-                    area = self.calculate_polygon_area(segmentation)
-                    segmentation = [segmentation]
-
-                annotation = {
-                    "id": annotation_id,
-                    "image_id": image_id,
-                    "category_id": class_id + 1,
-                    "bbox": bbox,
-                    "area": area,
-                    "iscrowd": 0,
-                    "ignore": int(difficult),
-                    "segmentation": segmentation,
-                }
-
-                coco_data["annotations"].append(annotation)
-
         output_file = osp.join(output_path, "instances_default.json")
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(coco_data, f, indent=4, ensure_ascii=False)
+        label_files = list_label_files(input_path)
+        manifest, unchanged_files, kept_image_ids = None, set(), set()
+        if incremental:
+            manifest = ExportManifest(output_path, "coco", {"mode": mode, "classes": self.classes})
+            for label_file in manifest.stale_sources(label_files):
+                manifest.remove(label_file, delete_outputs=False)
+            unchanged_files = {label_file for label_file in label_files if manifest.is_unchanged(label_file)}
+            kept_image_ids = {manifest.get(label_file)["image_id"] for label_file in unchanged_files}
+        else:
+            ExportManifest.discard(output_path, "coco")
+
+        # Records of unchanged label files are copied from the previous export, which is replaced at the end
+        write_file = output_file + ".tmp" if kept_image_ids else output_file
+        with CocoStreamWriter(write_file, coco_header) as writer:
+            if kept_image_ids:
+                for key, item in CocoStreamReader(output_file):
+                    if key == "images" and item["id"] in kept_image_ids:
+                        writer.add_image(item)
+                        image_id = max(image_id, item["id"])
+                    elif key == "annotations" and item["image_id"] in kept_image_ids:
+                        writer.add_annotation(item)
+                        annotation_id = max(annotation_id, item["id"])
+
+            for input_file in label_files:
+                if input_file in unchanged_files:
+                    continue
+                image_id += 1
+                data = read_label_data(input_file)
+                writer.add_image(
+                    {
+                        "id": image_id,
+                        "file_name": data["imagePath"],
+                        "width": data["imageWidth"],
+                        "height": data["imageHeight"],
+                        "license": 0,
+                        "flickr_url": "",
+                        "coco_url": "",
+                        "date_captured": "",
+                    }
+                )
+
+                for shape in data["shapes"]:
+                    annotation_id += 1
+                    writer.add_annotation(self.get_coco_annotation(shape, annotation_id, image_id, mode))
+                if manifest is not None:
+                    manifest.record(input_file, [output_file], image_id=image_id)
+
+        if write_file != output_file:
+            os.replace(write_file, output_file)
+        if manifest is not None:
+            manifest.save()
+
+    def get_coco_annotation(self, shape, annotation_id, image_id, mode) -> dict:
+        label = shape["label"]
+        points = shape["points"]
+        difficult = shape.get("difficult", False)
+        class_id = self.classes.index(label)
+        bbox, segmentation, area = [], [], 0
+        shape_type = shape["shape_type"]
+        if shape_type == "rectangle" and mode in ["rectangle", "polygon"]:
+            x_min = min(points[0][0], points[2][0])
+            y_min = min(points[0][1], points[2][1])
+            x_max = max(points[0][0], points[2][0])
+            y_max = max(points[0][1], points[2][1])
+            width = x_max - x_min
+            height = y_max - y_min
+            bbox = [x_min, y_min, width, height]
+            area = width * height
+        elif shape_type == "polygon" and mode == "polygon":
+            for point in points:
+                segmentation += point
+            bbox = self.get_min_enclosing_bbox(segmentation)
+            area = self.calculate_polygon_area(segmentation)
+            segmentation = [segmentation]
+
+        return {
+            "id": annotation_id,
+            "image_id": image_id,
+            "category_id": class_id + 1,
+            "bbox": bbox,
+            "area": area,
+            "iscrowd": 0,
+            "ignore": int(difficult),
+            "segmentation": segmentation,
+        }
 
     def custom_to_dota(self, input_file, output_file):
-        with open(input_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_label_data(input_file)
         w, h = data["imageWidth"], data["imageHeight"]
+        shapes = [
+            shape for shape in data["shapes"]
+            if shape["shape_type"] == "rotation" and len(shape["points"]) == 4
+            and all(len(point) >= 2 for point in shape["points"])
+        ]
+        # Only x and y of each point are written, so extra coordinates do not make the array ragged
+        coords = [[value for point in shape["points"] for value in point[:2]] for shape in shapes]
+        points = np.array(coords, np.float64).reshape(-1, 4, 2)
+        in_bounds = ((points >= 0) & (points < np.array([w, h], np.float64))).all(axis=2).any(axis=1)
+        for i in np.flatnonzero(~in_bounds).tolist():
+            print(f"{data['imagePath']}: Skip out of bounds coordinates of {shapes[i]['points']}!")
         with open(output_file, "w", encoding="utf-8") as f:
-            for shape in data["shapes"]:
-                points = shape["points"]
-                shape_type = shape["shape_type"]
-                if (shape_type != "rotation" or len(points) != 4):
-                    continue
-                if not any(0 <= p[0] < w and 0 <= p[1] < h for p in points):
-                    print(f"{data['imagePath']}: Skip out of bounds coordinates of {points}!")
-                    continue
-                label = shape["label"]
-                difficult = shape.get("difficult", False)
-                x0 = points[0][0]
-                y0 = points[0][1]
-                x1 = points[1][0]
-                y1 = points[1][1]
-                x2 = points[2][0]
-                y2 = points[2][1]
-                x3 = points[3][0]
-                y3 = points[3][1]
-                f.write(
-                    f"{x0} {y0} {x1} {y1} {x2} {y2} {x3} {y3} {label} {int(difficult)}\n"
-                )
+            # Values are written as they are in the label file, integers without a decimal part
+            f.writelines(
+                f"{' '.join(map(str, row))} {shape['label']} {int(shape.get('difficult', False))}\n"
+                for shape, row, keep in zip(shapes, coords, in_bounds.tolist()) if keep
+            )
+
+    def custom_to_mask(self, input_file, output_file, mapping_table, tile_size=None):
+        """
+        Export polygons as a segmentation mask.
 
-    def custom_to_mask(self, input_file, output_file, mapping_table):
-        with open(input_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        Args:
+            mapping_table: {"type": "grayscale" | "rgb" | "palette", "colors": {label: value or [r, g, b]}}.
+                "palette" writes a P mode PNG whose pixels are class indexes in the order of `colors`.
+            tile_size: rasterize by tiles of this size, for very large (e.g. remote sensing) images
+        """
+        data = read_label_data(input_file)
 
         image_width = data["imageWidth"]
         image_height = data["imageHeight"]
         image_shape = (image_height, image_width)
 
-        polygons = []
+        output_format = mapping_table["type"]
+        if output_format not in ["grayscale", "rgb", "palette"]:
+            raise ValueError("Invalid output format specified")
+        mapping_color = mapping_table["colors"]
+        # Class index of each label for rgb and palette masks, 0 is the background
+        label_index = {label: i + 1 for i, label in enumerate(mapping_color)}
+
+        # Shapes are drawn in file order, which is their z-order on canvas
+        polygons, values = [], []
         for shape in data["shapes"]:
             shape_type = shape["shape_type"]
             if shape_type != "polygon":
                 continue
-            points = shape["points"]
-            polygon = []
-            for point in points:
-                x, y = point
-                polygon.append((int(x), int(y)))
-            polygons.append(
-                {
-                    "label": shape["label"],
-                    "polygon": polygon,
-                }
-            )
+            label = shape["label"]
+            if output_format == "grayscale":
+                value = mapping_color.get(label, 1)
+            elif label in label_index:
+                value = label_index[label]
+            else:
+                continue
+            polygons.append(np.array(shape["points"], dtype=np.float64).astype(np.int32))
+            values.append(value)
+        if not polygons:
+            return
 
-        output_format = mapping_table["type"]
-        if output_format not in ["grayscale", "rgb"]:
-            raise ValueError("Invalid output format specified")
-        mapping_color = mapping_table["colors"]
-        if output_format == "grayscale" and polygons:
-            # Initialize binary_mask
-            binary_mask = np.zeros(image_shape, dtype=np.uint8)
-            for item in polygons:
-                label, polygon = item["label"], item["polygon"]
-                mask = np.zeros(image_shape, dtype=np.uint8)
-                cv2.fillPoly(mask, [np.array(polygon, dtype=np.int32)], 1)
-                if label in mapping_color:
-                    mask_mapped = mask * mapping_color[label]
-                else:
-                    mask_mapped = mask
-                binary_mask += mask_mapped
+        if output_format == "grayscale":
+            if tile_size is not None:
+                # Encoded band by band, the whole mask is never held in memory
+                write_png_bands(output_file, rasterize_bands(polygons, values, image_shape, tile_size), image_shape)
+                return
+            binary_mask = rasterize_polygons(polygons, values, image_shape)
             cv2.imencode(".png", binary_mask)[1].tofile(output_file)
-        elif output_format == "rgb" and polygons:
-            # Initialize rgb_mask
-            color_mask = np.zeros(
-                (image_height, image_width, 3), dtype=np.uint8
-            )
-            for item in polygons:
-                label, polygon = item["label"], item["polygon"]
-                # Create a mask for each polygon
-                mask = np.zeros(image_shape[:2], dtype=np.uint8)
-                cv2.fillPoly(mask, [np.array(polygon, dtype=np.int32)], 1)
-                # Initialize mask_mapped with a default value
-                mask_mapped = mask
-                # Map the mask values using the provided mapping table
-                if label in mapping_color:
-                    color = mapping_color[label]
-                    mask_mapped = np.zeros_like(color_mask)
-                    cv2.fillPoly(
-                        mask_mapped, [np.array(polygon, dtype=np.int32)], color
-                    )
-                    color_mask = cv2.addWeighted(
-                        color_mask, 1, mask_mapped, 1, 0
-                    )
-            cv2.imencode(".png", cv2.cvtColor(color_mask, cv2.COLOR_BGR2RGB))[
-                1
-            ].tofile(output_file)
-
-    def custom_to_mot(self, input_path, save_path):
+        elif output_format == "rgb":
+            lut = np.zeros((len(label_index) + 1, 3), dtype=np.uint8)
+            for label, i in label_index.items():
+                lut[i] = mapping_color[label]
+            if tile_size is not None:
+                write_png_bands(output_file, rasterize_bands(polygons, values, image_shape, tile_size, lut), image_shape)
+                return
+            # OpenCV encodes BGR pixels
+            color_mask = rasterize_polygons(polygons, values, image_shape, lut=lut[:, ::-1])
+            cv2.imencode(".png", color_mask)[1].tofile(output_file)
+        else:
+            palette = [0, 0, 0]
+            for label in label_index:
+                palette.extend(mapping_color[label])
+            if tile_size is not None:
+                write_png_bands(output_file, rasterize_bands(polygons, values, image_shape, tile_size), image_shape, palette)
+                return
+            index_mask = rasterize_polygons(polygons, values, image_shape)
+            mask = Image.fromarray(index_mask, mode="P")
+            mask.putpalette(palette)
+            mask.save(output_file, format="PNG")
+
+    def custom_to_mot(self, input_path, save_path, incremental=False):
+        """
+        Args:
+            incremental: only read label files changed since the last export into `save_path` and patch their
+                rows into the existing det.txt and gt.txt, see ExportManifest
+        """
         mot_structure = {
             "sequence": dict(
                 name="MOT",
@@ -1141,56 +1089,98 @@ class LabelConverter:
                 imHeight=None,
                 imExt=None,
             ),
-            "det": [],
-            "gt": [],
         }
         seg_len, im_widht, im_height, im_ext = 0, None, None, None
 
-        label_file_list = os.listdir(input_path)
-        label_file_list.sort(
-            key=lambda x: int(osp.splitext(x.rsplit("-", 1)[-1])[0])
-            if osp.splitext(x.rsplit("-", 1)[-1])[0].isdigit()
-            else 0
-        )
+        # Sort frames by their index, computed once per file
+        label_files = []
+        for label_file_name in map(osp.basename, list_label_files(input_path)):
+            frame_index = self.get_mot_frame_index(label_file_name)
+            if frame_index is None:
+                # Checked before any output is opened
+                raise ValueError(f"Can not get the frame index of {label_file_name}")
+            label_files.append((frame_index, label_file_name))
+        label_files.sort(key=lambda item: item[0])
+
+        det_txt, gt_txt = osp.join(save_path, "det.txt"), osp.join(save_path, "gt.txt")
+        manifest, unchanged_files, previous_rows = None, set(), {}
+        if incremental:
+            manifest = ExportManifest(save_path, "mot", {"classes": self.classes})
+            current_files = [osp.join(input_path, label_file_name) for _, label_file_name in label_files]
+            for label_file in manifest.stale_sources(current_files):
+                manifest.remove(label_file, delete_outputs=False)
+            unchanged_files = {label_file for label_file in current_files if manifest.is_unchanged(label_file)}
+            kept_frames = {manifest.get(label_file)["frame_id"] for label_file in unchanged_files}
+            # Rows of unchanged frames are copied from the previous det.txt and gt.txt
+            for name, txt_file in (("det", det_txt), ("gt", gt_txt)) if kept_frames else ():
+                with open(txt_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        frame_id = int(line.split(",", 1)[0])
+                        if frame_id in kept_frames:
+                            previous_rows.setdefault((name, frame_id), []).append(line)
+        else:
+            ExportManifest.discard(save_path, "mot")
 
-        for label_file_name in label_file_list:
-            if not label_file_name.endswith("json"):
-                continue
-            label_file = os.path.join(input_path, label_file_name)
-            with open(label_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            seg_len += 1
-            if im_widht is None:
-                im_widht = data["imageWidth"]
-            if im_height is None:
-                im_height = data["imageHeight"]
-            if im_ext is None:
-                im_ext = osp.splitext(osp.basename(data["imagePath"]))[-1]
-            frame_id = int(osp.splitext(label_file_name.split("-")[-1])[0])
-            for shape in data["shapes"]:
-                if shape["shape_type"] != "rectangle":
-                    continue
-                diccicult = shape.get("diccicult", False)
-                class_id = int(self.classes.index(shape["label"]))
-                track_id = int(shape["group_id"]) if shape["group_id"] else -1
-                points = shape["points"]
-                if len(points) == 2:
-                    logger.warning(
-                        "UserWarning: Diagonal vertex mode is deprecated in X-AnyLabeling release v2.2.0 or later.\n"
-                        "Please update your code to accommodate the new four-point mode."
-                    )
-                    points = rectangle_from_diagonal(points)
-                x_min = int(points[0][0])
-                y_min = int(points[0][1])
-                x_max = int(points[2][0])
-                y_max = int(points[2][1])
-                boxw = x_max - x_min
-                boxh = y_max - y_min
-                det = [frame_id, -1, x_min, y_min, boxw, boxh, 1, -1, -1, -1]
-                gt = [frame_id, track_id, x_min, y_min, boxw, boxh, int(not diccicult), class_id, 1]
-                mot_structure["det"].append(det)
-                mot_structure["gt"].append(gt)
+        # det.txt and gt.txt are written while reading the label files
+        try:
+            with open(det_txt + ".tmp", "w", encoding="utf-8") as det_file, \
+                    open(gt_txt + ".tmp", "w", encoding="utf-8") as gt_file:
+                for frame_id, label_file_name in label_files:
+                    label_file = os.path.join(input_path, label_file_name)
+                    seg_len += 1
+                    if label_file in unchanged_files:
+                        entry = manifest.get(label_file)
+                        det_file.writelines(previous_rows.get(("det", frame_id), []))
+                        gt_file.writelines(previous_rows.get(("gt", frame_id), []))
+                        if im_widht is None:
+                            im_widht, im_height, im_ext = entry["image_width"], entry["image_height"], entry["image_ext"]
+                        continue
+                    data = read_label_data(label_file)
+
+                    if im_widht is None:
+                        im_widht = data["imageWidth"]
+                    if im_height is None:
+                        im_height = data["imageHeight"]
+                    if im_ext is None:
+                        im_ext = osp.splitext(osp.basename(data["imagePath"]))[-1]
+                    det, gt = [], []
+                    for shape in data["shapes"]:
+                        if shape["shape_type"] != "rectangle":
+                            continue
+                        diccicult = shape.get("diccicult", False)
+                        class_id = int(self.classes.index(shape["label"]))
+                        track_id = int(shape["group_id"]) if shape["group_id"] else -1
+                        points = shape["points"]
+                        if len(points) == 2:
+                            logger.warning(
+                                "UserWarning: Diagonal vertex mode is deprecated in X-AnyLabeling release v2.2.0 or later.\n"
+                                "Please update your code to accommodate the new four-point mode."
+                            )
+                            points = rectangle_from_diagonal(points)
+                        x_min = int(points[0][0])
+                        y_min = int(points[0][1])
+                        x_max = int(points[2][0])
+                        y_max = int(points[2][1])
+                        boxw = x_max - x_min
+                        boxh = y_max - y_min
+                        det.append([frame_id, -1, x_min, y_min, boxw, boxh, 1, -1, -1, -1])
+                        gt.append([frame_id, track_id, x_min, y_min, boxw, boxh, int(not diccicult), class_id, 1])
+                    if det:
+                        det_file.write(format_rows(det, delimiter=","))
+                        gt_file.write(format_rows(gt, delimiter=","))
+                    if manifest is not None:
+                        manifest.record(
+                            label_file, [det_txt, gt_txt], frame_id=frame_id, image_width=data["imageWidth"],
+                            image_height=data["imageHeight"], image_ext=osp.splitext(osp.basename(data["imagePath"]))[-1],
+                        )
+        except BaseException:
+            # Outputs of the previous export are kept as they were
+            for tmp_file in (det_txt + ".tmp", gt_txt + ".tmp"):
+                if osp.exists(tmp_file):
+                    os.remove(tmp_file)
+            raise
+        os.replace(det_txt + ".tmp", det_txt)
+        os.replace(gt_txt + ".tmp", gt_txt)
 
         # Save seqinfo.ini
         mot_structure["sequence"]["seqLength"] = seg_len
@@ -1203,16 +1193,15 @@ class LabelConverter:
             config['Sequence'][key] = str(value)
         with open(osp.join(save_path, "seqinfo.ini"), 'w') as f:
             config.write(f)
-        # Save det.txt
-        with open(osp.join(save_path, "det.txt"), "w", encoding="utf-8") as f:
-            for row in mot_structure["det"]:
-                f.write(",".join(map(str, row)) + "\n")
-        # Save gt.txt
-        with open(osp.join(save_path, "gt.txt"), "w", encoding="utf-8") as f:
-            for row in mot_structure["gt"]:
-                f.write(",".join(map(str, row)) + "\n")
-
-    def custom_to_odvg(self, image_list, label_path, save_path):
+        if manifest is not None:
+            manifest.save()
+
+    def custom_to_odvg(self, image_list, label_path, save_path, incremental=False):
+        """
+        Args:
+            incremental: only read label files changed since the last export into `save_path` and patch their
+                records into the existing od.json, see ExportManifest
+        """
         # Save label_map.json
         label_map = {}
         for i, c in enumerate(self.classes):
@@ -1221,118 +1210,84 @@ class LabelConverter:
         with open(label_map_file, 'w') as f:
             json.dump(label_map, f)
         # Save od.json
-        od_data = []
-        for image_file in image_list:
-            image_name = osp.basename(image_file)
-            label_name = osp.splitext(image_name)[0] + ".json"
-            label_file = osp.join(label_path, label_name)
-            img = cv2.imdecode(np.fromfile(image_file, dtype=np.uint8), 1)
-            height, width = img.shape[:2]
-            with open(label_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            instance = []
-            for shape in data["shapes"]:
-                if (shape["shape_type"] != "rectangle"
-                        or shape["label"] not in self.classes):
-                    continue
-                points = shape["points"]
-                x_min = float(points[0][0])
-                y_min = float(points[0][1])
-                x_max = float(points[2][0])
-                y_max = float(points[2][1])
-                bbox = [x_min, y_min, x_max, y_max]
-                label = self.classes.index(shape["label"])
-                category = shape["label"]
-                instance.append({
-                    "bbox": bbox,
-                    "label": label,
-                    "category": category
-                })
-            od_data.append({
-                "filename": image_name,
-                "height": height,
-                "width": width,
-                "detection": {
-                    "instance": instance
-                }
-            })
         od_file = osp.join(save_path, "od.json")
-        with jsonlines.open(od_file, mode='w') as writer:
-            writer.write_all(od_data)
+        manifest, previous_lines = None, {}
+        if incremental:
+            manifest = ExportManifest(save_path, "odvg", {"classes": self.classes})
+            label_files = [self.get_label_file(label_path, image_file) for image_file in image_list]
+            for label_file in manifest.stale_sources(label_files):
+                manifest.remove(label_file, delete_outputs=False)
+            # Records hold the size read from the image file
+            kept_names = {
+                manifest.get(label_file)["filename"] for label_file, image_file in zip(label_files, image_list)
+                if manifest.is_unchanged(label_file, [image_file])
+            }
+            if kept_names:
+                # Unchanged records are copied line by line from the previous od.json
+                with open(od_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            filename = json.loads(line)["filename"]
+                            if filename in kept_names:
+                                previous_lines[filename] = line if line.endswith("\n") else line + "\n"
+        else:
+            ExportManifest.discard(save_path, "odvg")
+
+        with open(od_file + ".tmp", "w", encoding="utf-8") as writer:
+            for image_file in image_list:
+                image_name = osp.basename(image_file)
+                label_file = self.get_label_file(label_path, image_file)
+                if image_name in previous_lines:
+                    writer.write(previous_lines[image_name])
+                    continue
+                width, height = image_meta_cache.get_size(image_file)
+                data = read_label_data(label_file)
+                instance = []
+                for shape in data["shapes"]:
+                    if (shape["shape_type"] != "rectangle"
+                            or shape["label"] not in self.classes):
+                        continue
+                    points = shape["points"]
+                    x_min = float(points[0][0])
+                    y_min = float(points[0][1])
+                    x_max = float(points[2][0])
+                    y_max = float(points[2][1])
+                    bbox = [x_min, y_min, x_max, y_max]
+                    label = self.classes.index(shape["label"])
+                    category = shape["label"]
+                    instance.append({
+                        "bbox": bbox,
+                        "label": label,
+                        "category": category
+                    })
+                writer.write(json.dumps({
+                    "filename": image_name,
+                    "height": height,
+                    "width": width,
+                    "detection": {
+                        "instance": instance
+                    }
+                }, ensure_ascii=False) + "\n")
+                if manifest is not None:
+                    manifest.record(label_file, [od_file], [image_file], filename=image_name)
+        os.replace(od_file + ".tmp", od_file)
+        if manifest is not None:
+            manifest.save()
+
+    def open_pporc_session(self, save_path, mode, workers=None) -> PPOCRExportSession:
+        """
+        Open a session exporting many pages to PPOCR with the output files kept open, see PPOCRExportSession.
+        """
+        session = PPOCRExportSession(save_path, mode, self.output_lock, workers)
+        session.open()
+        return session
 
     def custom_to_pporc(self, image_file, label_file, save_path, mode):
         if not osp.exists(label_file):
             return
-        image_name = osp.basename(image_file)
-        prefix = osp.splitext(image_name)[0]
-        dir_name = osp.basename(osp.dirname(image_file))
-
-        avaliable_shape_types = ["rectangle", "rotation", "polygon"]
-        img = cv2.imdecode(np.fromfile(image_file, dtype=np.uint8), 1)
-        with open(label_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if mode == "rec":
-            crop_img_count, rec_gt, annotations = 0, [], []
-            Label_file = osp.join(save_path, "Label.txt")
-            rec_gt_file = osp.join(save_path, "rec_gt.txt")
-            save_crop_img_path = osp.join(save_path, "crop_img")
-
-            for shape in data["shapes"]:
-                shape_type = shape["shape_type"]
-                if shape_type not in avaliable_shape_types:
-                    continue
-                transcription = shape["description"]
-                difficult = shape.get("difficult", False)
-                points = [list(map(int, p)) for p in shape["points"]]
-                annotations.append(dict(
-                    transcription=transcription,
-                    points=points,
-                    difficult=difficult,
-                ))
-                if len(points) > 4:
-                    points = self.gen_quad_from_poly(np.array(points))
-                assert len(points) == 4
-                img_crop = self.get_rotate_crop_image(img, np.array(points, np.float32))
-                if img_crop is None:
-                    print(f"Can not recognise the detection box in {image_file}. Please change manually")
-                    continue
-                crop_img_filenmame = f"{prefix}_crop_{crop_img_count}.jpg"
-                crop_img_file = osp.join(save_crop_img_path, crop_img_filenmame)
-                cv2.imwrite(crop_img_file, img_crop)
-                rec_gt.append(f"crop_img/{crop_img_filenmame}\t{transcription}\n")
-                crop_img_count += 1
-            if annotations:
-                Label = f"{dir_name}/{image_name}\t{json.dumps(annotations, ensure_ascii=False)}\n"
-                with open(Label_file, "a", encoding="utf-8") as f:
-                    f.write(Label)
-                with open(rec_gt_file, "a", encoding="utf-8") as f:
-                    for item in rec_gt:
-                        f.write(item)
-        elif mode == "kie":
-            annotations, class_set = [], set()
-            ppocr_kie_file = osp.join(save_path, "ppocr_kie.json")
-            for shape in data["shapes"]:
-                shape_type = shape["shape_type"]
-                if shape_type not in avaliable_shape_types:
-                    continue
-                label = shape["label"]
-                class_set.add(label)
-                transcription = shape["description"]
-                group_id = shape.get("group_id", 0)
-                kie_linking = shape.get("kie_linking", [])
-                difficult = shape.get("difficult", False)
-                points = [list(map(int, p)) for p in shape["points"]]
-                annotations.append(dict(
-                    transcription=transcription,
-                    label=label,
-                    points=points,
-                    difficult=difficult,
-                    id=group_id,
-                    linking=kie_linking,
-                ))
-            if annotations:
-                item = f"{dir_name}/{image_name}\t{json.dumps(annotations, ensure_ascii=False)}\n"
-                with open(ppocr_kie_file, "a", encoding="utf-8") as f:
-                    f.write(item)
+        with PPOCRExportSession(save_path, mode, self.output_lock) as session:
+            class_set = session.add_page(image_file, label_file)
+        if label_file in session.errors:
+            raise session.errors[label_file]
+        if mode == "kie":
             return class_set
@@ -0,0 +1,140 @@
+import operator
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+from utils.catalog import CatalogEntry
+
+if TYPE_CHECKING:
+    from core.views.modules.file_list_widget import FileList
+
+_COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "=": operator.eq,
+}
+_SHAPES_TERM = re.compile(r"^shapes(>=|<=|>|<|=)(\d+)$")
+
+
+class LabelIndex:
+    """
+    In-memory inverted index of the label content of the images in the file list, answering file search queries.
+
+    A query is made of whitespace separated terms that must all match:
+        label:car     images with a shape labeled "car"
+        type:polygon  images with a shape of this type
+        shapes>10     images by number of shapes, with >, >=, <, <= or =
+        labeled       images with a label file
+        unlabeled     images without label file
+        anything else part of the image path, as the search did before
+
+    Labels and shape types are matched case-insensitively. Images are indexed by path, their rows and whether they
+    are labeled are those of `files`, so that inserting or removing images does not shift the index.
+
+    Usage:
+        index = LabelIndex(file_list_widget.images)
+        for entry in catalog.scan():
+            index.add(entry)
+        rows = index.query("label:car shapes>3")
+    """
+
+    def __init__(self, files: "FileList"):
+        self.files = files
+        self.shape_counts: Dict[str, int] = {}
+        self.by_label: Dict[str, Set[str]] = {}
+        self.by_type: Dict[str, Set[str]] = {}
+        # Keys of the postings of every image, to remove them when the image is updated
+        self._labels: Dict[str, List[str]] = {}
+        self._types: Dict[str, List[str]] = {}
+        # Lower cased keys by the labels or shape types of entries, few distinct ones are shared by many images
+        self._keys: Dict[tuple, List[str]] = {}
+
+    def __len__(self):
+        return len(self.shape_counts)
+
+    def __contains__(self, path):
+        return path in self.shape_counts
+
+    @staticmethod
+    def _post(postings: Dict[str, Set[str]], keys: List[str], path: str):
+        for key in keys:
+            paths = postings.get(key)
+            if paths is None:
+                paths = postings[key] = set()
+            paths.add(path)
+
+    @staticmethod
+    def _unpost(postings: Dict[str, Set[str]], keys: List[str], path: str):
+        for key in keys:
+            paths = postings.get(key)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del postings[key]
+
+    def _get_keys(self, values: List[str]) -> List[str]:
+        values = tuple(values)
+        keys = self._keys.get(values)
+        if keys is None:
+            keys = self._keys[values] = sorted({value.lower() for value in values})
+        return keys
+
+    def add(self, entry: CatalogEntry):
+        """
+        Index the label content of an image, replacing what was indexed for it, e.g. after its label file was saved.
+        """
+        if entry.path in self.shape_counts:
+            self.remove(entry.path)
+        self.shape_counts[entry.path] = entry.shape_count
+        self._labels[entry.path] = self._get_keys(entry.labels)
+        self._types[entry.path] = self._get_keys(entry.shape_types)
+        self._post(self.by_label, self._labels[entry.path], entry.path)
+        self._post(self.by_type, self._types[entry.path], entry.path)
+
+    def remove(self, path: str):
+        if path not in self.shape_counts:
+            return
+        self._unpost(self.by_label, self._labels.pop(path), path)
+        self._unpost(self.by_type, self._types.pop(path), path)
+        del self.shape_counts[path]
+
+    def query(self, text: str) -> Optional[Set[int]]:
+        """
+        Rows of the images matching a query.
+
+        Returns:
+            Optional[Set[int]]: matching rows, None if the query is empty and every image matches
+        """
+        files = self.files
+        # Terms answered by the index narrow the images first, the others only filter what is left
+        indexed, filters = [], []
+        for term in text.split():
+            lower_term = term.lower()
+            match = _SHAPES_TERM.match(lower_term)
+            if lower_term.startswith("label:"):
+                indexed.append(self.by_label.get(lower_term[len("label:"):], set()))
+            elif lower_term.startswith("type:"):
+                indexed.append(self.by_type.get(lower_term[len("type:"):], set()))
+            elif lower_term == "labeled":
+                filters.append(files.is_labeled)
+            elif lower_term == "unlabeled":
+                filters.append(lambda row: not files.is_labeled(row))
+            elif match is not None:
+                compare, value = _COMPARISONS[match.group(1)], int(match.group(2))
+                filters.append(lambda row, compare=compare, value=value: compare(self.shape_counts.get(files[row], 0), value))
+            else:
+                filters.append(lambda row, term=term: term in files[row])
+        if not indexed and not filters:
+            return None
+
+        if indexed:
+            indexed.sort(key=len)
+            paths = set(indexed[0])
+            for postings in indexed[1:]:
+                paths &= postings
+            rows = (files.get_row(path) for path in paths)
+            rows = [row for row in rows if row is not None]
+        else:
+            rows = range(len(files))
+        return {row for row in rows if all(f(row) for f in filters)}
@@ -0,0 +1,298 @@
+import itertools
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Tile edge used when rasterizing very large images tile by tile
+DEFAULT_TILE_SIZE = 4096
+
+
+def _get_footprint(polygon: np.ndarray, box: np.ndarray, image_shape: Tuple[int, int]) -> Tuple[int, int, np.ndarray]:
+    """
+    Rasterize a polygon over its bounding box clipped to the image.
+
+    OpenCV clips polygons to the buffer they are filled into, a buffer whose borders are the image borders wherever the
+    polygon is clipped gives the same pixels as the whole image canvas.
+
+    Returns:
+        Tuple[int, int, np.ndarray]: (x, y, boolean mask) of the footprint in image coordinates
+    """
+    height, width = image_shape
+    x0, y0 = max(int(box[0]), 0), max(int(box[1]), 0)
+    x1, y1 = min(int(box[2]) + 1, width), min(int(box[3]) + 1, height)
+    footprint = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint8)
+    if footprint.size:
+        cv2.fillPoly(footprint, [polygon], 1, offset=(-x0, -y0))
+    return x0, y0, footprint.view(bool)
+
+
+def _fill_tile(polygons: List[np.ndarray], values: List[int], boxes: np.ndarray, x0: int, y0: int, tile: np.ndarray, image_shape: Tuple[int, int], footprints: Dict[int, Tuple[int, int, np.ndarray]]) -> None:
+    """
+    Fill the polygons intersecting a tile, in z-order, into the tile buffer.
+
+    Polygons lying inside the tile are filled straight into it. The others are rasterized once over their footprint,
+    kept in `footprints` for the next tiles, and the tile's slice of the footprint is pasted, so tiles match the
+    whole image canvas pixel for pixel.
+    """
+    tile_height, tile_width = tile.shape[:2]
+    x1, y1 = x0 + tile_width, y0 + tile_height
+    hits = np.flatnonzero((boxes[:, 0] < x1) & (boxes[:, 2] >= x0) & (boxes[:, 1] < y1) & (boxes[:, 3] >= y0))
+    for i in hits.tolist():
+        box = boxes[i]
+        if box[0] >= x0 and box[1] >= y0 and box[2] < x1 and box[3] < y1:
+            cv2.fillPoly(tile, [polygons[i]], int(values[i]), offset=(-x0, -y0))
+            continue
+        if i not in footprints:
+            footprints[i] = _get_footprint(polygons[i], box, image_shape)
+        fx, fy, footprint = footprints[i]
+        left, top = max(x0, fx), max(y0, fy)
+        right, bottom = min(x1, fx + footprint.shape[1]), min(y1, fy + footprint.shape[0])
+        if right > left and bottom > top:
+            mask = footprint[top - fy:bottom - fy, left - fx:right - fx]
+            tile[top - y0:bottom - y0, left - x0:right - x0][mask] = int(values[i])
+
+
+def _get_boxes(polygons: List[np.ndarray]) -> np.ndarray:
+    return np.array([np.concatenate([polygon.min(axis=0), polygon.max(axis=0)]) for polygon in polygons])
+
+
+def _get_canvas_dtype(lut: Optional[np.ndarray]):
+    # Canvas values index `lut`, which may hold more than 256 entries
+    return np.uint16 if lut is not None and len(lut) > 256 else np.uint8
+
+
+def rasterize_polygons(polygons: List[np.ndarray], values: List[int], image_shape: Tuple[int, int], lut: Optional[np.ndarray] = None, tile_size: int = None) -> np.ndarray:
+    """
+    Rasterize polygons into a single label canvas in one pass.
+
+    Every polygon is filled straight into the canvas with its value, later polygons are drawn on top of earlier ones,
+    so the cost only depends on the polygons' area. In tiled mode only the polygons intersecting a tile are filled,
+    see `rasterize_bands` to also bound the memory of the output.
+
+    Args:
+        polygons: int32 arrays of shape (points, 2), in z-order (bottom first)
+        values: value of each polygon, written to the index canvas
+        image_shape: (height, width) of the canvas
+        lut: optional lookup table mapping canvas values to output pixels, e.g. (values, 3) colors
+        tile_size: rasterize by tiles of this size instead of the whole image at once
+
+    Returns:
+        np.ndarray: canvas of shape (height, width), or (height, width, channels) when `lut` has channels
+    """
+    height, width = image_shape
+    if tile_size is not None:
+        channels = lut.shape[1:] if lut is not None else ()
+        output = np.empty((height, width) + channels, dtype=lut.dtype if lut is not None else np.uint8)
+        for y0, band in rasterize_bands(polygons, values, image_shape, tile_size, lut):
+            output[y0:y0 + band.shape[0]] = band
+        return output
+
+    canvas = np.zeros((height, width), dtype=_get_canvas_dtype(lut))
+    for polygon, value in zip(polygons, values):
+        cv2.fillPoly(canvas, [polygon], int(value))
+    return lut[canvas] if lut is not None else canvas
+
+
+def rasterize_bands(polygons: List[np.ndarray], values: List[int], image_shape: Tuple[int, int], tile_size: int, lut: Optional[np.ndarray] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Rasterize polygons band by band, each band of `tile_size` rows being filled tile by tile.
+
+    Only one band of the output exists at a time, so very large masks can be encoded without holding them in memory,
+    see `write_png_bands`. The output is identical to the one of `rasterize_polygons` without tiles, polygons crossing
+    tile borders keep their footprint until their last band.
+
+    Yields:
+        Tuple[int, np.ndarray]: (first row, band of shape (rows, width) or (rows, width, channels))
+    """
+    height, width = image_shape
+    boxes = _get_boxes(polygons) if polygons else None
+    dtype = _get_canvas_dtype(lut)
+    footprints = {}
+    for y0 in range(0, height, tile_size):
+        rows = min(tile_size, height - y0)
+        if lut is None:
+            # Tiles are views of the band, filled in place
+            band = np.zeros((rows, width), dtype=np.uint8)
+            if boxes is not None:
+                for x0 in range(0, width, tile_size):
+                    _fill_tile(polygons, values, boxes, x0, y0, band[:, x0:x0 + tile_size], image_shape, footprints)
+        else:
+            band = np.empty((rows, width) + lut.shape[1:], dtype=lut.dtype)
+            tile = np.zeros((rows, min(tile_size, width)), dtype=dtype)
+            for x0 in range(0, width, tile_size):
+                view = tile[:, :min(tile_size, width - x0)]
+                view.fill(0)
+                if boxes is not None:
+                    _fill_tile(polygons, values, boxes, x0, y0, view, image_shape, footprints)
+                np.take(lut, view, axis=0, out=band[:, x0:x0 + view.shape[1]])
+        for i in [i for i in footprints if boxes[i, 3] < y0 + rows]:
+            del footprints[i]
+        yield y0, band
+
+
+def _write_png_chunk(f, chunk_type: bytes, data: bytes) -> None:
+    f.write(struct.pack(">I", len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+
+def write_png_bands(output_file: str, bands: Iterable[Tuple[int, np.ndarray]], image_shape: Tuple[int, int], palette: Optional[List[int]] = None) -> None:
+    """
+    Encode an 8 bits PNG from bands of rows, e.g. from `rasterize_bands`, compressing each band as it comes.
+
+    Args:
+        bands: (first row, band) in row order, bands of shape (rows, width) for gray or palette images, or
+            (rows, width, 3) for RGB images
+        image_shape: (height, width) of the image
+        palette: flat [r, g, b, ...] colors, writes a palette image of class indexes
+    """
+    height, width = image_shape
+    bands = iter(bands)
+    first = next(bands, None)
+    channels = 1 if first is None or first[1].ndim == 2 else first[1].shape[2]
+    color_type = 3 if palette is not None else {1: 0, 3: 2}[channels]
+    compressor = zlib.compressobj(1)
+    with open(output_file, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        _write_png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+        if palette is not None:
+            _write_png_chunk(f, b"PLTE", bytes(palette))
+        for _, band in itertools.chain([first] if first is not None else [], bands):
+            # Each row starts with the filter type, 0 for none
+            rows = np.zeros((band.shape[0], width * channels + 1), dtype=np.uint8)
+            rows[:, 1:] = band.reshape(band.shape[0], -1)
+            data = compressor.compress(rows.tobytes())
+            if data:
+                _write_png_chunk(f, b"IDAT", data)
+        _write_png_chunk(f, b"IDAT", compressor.flush())
+        _write_png_chunk(f, b"IEND", b"")
+
+
+def pack_rgb(image: np.ndarray) -> np.ndarray:
+    """
+    Pack the pixels of an (..., 3) RGB array into uint32 keys 0x00RRGGBB.
+    """
+    image = image.astype(np.uint32)
+    return (image[..., 0] << 16) | (image[..., 1] << 8) | image[..., 2]
+
+
+def read_class_map(mask_file: str, mapping_table: dict, tile_size: int = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    Map every pixel of a mask image to a class index in one vectorized step.
+
+    Grayscale masks keep one class per gray value present in the mask, values missing from the mapping table are
+    labeled "Unknown". RGB masks map pixels through a packed uint32 color lookup, colors missing from the mapping
+    table are labeled "Unknown" unless they are gray (e.g. black background), which is ignored.
+
+    Args:
+        mask_file: grayscale or rgb mask image
+        mapping_table: {"type": "grayscale" | "rgb", "colors": {label: value or [r, g, b]}}
+        tile_size: map the mask by bands of this many rows, bounding the temporary memory
+
+    Returns:
+        Tuple: (class map of shape (height, width) where 0 is the background, label of each class index)
+    """
+    input_type = mapping_table["type"]
+    mapping_color = mapping_table["colors"]
+    if input_type == "grayscale":
+        gray_img = cv2.imdecode(np.fromfile(mask_file, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        color_to_label = {v: k for k, v in mapping_color.items()}
+        present = np.flatnonzero(np.bincount(gray_img.ravel(), minlength=256))
+        # Class i + 1 is the i-th gray value present in the mask
+        lut = np.zeros(256, dtype=np.uint16)
+        lut[present] = np.arange(1, len(present) + 1)
+        labels = ["__background__"] + [color_to_label.get(value, "Unknown") for value in present.tolist()]
+        class_map = np.empty(gray_img.shape, dtype=np.uint16)
+        band = tile_size or gray_img.shape[0]
+        for y0 in range(0, gray_img.shape[0], band):
+            class_map[y0:y0 + band] = lut[gray_img[y0:y0 + band]]
+        return class_map, labels
+
+    if input_type != "rgb":
+        raise ValueError("Invalid input format specified")
+    bgr_img = cv2.imdecode(np.fromfile(mask_file, dtype=np.uint8), cv2.IMREAD_COLOR)
+    mapped_labels = list(mapping_color)
+    keys = pack_rgb(np.array([mapping_color[label] for label in mapped_labels], dtype=np.uint8).reshape(-1, 3))
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    unknown_index = len(mapped_labels) + 1
+    labels = ["__background__"] + mapped_labels + ["Unknown"]
+    class_map = np.empty(bgr_img.shape[:2], dtype=np.uint16)
+    band = tile_size or bgr_img.shape[0]
+    for y0 in range(0, bgr_img.shape[0], band):
+        pixels = bgr_img[y0:y0 + band, :, ::-1]
+        packed = pack_rgb(pixels)
+        is_gray = (pixels[..., 0] == pixels[..., 1]) & (pixels[..., 1] == pixels[..., 2])
+        classes = np.where(is_gray, 0, unknown_index)
+        if len(sorted_keys):
+            pos = np.minimum(np.searchsorted(sorted_keys, packed), len(sorted_keys) - 1)
+            classes = np.where(sorted_keys[pos] == packed, order[pos] + 1, classes)
+        class_map[y0:y0 + band] = classes
+    return class_map, labels
+
+
+def class_bounding_boxes(class_map: np.ndarray, class_count: int, tile_size: int = None) -> Dict[int, Tuple[int, int, int, int]]:
+    """
+    Find the bounding box (x_min, y_min, x_max, y_max) of every non background class in a single scan.
+    """
+    height, width = class_map.shape
+    rows = np.zeros((class_count, height), dtype=bool)
+    cols = np.zeros((class_count, width), dtype=bool)
+    band = tile_size or height
+    xs = np.arange(width)[None, :]
+    for y0 in range(0, height, band):
+        classes = class_map[y0:y0 + band]
+        ys = np.arange(y0, y0 + classes.shape[0])[:, None]
+        rows[classes, ys] = True
+        cols[classes, xs] = True
+    boxes = {}
+    for class_index in np.flatnonzero(rows[1:].any(axis=1)).tolist():
+        class_index += 1
+        y_where, x_where = np.flatnonzero(rows[class_index]), np.flatnonzero(cols[class_index])
+        boxes[class_index] = (int(x_where[0]), int(y_where[0]), int(x_where[-1]), int(y_where[-1]))
+    return boxes
+
+
+def _trace_class(class_map: np.ndarray, class_index: int, box: Tuple[int, int, int, int], epsilon_factor: float) -> List[list]:
+    x_min, y_min, x_max, y_max = box
+    region = (class_map[y_min:y_max + 1, x_min:x_max + 1] == class_index).astype(np.uint8)
+    # A zero border keeps contours touching the crop edge identical to the ones traced on the whole mask
+    region = cv2.copyMakeBorder(region, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    contours, _ = cv2.findContours(region, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x_min - 1, y_min - 1))
+    polygons = []
+    for contour in contours:
+        epsilon = epsilon_factor * cv2.arcLength(contour, True)
+        approx = cv2.approxPolyDP(contour, epsilon, True)
+        if len(approx) < 5:
+            continue
+        polygons.append(approx.reshape(-1, 2).tolist())
+    return polygons
+
+
+def trace_class_contours(class_map: np.ndarray, labels: List[str], epsilon_factor: float = 0.001, workers: int = None, tile_size: int = None) -> List[dict]:
+    """
+    Trace the external contours of every class of a class map.
+
+    Each class is traced on the crop of its bounding box only, classes are traced concurrently by a thread pool
+    since OpenCV releases the GIL.
+
+    Returns:
+        List[dict]: [{"points": [[x, y], ...], "label": label}, ...] ordered by class index
+    """
+    boxes = class_bounding_boxes(class_map, len(labels), tile_size)
+    class_indexes = sorted(boxes)
+    if workers is None or workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            traced = list(executor.map(lambda i: _trace_class(class_map, i, boxes[i], epsilon_factor), class_indexes))
+    else:
+        traced = [_trace_class(class_map, i, boxes[i], epsilon_factor) for i in class_indexes]
+    return [
+        {"points": points, "label": labels[class_index]}
+        for class_index, polygons in zip(class_indexes, traced)
+        for points in polygons
+    ]
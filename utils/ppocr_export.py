@@ -0,0 +1,269 @@
+import contextlib
+import json
+import os
+import os.path as osp
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from utils.label_binary import read_label_data
+from utils.logger import logger
+
+AVAILABLE_SHAPE_TYPES = ["rectangle", "rotation", "polygon"]
+
+
+def gen_quads_from_polys(polys: List[np.ndarray]) -> np.ndarray:
+    """
+    Generate the min area quad of each polygon, starting from the corner closest to the polygon's first point.
+
+    Args:
+        polys: polygons with shape (points, 2), at least 4 points each
+
+    Returns:
+        np.ndarray: int quads with shape (polygons, 4, 2)
+    """
+    if not polys:
+        return np.zeros((0, 4, 2), dtype=np.int64)
+    boxes = np.array([cv2.boxPoints(cv2.minAreaRect(poly.astype(np.int32))) for poly in polys], dtype=np.float32)
+    # Points of each polygon matched against 4 consecutive corners of its box
+    anchors = np.array([
+        [poly[0], poly[poly.shape[0] // 2 - 1], poly[poly.shape[0] // 2], poly[-1]] for poly in polys
+    ], dtype=np.float64)
+    starts = np.arange(4)
+    corner_indexes = (starts[:, None] + starts[None, :]) % 4
+    # dists[n, i]: distance sum when corner i of the box is the first point
+    dists = np.linalg.norm(boxes[:, corner_indexes] - anchors[:, None], axis=-1).sum(axis=-1)
+    first_point_indexes = np.argmin(dists, axis=1)
+    first_point_indexes[dists.min(axis=1) >= 1e4] = 0
+    quads = np.take_along_axis(boxes, corner_indexes[first_point_indexes][..., None], axis=1)
+    return quads.astype(np.int64)
+
+
+def get_rotate_crop_images(img: np.ndarray, quads: np.ndarray) -> List[Optional[np.ndarray]]:
+    """
+    Crop and rectify the text regions of an image.
+
+    Args:
+        img: image to crop from
+        quads: float32 quads with shape (regions, 4, 2)
+
+    Returns:
+        List[Optional[np.ndarray]]: crop of each region, None if the region can not be rectified
+    """
+    quads = np.array(quads, dtype=np.float32).reshape(-1, 4, 2)
+    # Use Green's theory to judge clockwise or counterclockwise
+    next_quads = np.roll(quads, -1, axis=1)
+    orientations = (-0.5 * (next_quads[..., 1] + quads[..., 1]) * (next_quads[..., 0] - quads[..., 0])).sum(axis=1)
+    counterclockwise = orientations < 0
+    quads[counterclockwise] = quads[counterclockwise][:, [0, 3, 2, 1]]
+
+    widths = np.maximum(
+        np.linalg.norm(quads[:, 0] - quads[:, 1], axis=1), np.linalg.norm(quads[:, 2] - quads[:, 3], axis=1)
+    ).astype(np.int64)
+    heights = np.maximum(
+        np.linalg.norm(quads[:, 0] - quads[:, 3], axis=1), np.linalg.norm(quads[:, 1] - quads[:, 2], axis=1)
+    ).astype(np.int64)
+
+    crops = []
+    for quad, width, height in zip(quads, widths.tolist(), heights.tolist()):
+        if width <= 0 or height <= 0:
+            crops.append(None)
+            continue
+        pts_std = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+        try:
+            M = cv2.getPerspectiveTransform(quad, pts_std)
+            dst_img = cv2.warpPerspective(img, M, (width, height), borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+        except cv2.error as e:
+            logger.warning(f"Failed rectifying text region {quad.tolist()}: {e}")
+            crops.append(None)
+            continue
+        if height * 1.0 / width >= 1.5:
+            dst_img = np.rot90(dst_img)
+        crops.append(dst_img)
+    return crops
+
+
+def _write_crop(crop_img_file: str, img_crop: np.ndarray):
+    cv2.imencode(".jpg", img_crop)[1].tofile(crop_img_file)
+
+
+class PPOCRExportSession:
+    """
+    Export pages to PPOCR labels with the output files kept open.
+
+    Lines are buffered and written under `output_lock` in one go when the buffer is full or the session is closed,
+    crops are encoded and written by a thread pool. Pages wait for earlier crops when too many are pending, and crop
+    errors are kept in `errors` by label file instead of being raised.
+
+    Usage:
+        with PPOCRExportSession(save_path, "rec") as session:
+            for image_file, label_file in pages:
+                session.add_page(image_file, label_file)
+    """
+
+    # Buffered label text flushed to the output files beyond this size
+    FLUSH_SIZE = 1024 * 1024
+    # Crops waiting to be written per crop thread, bounding the memory of decoded crops
+    PENDING_CROPS_PER_WORKER = 4
+
+    def __init__(self, save_path: str, mode: str, output_lock=None, workers: int = None):
+        """
+        Args:
+            save_path: directory of Label.txt/rec_gt.txt/crop_img for "rec", ppocr_kie.json for "kie"
+            mode: "rec" or "kie"
+            output_lock: lock guarding the output files when they are shared by several sessions
+            workers: threads encoding crops
+        """
+        if mode not in ["rec", "kie"]:
+            raise ValueError(f"Invalid PPOCR mode: {mode}")
+        self.save_path = save_path
+        self.mode = mode
+        self.output_lock = output_lock if output_lock is not None else contextlib.nullcontext()
+        self.workers = workers
+        self.class_set = set()
+        # label file -> first error writing one of its crops
+        self.errors: Dict[str, Exception] = {}
+        self._files = {}
+        self._pending = {}
+        self._pending_size = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # (label file, future) of the crops being written, oldest first
+        self._futures = []
+        self._max_pending_crops = (workers or min(32, (os.cpu_count() or 1) + 4)) * self.PENDING_CROPS_PER_WORKER
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        if self._files:
+            return
+        names = ["Label.txt", "rec_gt.txt"] if self.mode == "rec" else ["ppocr_kie.json"]
+        for name in names:
+            self._files[name] = open(osp.join(self.save_path, name), "a", encoding="utf-8")
+            self._pending[name] = []
+        if self.mode == "rec":
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def _append(self, name: str, text: str):
+        self._pending[name].append(text)
+        self._pending_size += len(text)
+
+    def add_page(self, image_file: str, label_file: str) -> set:
+        """
+        Export the shapes of one page.
+
+        Returns:
+            set: labels of the page, empty for "rec"
+        """
+        if not osp.exists(label_file):
+            return set()
+        image_name = osp.basename(image_file)
+        dir_name = osp.basename(osp.dirname(image_file))
+        data = read_label_data(label_file)
+        shapes = [shape for shape in data["shapes"] if shape["shape_type"] in AVAILABLE_SHAPE_TYPES]
+
+        class_set = set()
+        if self.mode == "rec":
+            annotations = self._add_crops(image_file, label_file, shapes)
+        else:
+            annotations = []
+            for shape in shapes:
+                label = shape["label"]
+                class_set.add(label)
+                annotations.append(dict(
+                    transcription=shape["description"],
+                    label=label,
+                    points=[list(map(int, p)) for p in shape["points"]],
+                    difficult=shape.get("difficult", False),
+                    id=shape.get("group_id", 0),
+                    linking=shape.get("kie_linking", []),
+                ))
+        if annotations:
+            name = "Label.txt" if self.mode == "rec" else "ppocr_kie.json"
+            self._append(name, f"{dir_name}/{image_name}\t{json.dumps(annotations, ensure_ascii=False)}\n")
+        self.class_set.update(class_set)
+        if self._pending_size >= self.FLUSH_SIZE:
+            self.flush()
+        return class_set
+
+    def _add_crops(self, image_file: str, label_file: str, shapes: list) -> list:
+        prefix = osp.splitext(osp.basename(image_file))[0]
+        annotations, quads = [], []
+        for shape in shapes:
+            points = [list(map(int, p)) for p in shape["points"]]
+            annotations.append(dict(transcription=shape["description"], points=points, difficult=shape.get("difficult", False)))
+            quads.append(np.array(points))
+        if not quads:
+            return annotations
+
+        # Polygons are reduced to their min area quad, all at once
+        poly_indexes = [i for i, quad in enumerate(quads) if len(quad) > 4]
+        for i, quad in zip(poly_indexes, gen_quads_from_polys([quads[i] for i in poly_indexes])):
+            quads[i] = quad
+        assert all(len(quad) == 4 for quad in quads)
+        img = cv2.imdecode(np.fromfile(image_file, dtype=np.uint8), 1)
+        crops = get_rotate_crop_images(img, np.array(quads, dtype=np.float32))
+
+        crop_img_count = 0
+        for annotation, img_crop in zip(annotations, crops):
+            if img_crop is None:
+                logger.warning(f"Can not recognise the detection box in {image_file}. Please change manually")
+                continue
+            crop_img_filename = f"{prefix}_crop_{crop_img_count}.jpg"
+            crop_img_file = osp.join(self.save_path, "crop_img", crop_img_filename)
+            self._collect_crops(self._max_pending_crops - 1)
+            self._futures.append((label_file, self._executor.submit(_write_crop, crop_img_file, img_crop)))
+            self._append("rec_gt.txt", f"crop_img/{crop_img_filename}\t{annotation['transcription']}\n")
+            crop_img_count += 1
+        return annotations
+
+    def flush(self):
+        """
+        Write the buffered label lines to the output files.
+        """
+        with self.output_lock:
+            for name, lines in self._pending.items():
+                if lines:
+                    self._files[name].write("".join(lines))
+                    self._files[name].flush()
+                    lines.clear()
+        self._pending_size = 0
+        # Release finished futures
+        futures, self._futures = self._futures, []
+        for label_file, future in futures:
+            if future.done():
+                self._collect_crop(label_file, future)
+            else:
+                self._futures.append((label_file, future))
+
+    def _collect_crop(self, label_file: str, future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed writing a crop of {label_file}: {error}")
+            self.errors.setdefault(label_file, error)
+
+    def _collect_crops(self, limit: int = 0):
+        """
+        Wait for the oldest crops until at most `limit` of them are pending.
+        """
+        while len(self._futures) > limit:
+            self._collect_crop(*self._futures.pop(0))
+
+    def close(self):
+        try:
+            if self._executor is not None:
+                self._collect_crops()
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._files:
+                self.flush()
+        finally:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
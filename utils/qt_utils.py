@@ -26,6 +26,7 @@ def may_continue() -> bool:
         files_action.save_file()
         return True
     elif answer == QtWidgets.QMessageBox.Discard:
+        files_action.discard_journal()
         return True
     else:
         # answer == QtWidgets.QMessageBox.Cancel